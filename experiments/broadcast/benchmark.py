@@ -0,0 +1,332 @@
+#!/usr/bin/env python
+
+"""
+Reproducible benchmark for :func:`websockets.broadcast`.
+
+The server runs in a child process and the clients run in the parent process,
+connected over the loopback interface, so the benchmark works offline.
+
+For each combination of subscriber count, message size and compression
+setting, the server broadcasts two series of messages:
+
+* First, it paces messages by ``--interval``. Each message starts with a
+  timestamp, which lets clients measure the latency distribution. The server
+  reports the time spent in :func:`~websockets.broadcast` and its peak RSS.
+* Then, it broadcasts messages back-to-back to measure throughput. Since
+  :func:`~websockets.broadcast` has no backpressure, it waits until write
+  buffers drain below the high-water mark before sending the next message.
+
+Results are printed as a table and written as JSON for comparison between
+runs, for example before and after a change to ``broadcast()`` or
+``write_frame_sync()``.
+
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import struct
+import sys
+import time
+
+import websockets
+
+
+TIMESTAMP = struct.Struct("!Q")
+
+# Default high-water mark of the write buffer, set by write_limit.
+WRITE_LIMIT = 2 ** 16
+
+
+def make_message(size, seed=0):
+    """
+    Build a payload of ``size`` bytes with a JSON-like, compressible body.
+
+    The first bytes are overwritten with a timestamp before each broadcast.
+
+    """
+    rng = random.Random(seed)
+    words = [b'"id"', b'"user"', b'"text"', b'"ts"', b'"room"', b"true", b"null"]
+    body = bytearray()
+    while len(body) < size:
+        body += rng.choice(words) + b": " + str(rng.randrange(10000)).encode() + b", "
+    return bytearray(body[:size])
+
+
+def peak_rss():
+    """
+    Return the peak resident set size of the current process, in bytes.
+
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+# Server side, runs in a child process.
+
+
+async def server_main(conn, compression):
+    clients = set()
+
+    async def handler(websocket, path):
+        clients.add(websocket)
+        try:
+            await websocket.wait_closed()
+        finally:
+            clients.remove(websocket)
+
+    loop = asyncio.get_running_loop()
+    async with websockets.serve(
+        handler,
+        "localhost",
+        0,
+        compression=compression,
+        ping_interval=None,
+        max_queue=None,
+    ) as server:
+        port = server.sockets[0].getsockname()[1]
+        conn.send(port)
+
+        command, subscribers, size, count, interval = await loop.run_in_executor(
+            None, conn.recv
+        )
+        assert command == "run"
+
+        # The client doesn't wait for the server's handler to start.
+        while len(clients) < subscribers:
+            await asyncio.sleep(0.01)
+
+        rss_before = peak_rss()
+        message = make_message(size)
+        durations = []
+        start = time.perf_counter()
+        for _ in range(count):
+            TIMESTAMP.pack_into(message, 0, time.time_ns())
+            t0 = time.perf_counter_ns()
+            websockets.broadcast(clients, bytes(message))
+            durations.append(time.perf_counter_ns() - t0)
+            await asyncio.sleep(interval)
+        elapsed = time.perf_counter() - start
+        rss_peak = peak_rss()
+
+        # Broadcast without pacing, only waiting for write buffers to drain.
+        burst_start = time.time_ns()
+        for _ in range(count):
+            TIMESTAMP.pack_into(message, 0, time.time_ns())
+            websockets.broadcast(clients, bytes(message))
+            await asyncio.sleep(0)
+            while any(
+                websocket.transport.get_write_buffer_size() > WRITE_LIMIT
+                for websocket in clients
+            ):
+                await asyncio.sleep(0)
+
+        conn.send(
+            {
+                "broadcast_ns": durations,
+                "elapsed": elapsed,
+                "burst_start": burst_start,
+                "rss_before": rss_before,
+                "rss_peak": rss_peak,
+            }
+        )
+        # Wait until the parent process is done before closing connections.
+        await loop.run_in_executor(None, conn.recv)
+
+
+def server_process(conn, compression):
+    asyncio.run(server_main(conn, compression))
+
+
+# Client side, runs in the parent process.
+
+
+async def client(uri, compression, count, latencies, finished, connected):
+    async with websockets.connect(
+        uri,
+        compression=compression,
+        ping_interval=None,
+        max_size=None,
+        max_queue=None,
+    ) as websocket:
+        connected.release()
+        # Paced messages.
+        for _ in range(count):
+            message = await websocket.recv()
+            received = time.time_ns()
+            (sent,) = TIMESTAMP.unpack_from(message)
+            latencies.append(received - sent)
+        # Back-to-back messages.
+        for _ in range(count):
+            await websocket.recv()
+        finished.append(time.time_ns())
+
+
+async def run_case(subscribers, size, compression, count, interval):
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(
+        target=server_process, args=(child_conn, compression)
+    )
+    server.start()
+    loop = asyncio.get_running_loop()
+    try:
+        port = await loop.run_in_executor(None, parent_conn.recv)
+        uri = f"ws://localhost:{port}/"
+
+        latencies = []
+        finished = []
+        connected = asyncio.Semaphore(0)
+        clients = []
+        for _ in range(subscribers):
+            clients.append(
+                asyncio.create_task(
+                    client(uri, compression, count, latencies, finished, connected)
+                )
+            )
+            # Don't overflow the listen backlog.
+            await connected.acquire()
+
+        parent_conn.send(("run", subscribers, size, count, interval))
+        await asyncio.gather(*clients)
+        stats = await loop.run_in_executor(None, parent_conn.recv)
+        parent_conn.send("stop")
+    finally:
+        server.join(timeout=10)
+        if server.is_alive():
+            server.terminate()
+
+    delivered = len(latencies)
+    # The server and the clients run on the same host and share its clock.
+    burst_elapsed = (max(finished) - stats["burst_start"]) / 1e9
+    burst_delivered = len(finished) * count
+    quantiles = statistics.quantiles(latencies, n=100)
+    broadcast_ns = stats["broadcast_ns"]
+    return {
+        "subscribers": subscribers,
+        "size": size,
+        "compression": compression or "none",
+        "messages": count,
+        "delivered": delivered,
+        "latency_p50_ms": quantiles[49] / 1e6,
+        "latency_p99_ms": quantiles[98] / 1e6,
+        "latency_max_ms": max(latencies) / 1e6,
+        "broadcast_mean_ms": statistics.mean(broadcast_ns) / 1e6,
+        "broadcast_max_ms": max(broadcast_ns) / 1e6,
+        "throughput_msg_s": burst_delivered / burst_elapsed,
+        "throughput_mb_s": burst_delivered * size / burst_elapsed / 1e6,
+        "server_rss_before_mb": stats["rss_before"] / 1e6,
+        "server_rss_peak_mb": stats["rss_peak"] / 1e6,
+    }
+
+
+COLUMNS = [
+    ("subscribers", "{:>11}"),
+    ("size", "{:>7}"),
+    ("compression", "{:>11}"),
+    ("latency_p50_ms", "{:>8.2f}"),
+    ("latency_p99_ms", "{:>8.2f}"),
+    ("broadcast_mean_ms", "{:>9.2f}"),
+    ("throughput_msg_s", "{:>11.0f}"),
+    ("server_rss_peak_mb", "{:>8.1f}"),
+]
+
+HEADERS = ["subscribers", "size", "compression", "p50 ms", "p99 ms"]
+HEADERS += ["bcast ms", "msg/s", "RSS MB"]
+
+
+def print_row(result):
+    print("  ".join(fmt.format(result[key]) for key, fmt in COLUMNS))
+
+
+def print_header():
+    widths = [len(fmt.format(0 if "f" in fmt else "")) for _, fmt in COLUMNS]
+    print("  ".join(f"{h:>{w}}" for h, w in zip(HEADERS, widths)))
+
+
+async def main(args):
+    results = []
+    print_header()
+    for subscribers, size, compression in itertools.product(
+        args.subscribers, args.sizes, args.compression
+    ):
+        result = await run_case(
+            subscribers,
+            size,
+            None if compression == "none" else compression,
+            args.messages,
+            args.interval,
+        )
+        print_row(result)
+        results.append(result)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "websockets": websockets.__version__,
+        "messages": args.messages,
+        "interval": args.interval,
+        "results": results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark websockets.broadcast().")
+    parser.add_argument(
+        "--subscribers",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="number of connected clients (default: 10 100 1000)",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[64, 1024, 16384],
+        help="message sizes in bytes (default: 64 1024 16384)",
+    )
+    parser.add_argument(
+        "--compression",
+        nargs="+",
+        choices=["none", "deflate"],
+        default=["none", "deflate"],
+        help="compression settings (default: none deflate)",
+    )
+    parser.add_argument(
+        "--messages",
+        type=int,
+        default=100,
+        help="messages broadcast per case (default: 100)",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=0.01,
+        help="delay between messages when measuring latency (default: 0.01)",
+    )
+    parser.add_argument(
+        "--output",
+        default="broadcast_benchmark.json",
+        help="path of the JSON report, - for stdout",
+    )
+    args = parser.parse_args()
+    if any(size < TIMESTAMP.size for size in args.sizes):
+        parser.error(f"message sizes must be at least {TIMESTAMP.size} bytes")
+    if os.name != "posix":
+        parser.error("this benchmark requires a POSIX system")
+    asyncio.run(main(args))
@@ -1,163 +1,314 @@
 #!/usr/bin/env python
 
-import getpass
+"""
+Benchmark for the Per-Message Deflate extension.
+
+Corpora are generated from a fixed seed, so the benchmark runs offline and
+gives the same inputs on every run:
+
+- chat: small JSON messages, typical of chat or notification applications;
+- telemetry: larger JSON documents containing mostly numbers;
+- binary: binary messages mixing structured records and random bytes.
+
+You may also benchmark your own messages with ``--corpus-file``. It must
+contain a pickled list of :class:`str` or :class:`bytes`.
+
+For each combination of Window Bits and Memory Level, messages go through
+:meth:`~websockets.extensions.permessage_deflate.PerMessageDeflate.encode` on
+one side and ``decode()`` on the other side, like on a connection with
+context takeover. The benchmark measures the compression ratio, encode and
+decode throughput, and memory allocated by the extension of one connection,
+as reported by :mod:`tracemalloc`.
+
+Results are printed as a table and written as JSON.
+
+"""
+
+import argparse
+import itertools
 import json
 import pickle
-import subprocess
+import platform
+import random
 import sys
 import time
-import zlib
-
+import tracemalloc
 
-CORPUS_FILE = "corpus.pkl"
+import websockets
+from websockets.extensions.permessage_deflate import PerMessageDeflate
+from websockets.frames import OP_BINARY, OP_TEXT, Frame
 
-REPEAT = 10
 
 WB, ML = 12, 5  # defaults used as a reference
 
 
-def _corpus():
-    OAUTH_TOKEN = getpass.getpass("OAuth Token? ")
-    COMMIT_API = (
-        f'curl -H "Authorization: token {OAUTH_TOKEN}" '
-        f"https://api.github.com/repos/aaugustin/websockets/git/commits/:sha"
-    )
+# Corpora
 
-    commits = []
-
-    head = subprocess.check_output("git rev-parse HEAD", shell=True).decode().strip()
-    todo = [head]
-    seen = set()
-
-    while todo:
-        sha = todo.pop(0)
-        commit = subprocess.check_output(COMMIT_API.replace(":sha", sha), shell=True)
-        commits.append(commit)
-        seen.add(sha)
-        for parent in json.loads(commit)["parents"]:
-            sha = parent["sha"]
-            if sha not in seen and sha not in todo:
-                todo.append(sha)
-        time.sleep(1)  # rate throttling
-
-    return commits
-
-
-def corpus():
-    data = _corpus()
-    with open(CORPUS_FILE, "wb") as handle:
-        pickle.dump(data, handle)
-
-
-def _run(data):
-    size = {}
-    duration = {}
-
-    for wbits in range(9, 16):
-        size[wbits] = {}
-        duration[wbits] = {}
-
-        for memLevel in range(1, 10):
-            encoder = zlib.compressobj(wbits=-wbits, memLevel=memLevel)
-            encoded = []
-
-            t0 = time.perf_counter()
-
-            for _ in range(REPEAT):
-                for item in data:
-                    if isinstance(item, str):
-                        item = item.encode("utf-8")
-                    # Taken from PerMessageDeflate.encode
-                    item = encoder.compress(item) + encoder.flush(zlib.Z_SYNC_FLUSH)
-                    if item.endswith(b"\x00\x00\xff\xff"):
-                        item = item[:-4]
-                    encoded.append(item)
-
-            t1 = time.perf_counter()
-
-            size[wbits][memLevel] = sum(len(item) for item in encoded)
-            duration[wbits][memLevel] = (t1 - t0) / REPEAT
-
-    raw_size = sum(len(item) for item in data)
-
-    print("=" * 79)
-    print("Compression ratio")
-    print("=" * 79)
-    print("\t".join(["wb \\ ml"] + [str(memLevel) for memLevel in range(1, 10)]))
-    for wbits in range(9, 16):
-        print(
-            "\t".join(
-                [str(wbits)]
-                + [
-                    f"{100 * (1 - size[wbits][memLevel] / raw_size):.1f}%"
-                    for memLevel in range(1, 10)
-                ]
-            )
-        )
-    print("=" * 79)
-    print()
-
-    print("=" * 79)
-    print("CPU time")
-    print("=" * 79)
-    print("\t".join(["wb \\ ml"] + [str(memLevel) for memLevel in range(1, 10)]))
-    for wbits in range(9, 16):
-        print(
-            "\t".join(
-                [str(wbits)]
-                + [
-                    f"{1000 * duration[wbits][memLevel]:.1f}ms"
-                    for memLevel in range(1, 10)
-                ]
-            )
-        )
-    print("=" * 79)
-    print()
-
-    print("=" * 79)
-    print(f"Size vs. {WB} \\ {ML}")
-    print("=" * 79)
-    print("\t".join(["wb \\ ml"] + [str(memLevel) for memLevel in range(1, 10)]))
-    for wbits in range(9, 16):
-        print(
-            "\t".join(
-                [str(wbits)]
-                + [
-                    f"{100 * (size[wbits][memLevel] / size[WB][ML] - 1):.1f}%"
-                    for memLevel in range(1, 10)
-                ]
-            )
+
+def chat_corpus(count, seed=0):
+    rng = random.Random(seed)
+    users = [f"user{index}" for index in range(50)]
+    rooms = ["general", "random", "support", "dev", "ops"]
+    words = (
+        "the a to and of is in it you that for on with this are be we have "
+        "not at but can your do if will just deploy build test fix bug review "
+        "merge release server client latency message connection"
+    ).split()
+    messages = []
+    for index in range(count):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(2, 30)))
+        message = {
+            "type": "message",
+            "id": index,
+            "room": rng.choice(rooms),
+            "user": rng.choice(users),
+            "ts": 1600000000 + index * rng.randint(1, 10),
+            "text": text,
+        }
+        messages.append(json.dumps(message))
+    return messages
+
+
+def telemetry_corpus(count, seed=0):
+    rng = random.Random(seed)
+    metrics = ["cpu", "memory", "disk", "network_in", "network_out", "latency"]
+    messages = []
+    for index in range(count):
+        message = {
+            "host": f"host-{rng.randrange(100):03d}",
+            "ts": 1600000000 + index,
+            "metrics": {
+                metric: [round(rng.uniform(0, 100), 2) for _ in range(10)]
+                for metric in metrics
+            },
+            "tags": {"region": rng.choice(["eu", "us", "ap"]), "env": "prod"},
+        }
+        messages.append(json.dumps(message))
+    return messages
+
+
+def binary_corpus(count, seed=0):
+    rng = random.Random(seed)
+    messages = []
+    for index in range(count):
+        # Fixed-size records with small integers compress well.
+        records = b"".join(
+            index.to_bytes(4, "big") + rng.randrange(256).to_bytes(2, "big") + bytes(10)
+            for _ in range(rng.randint(8, 64))
         )
-    print("=" * 79)
-    print()
-
-    print("=" * 79)
-    print(f"Time vs. {WB} \\ {ML}")
-    print("=" * 79)
-    print("\t".join(["wb \\ ml"] + [str(memLevel) for memLevel in range(1, 10)]))
-    for wbits in range(9, 16):
-        print(
-            "\t".join(
-                [str(wbits)]
-                + [
-                    f"{100 * (duration[wbits][memLevel] / duration[WB][ML] - 1):.1f}%"
-                    for memLevel in range(1, 10)
-                ]
-            )
+        # Random bytes don't compress at all.
+        noise = bytes(rng.randrange(256) for _ in range(rng.randint(16, 256)))
+        messages.append(records + noise)
+    return messages
+
+
+CORPORA = {
+    "chat": chat_corpus,
+    "telemetry": telemetry_corpus,
+    "binary": binary_corpus,
+}
+
+
+def load_corpus(path):
+    with open(path, "rb") as handle:
+        return pickle.load(handle)
+
+
+def to_frames(data):
+    return [
+        Frame(OP_TEXT, item.encode("utf-8"))
+        if isinstance(item, str)
+        else Frame(OP_BINARY, item)
+        for item in data
+    ]
+
+
+# Measurements
+
+
+def make_extension(wbits, mem_level):
+    return PerMessageDeflate(False, False, wbits, wbits, {"memLevel": mem_level})
+
+
+def measure_speed(frames, wbits, mem_level, repeat):
+    encode_time = decode_time = 0.0
+    for _ in range(repeat):
+        # Both endpoints use the same settings.
+        sender = make_extension(wbits, mem_level)
+        receiver = make_extension(wbits, mem_level)
+
+        t0 = time.perf_counter()
+        encoded = [sender.encode(frame) for frame in frames]
+        t1 = time.perf_counter()
+        decoded = [receiver.decode(frame) for frame in encoded]
+        t2 = time.perf_counter()
+
+        encode_time += t1 - t0
+        decode_time += t2 - t1
+
+    assert decoded == frames
+    return sum(len(frame.data) for frame in encoded), encode_time, decode_time
+
+
+def measure_memory(frames, wbits, mem_level):
+    """
+    Measure memory held by the extension of one connection.
+
+    The extension sends and receives messages, so that zlib allocates both
+    the compression and the decompression contexts.
+
+    """
+    frames = frames[:100]
+    peer = make_extension(wbits, mem_level)
+    encoded = [peer.encode(frame) for frame in frames]
+    del peer
+
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        extension = make_extension(wbits, mem_level)
+        for frame in frames:
+            extension.encode(frame)
+        for frame in encoded:
+            extension.decode(frame)
+        memory, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return memory - baseline, extension.memory_usage
+
+
+def run_case(corpus, frames, wbits, mem_level, repeat):
+    raw_size = sum(len(frame.data) for frame in frames)
+    size, encode_time, decode_time = measure_speed(frames, wbits, mem_level, repeat)
+    memory, estimated_memory = measure_memory(frames, wbits, mem_level)
+    return {
+        "corpus": corpus,
+        "wbits": wbits,
+        "mem_level": mem_level,
+        "messages": len(frames),
+        "raw_size": raw_size,
+        "compressed_size": size,
+        "ratio": size / raw_size,
+        "encode_mb_s": raw_size * repeat / encode_time / 1e6,
+        "decode_mb_s": raw_size * repeat / decode_time / 1e6,
+        "encode_us_per_msg": encode_time / repeat / len(frames) * 1e6,
+        "decode_us_per_msg": decode_time / repeat / len(frames) * 1e6,
+        "memory_kib": memory / 1024,
+        "estimated_memory_kib": estimated_memory / 1024,
+    }
+
+
+# Reporting
+
+
+COLUMNS = [
+    ("corpus", "corpus", 9, ""),
+    ("wbits", "wbits", 5, ""),
+    ("mem_level", "ml", 2, ""),
+    ("ratio", "ratio", 6, ".1%"),
+    ("vs_default", f"vs {WB}/{ML}", 7, "+.1%"),
+    ("encode_mb_s", "enc MB/s", 8, ".1f"),
+    ("decode_mb_s", "dec MB/s", 8, ".1f"),
+    ("memory_kib", "mem KiB", 7, ".0f"),
+]
+
+
+def print_header():
+    print("  ".join(f"{header:>{width}}" for _, header, width, _ in COLUMNS))
+
+
+def print_row(result):
+    print(
+        "  ".join(
+            f"{format(result[key], spec):>{width}}" for key, _, width, spec in COLUMNS
         )
-    print("=" * 79)
-    print()
+    )
+
 
+def main(args):
+    if args.corpus_file:
+        corpora = {args.corpus_file: load_corpus(args.corpus_file)}
+    else:
+        corpora = {name: CORPORA[name](args.messages) for name in args.corpus}
+
+    results = []
+    print_header()
+    for name, data in corpora.items():
+        frames = to_frames(data)
+        # Measure the reference first to compare other settings with it.
+        cases = list(itertools.product(args.wbits, args.mem_levels))
+        if (WB, ML) in cases:
+            cases.remove((WB, ML))
+        cases.insert(0, (WB, ML))
+        reference = None
+        for wbits, mem_level in cases:
+            result = run_case(name, frames, wbits, mem_level, args.repeat)
+            if reference is None:
+                reference = result
+            result["vs_default"] = (
+                result["compressed_size"] / reference["compressed_size"] - 1
+            )
+            print_row(result)
+            results.append(result)
 
-def run():
-    with open(CORPUS_FILE, "rb") as handle:
-        data = pickle.load(handle)
-    _run(data)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "websockets": websockets.__version__,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"\nResults written to {args.output}")
 
 
-try:
-    run = globals()[sys.argv[1]]
-except (KeyError, IndexError):
-    print(f"Usage: {sys.argv[0]} [corpus|run]")
-else:
-    run()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Per-Message Deflate.")
+    parser.add_argument(
+        "--corpus",
+        nargs="+",
+        choices=list(CORPORA),
+        default=list(CORPORA),
+        help="generated corpora (default: all)",
+    )
+    parser.add_argument(
+        "--corpus-file",
+        help="pickled list of messages, replaces generated corpora",
+    )
+    parser.add_argument(
+        "--messages",
+        type=int,
+        default=1000,
+        help="messages per generated corpus (default: 1000)",
+    )
+    parser.add_argument(
+        "--wbits",
+        type=int,
+        nargs="+",
+        default=list(range(9, 16)),
+        help="Window Bits values (default: 9 to 15)",
+    )
+    parser.add_argument(
+        "--mem-levels",
+        type=int,
+        nargs="+",
+        default=list(range(1, 10)),
+        help="Memory Level values (default: 1 to 9)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="passes over the corpus for timing (default: 5)",
+    )
+    parser.add_argument(
+        "--output",
+        default="compression_benchmark.json",
+        help="path of the JSON report, - for stdout",
+    )
+    main(parser.parse_args())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+"""
+Measure allocations and time spent decoding compressed messages.
+
+This compares :meth:`PerMessageDeflate.decode` with the previous
+implementation, which appended the trailer to the payload before
+decompressing it, copying the payload, and called :func:`dataclasses.replace`
+twice.
+
+Messages are unfragmented text messages of 1 KiB and 1 MiB of JSON-like data.
+
+"""
+
+import argparse
+import dataclasses
+import json
+import random
+import time
+import tracemalloc
+
+from websockets.extensions.permessage_deflate import PerMessageDeflate
+from websockets.frames import OP_TEXT, Frame
+
+
+_EMPTY_UNCOMPRESSED_BLOCK = b"\x00\x00\xff\xff"
+
+
+def previous_decode(extension, frame, *, max_size=None):
+    # Implementation of PerMessageDeflate.decode() before the fast path, for
+    # an unfragmented message with context takeover.
+    frame = dataclasses.replace(frame, rsv1=False)
+    data = frame.data
+    if frame.fin:
+        data += _EMPTY_UNCOMPRESSED_BLOCK
+    max_length = 0 if max_size is None else max_size
+    data = extension.decoder.decompress(data, max_length)
+    return dataclasses.replace(frame, data=data)
+
+
+def current_decode(extension, frame, *, max_size=None):
+    return extension.decode(frame, max_size=max_size)
+
+
+def make_message(size, seed=0):
+    rng = random.Random(seed)
+    items = []
+    length = 0
+    while length < size:
+        item = json.dumps({"id": rng.randrange(10000), "value": rng.random()})
+        items.append(item)
+        length += len(item) + 2
+    return ("[" + ", ".join(items) + "]").encode()[:size]
+
+
+def make_frames(size, count):
+    encoder = PerMessageDeflate(False, False, 15, 15)
+    message = make_message(size)
+    return [encoder.encode(Frame(OP_TEXT, message)) for _ in range(count)]
+
+
+def measure(decode, frames, max_size):
+    # Peak memory above the baseline while decoding one message.
+    decoder = PerMessageDeflate(False, False, 15, 15)
+    decode(decoder, frames[0], max_size=max_size)
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    decode(decoder, frames[1], max_size=max_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Time per message.
+    decoder = PerMessageDeflate(False, False, 15, 15)
+    t0 = time.perf_counter()
+    for frame in frames:
+        decode(decoder, frame, max_size=max_size)
+    t1 = time.perf_counter()
+
+    return peak - baseline, (t1 - t0) / len(frames)
+
+
+def main(args):
+    print(f"{'size':>8}  {'implementation':>14}  {'peak KiB':>9}  {'time µs':>9}")
+    for size, count in [(1024, args.count), (1024 * 1024, max(args.count // 100, 2))]:
+        frames = make_frames(size, count)
+        for name, decode in [
+            ("previous", previous_decode),
+            ("current", current_decode),
+        ]:
+            peak, duration = measure(decode, frames, max_size=2 * size)
+            print(f"{size:>8}  {name:>14}  {peak / 1024:>9.1f}  {duration * 1e6:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure decoding allocations.")
+    parser.add_argument(
+        "--count",
+        type=int,
+        default=1000,
+        help="1 KiB messages to decode; 1 MiB messages are 100 times fewer",
+    )
+    main(parser.parse_args())
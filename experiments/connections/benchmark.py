@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+"""
+Measure memory and CPU used by idle connections on a server.
+
+The server runs in a child process. The benchmark opens connections over
+loopback from the parent process, lets them idle, and reports, per
+connection:
+
+- memory: growth of the resident set size of the server process;
+- CPU: CPU time of the server process while connections are idle, which
+  includes keepalive pings;
+- tasks: number of asyncio tasks running on the server.
+
+Opening many connections requires raising the limit of open files, for
+example with ``ulimit -n 250000``. Connection counts above the hard limit
+are skipped. Each source address provides about 28k
+ephemeral ports on Linux, so clients connect from several addresses in
+127.0.0.0/8.
+
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import time
+
+import websockets
+
+
+CONNECTIONS_PER_ADDRESS = 20000
+
+
+def rss():
+    """
+    Return the resident set size of the current process in bytes.
+
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:  # not Linux; maxrss is a high-water mark
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure():
+    return {
+        "rss": rss(),
+        "cpu": time.process_time(),
+        "tasks": len(asyncio.all_tasks()),
+    }
+
+
+async def handler(websocket, path):
+    await websocket.wait_closed()
+
+
+async def run_server(conn, port, ping_interval):
+    loop = asyncio.get_running_loop()
+    async with websockets.serve(
+        handler,
+        "127.0.0.1",
+        port,
+        ping_interval=ping_interval,
+        compression=None,
+        backlog=4096,
+    ) as server:
+        stop = loop.create_future()
+
+        def on_command():
+            command = conn.recv()
+            if command == "stop":
+                stop.set_result(None)
+            else:
+                conn.send(dict(measure(), connections=len(server.websockets)))
+
+        loop.add_reader(conn.fileno(), on_command)
+        conn.send("ready")
+        await stop
+
+
+def server_process(conn, port, ping_interval):
+    asyncio.run(run_server(conn, port, ping_interval))
+
+
+async def open_connections(port, count, concurrency=500):
+    clients = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def connect(index):
+        host = f"127.0.0.{2 + index // CONNECTIONS_PER_ADDRESS}"
+        async with semaphore:
+            clients.append(
+                await websockets.connect(
+                    f"ws://127.0.0.1:{port}/",
+                    local_addr=(host, 0),
+                    ping_interval=None,
+                    compression=None,
+                )
+            )
+
+    await asyncio.gather(*[connect(index) for index in range(count)])
+    return clients
+
+
+async def benchmark(conn, port, count, idle):
+    conn.send("measure")
+    before = conn.recv()
+
+    clients = await open_connections(port, count)
+
+    conn.send("measure")
+    opened = conn.recv()
+    await asyncio.sleep(idle)
+    conn.send("measure")
+    after = conn.recv()
+
+    await asyncio.gather(*[client.close() for client in clients])
+
+    assert opened["connections"] == count, opened
+    return {
+        "connections": count,
+        "memory": (opened["rss"] - before["rss"]) / count,
+        "cpu": (after["cpu"] - opened["cpu"]) / count / idle,
+        "tasks": (opened["tasks"] - before["tasks"]) / count,
+    }
+
+
+def main(args):
+    # Clients and server run in separate processes; each holds one file
+    # descriptor per connection. The server process inherits the limit.
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = max(args.connections) + 100
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+
+    print(f"ping_interval = {args.ping_interval}, idle = {args.idle}s")
+    print(f"{'connections':>11}  {'memory KiB':>10}  {'CPU µs/s':>9}  {'tasks':>5}")
+    for count in args.connections:
+        if count + 100 > hard:
+            print(f"{count:>11}  skipped: open files limited to {hard}")
+            continue
+        # Start a fresh server to avoid measuring memory held by the allocator.
+        conn, child_conn = multiprocessing.Pipe()
+        server = multiprocessing.Process(
+            target=server_process,
+            args=(child_conn, args.port, args.ping_interval),
+        )
+        server.start()
+        assert conn.recv() == "ready"
+        try:
+            result = asyncio.run(benchmark(conn, args.port, count, args.idle))
+        finally:
+            conn.send("stop")
+            server.join()
+        print(
+            f"{result['connections']:>11}  "
+            f"{result['memory'] / 1024:>10.2f}  "
+            f"{result['cpu'] * 1e6:>9.2f}  "
+            f"{result['tasks']:>5.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure idle connections.")
+    parser.add_argument(
+        "--connections",
+        type=int,
+        nargs="+",
+        default=[10000, 50000, 100000],
+        help="numbers of connections (default: 10k, 50k, and 100k)",
+    )
+    parser.add_argument(
+        "--idle",
+        type=float,
+        default=60,
+        help="duration of the idle period in seconds (default: 60)",
+    )
+    parser.add_argument(
+        "--ping-interval",
+        type=float,
+        default=20,
+        help="ping_interval of the server in seconds (default: 20)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help="port of the server (default: 8765)",
+    )
+    main(parser.parse_args())
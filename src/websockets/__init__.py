@@ -16,6 +16,7 @@ __all__ = [  # noqa
     "DuplicateParameter",
     "ExtensionName",
     "ExtensionParameter",
+    "Fanout",
     "InvalidHandshake",
     "InvalidHeader",
     "InvalidHeaderFormat",
@@ -38,15 +39,20 @@ __all__ = [  # noqa
     "RedirectHandshake",
     "SecurityError",
     "serve",
+    "serve_multi",
+    "serve_threaded",
     "ServerConnection",
     "Subprotocol",
+    "ThreadedWebSocketServer",
     "unix_connect",
     "unix_serve",
+    "UnixSocketFanout",
     "WebSocketClientProtocol",
     "WebSocketCommonProtocol",
     "WebSocketException",
     "WebSocketProtocolError",
     "WebSocketServer",
+    "WebSocketServerPool",
     "WebSocketServerProtocol",
     "WebSocketURI",
 ]
@@ -58,6 +64,8 @@ lazy_import(
         "basic_auth_protocol_factory": ".legacy.auth",
         "BasicAuthWebSocketServerProtocol": ".legacy.auth",
         "broadcast": ".legacy.protocol",
+        "Fanout": ".legacy.fanout",
+        "UnixSocketFanout": ".legacy.fanout",
         "ClientConnection": ".client",
         "connect": ".legacy.client",
         "unix_connect": ".legacy.client",
@@ -93,9 +101,13 @@ lazy_import(
         "WebSocketCommonProtocol": ".legacy.protocol",
         "ServerConnection": ".server",
         "serve": ".legacy.server",
+        "serve_multi": ".legacy.server",
+        "serve_threaded": ".legacy.server",
+        "ThreadedWebSocketServer": ".legacy.server",
         "unix_serve": ".legacy.server",
         "WebSocketServerProtocol": ".legacy.server",
         "WebSocketServer": ".legacy.server",
+        "WebSocketServerPool": ".legacy.server",
         "Data": ".typing",
         "LoggerLike": ".typing",
         "Origin": ".typing",
@@ -279,6 +279,7 @@ class ClientConnection(Connection):
                 self.reader.read_line,
                 self.reader.read_exact,
                 self.reader.read_to_eof,
+                read_until=self.reader.read_until,
             )
 
             if self.debug:
@@ -81,14 +81,15 @@ class Headers(MutableMapping[str, str]):
         self.update(*args, **kwargs)
 
     def __str__(self) -> str:
-        return "".join(f"{key}: {value}\r\n" for key, value in self._list) + "\r\n"
+        # A list comprehension is faster than a generator expression here.
+        return "".join([f"{key}: {value}\r\n" for key, value in self._list] + ["\r\n"])
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}({self._list!r})"
 
     def copy(self) -> Headers:
         copy = self.__class__()
-        copy._dict = self._dict.copy()
+        copy._dict = {key: values.copy() for key, values in self._dict.items()}
         copy._list = self._list.copy()
         return copy
 
@@ -144,10 +145,39 @@ class Headers(MutableMapping[str, str]):
         Update from a Headers instance and/or keyword arguments.
 
         """
-        args = tuple(
-            arg.raw_items() if isinstance(arg, Headers) else arg for arg in args
-        )
-        super().update(*args, **kwargs)
+        # Like MutableMapping.update, but add all headers in one pass rather
+        # than calling __setitem__ for each header.
+        if len(args) > 1:
+            raise TypeError(f"update expected at most 1 argument, got {len(args)}")
+        if args:
+            arg = args[0]
+            if isinstance(arg, Headers):
+                # Make a copy in case arg is self.
+                self._extend(arg._list.copy())
+            elif isinstance(arg, Mapping):
+                self._extend(arg.items())
+            elif hasattr(arg, "keys"):
+                super().update(arg)
+            else:
+                self._extend(arg)
+        if kwargs:
+            self._extend(kwargs.items())
+
+    def _extend(self, items: Iterable[Tuple[str, str]]) -> None:
+        """
+        Add headers from an iterable of ``(name, value)`` pairs.
+
+        """
+        _dict = self._dict
+        _list = self._list
+        for key, value in items:
+            key_lower = key.lower()
+            values = _dict.get(key_lower)
+            if values is None:
+                _dict[key_lower] = [value]
+            else:
+                values.append(value)
+            _list.append((key, value))
 
     # Methods for handling multiple values
 
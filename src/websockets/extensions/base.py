@@ -25,6 +25,14 @@ class Extension:
 
     """
 
+    # Compression extensions set the RSV1 bit, which prevents negotiating
+    # several of them, and don't apply to messages sent with compress=False.
+    compresses = False
+
+    # Extensions that set this flag receive the state of the write buffer
+    # before each message in observe_write_buffer().
+    observes_write_buffer = False
+
     @property
     def name(self) -> ExtensionName:
         """
@@ -54,6 +62,28 @@ class Extension:
 
         """
 
+    def release_idle_state(self) -> None:
+        """
+        Release state that isn't needed while the connection is idle.
+
+        This method is called periodically. It's optional to implement it.
+
+        """
+
+    def observe_write_buffer(self, size: int, low: int, high: int) -> None:
+        """
+        Receive the state of the write buffer before sending a message.
+
+        This method is called before each message when the
+        ``observes_write_buffer`` attribute is ``True``. It's optional to
+        implement it.
+
+        :param size: current size of the write buffer in bytes
+        :param low: low-water limit of the write buffer in bytes
+        :param high: high-water limit of the write buffer in bytes
+
+        """
+
 
 class ClientExtensionFactory:
     """
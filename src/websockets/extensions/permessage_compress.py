@@ -0,0 +1,371 @@
+"""
+:mod:`websockets.extensions.permessage_compress` implements private
+compression extensions with pluggable codecs.
+
+These extensions aren't standardized. They're intended for connections where
+you control both endpoints, for example between your own services, and you
+want a faster codec than Deflate.
+
+Like Per-Message Deflate, they set the RSV1 bit on the first frame of
+compressed messages. Unlike Per-Message Deflate, they compress each frame
+independently, without retaining a compression context between frames.
+
+"""
+
+from __future__ import annotations
+
+import abc
+import dataclasses
+import zlib
+from typing import List, Optional, Sequence, Tuple
+
+from .. import exceptions, frames
+from ..typing import ExtensionName, ExtensionParameter
+from .base import ClientExtensionFactory, Extension, ServerExtensionFactory
+
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore
+
+
+__all__ = [
+    "Codec",
+    "ZlibCodec",
+    "ZstdCodec",
+    "PerMessageCompress",
+    "ClientPerMessageCompressFactory",
+    "ServerPerMessageCompressFactory",
+]
+
+
+class Codec(abc.ABC):
+    """
+    Abstract class for compression algorithms.
+
+    The name of the extension is ``x-permessage-`` followed by the name of the
+    codec. Both endpoints must use the same codec with compatible settings.
+
+    """
+
+    name: str
+
+    @abc.abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compress data.
+
+        :param data: payload of an outgoing frame
+
+        """
+
+    @abc.abstractmethod
+    def decompress(self, data: bytes, max_size: Optional[int] = None) -> bytes:
+        """
+        Decompress data.
+
+        :param data: payload of an incoming frame
+        :param max_size: maximum size of decompressed data in bytes
+        :raises ~websockets.exceptions.PayloadTooBig: if decompressed data
+            exceeds ``max_size``
+        :raises ~websockets.exceptions.ProtocolError: if data is corrupted
+
+        """
+
+
+class ZlibCodec(Codec):
+    """
+    Codec based on :mod:`zlib`.
+
+    It's always available, which makes it suitable as a fallback and for
+    testing.
+
+    :param level: compression level, see :func:`zlib.compressobj`
+    :param wbits: base two logarithm of the window size, between 9 and 15
+
+    """
+
+    name = "zlib"
+
+    def __init__(self, level: int = zlib.Z_DEFAULT_COMPRESSION, wbits: int = 15):
+        if not 9 <= wbits <= 15:
+            raise ValueError("wbits must be between 9 and 15")
+        self.level = level
+        self.wbits = wbits
+
+    def compress(self, data: bytes) -> bytes:
+        encoder = zlib.compressobj(self.level, wbits=-self.wbits)
+        return encoder.compress(data) + encoder.flush()
+
+    def decompress(self, data: bytes, max_size: Optional[int] = None) -> bytes:
+        decoder = zlib.decompressobj(wbits=-self.wbits)
+        # Decompress at most one byte beyond max_size to detect overflows.
+        max_length = 0 if max_size is None else max_size + 1
+        try:
+            data = decoder.decompress(data, max_length)
+        except zlib.error as exc:
+            raise exceptions.ProtocolError("invalid compressed data") from exc
+        if max_size is not None and len(data) > max_size:
+            raise exceptions.PayloadTooBig(f"over size limit (? > {max_size} bytes)")
+        if not decoder.eof:
+            raise exceptions.ProtocolError("truncated compressed data")
+        return data
+
+
+class ZstdCodec(Codec):
+    """
+    Codec based on Zstandard_.
+
+    .. _Zstandard: https://facebook.github.io/zstd/
+
+    It requires the zstandard_ package.
+
+    .. _zstandard: https://pypi.org/project/zstandard/
+
+    :param level: compression level
+    :raises ImportError: if zstandard isn't installed
+
+    """
+
+    name = "zstd"
+
+    def __init__(self, level: int = 3):
+        if zstandard is None:  # pragma: no cover
+            raise ImportError("ZstdCodec requires the zstandard package")
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        # Compressors aren't thread-safe and codecs are shared between
+        # connections. Like ZlibCodec, create a compressor for each frame.
+        compressor = zstandard.ZstdCompressor(level=self.level)
+        return compressor.compress(data)
+
+    def decompress(self, data: bytes, max_size: Optional[int] = None) -> bytes:
+        try:
+            # Check the size declared in the frame header before allocating.
+            # Decompressing stops if it doesn't match the declared size.
+            content_size = zstandard.frame_content_size(data)
+            if content_size == -1 and max_size is not None:
+                # When the size isn't declared, decompress incrementally to
+                # check it before decompressing again in a single call.
+                size = 0
+                decompressor = zstandard.ZstdDecompressor()
+                for chunk in decompressor.read_to_iter(data):
+                    size += len(chunk)
+                    if size > max_size:
+                        raise exceptions.PayloadTooBig(
+                            f"over size limit (? > {max_size} bytes)"
+                        )
+            elif max_size is not None and content_size > max_size:
+                raise exceptions.PayloadTooBig(
+                    f"over size limit ({content_size} > {max_size} bytes)"
+                )
+            decoder = zstandard.ZstdDecompressor().decompressobj()
+            data = decoder.decompress(data)
+        except zstandard.ZstdError as exc:
+            raise exceptions.ProtocolError("invalid compressed data") from exc
+        if not decoder.eof:
+            raise exceptions.ProtocolError("truncated compressed data")
+        return data
+
+
+def _check_rsv1(
+    name: ExtensionName,
+    accepted_extensions: Sequence[Extension],
+) -> None:
+    """
+    Prevent negotiating two compression extensions.
+
+    They would both use the RSV1 bit.
+
+    """
+    if any(other.name == name for other in accepted_extensions):
+        raise exceptions.NegotiationError(f"duplicate {name}")
+    # Extensions aren't required to inherit Extension.
+    if any(getattr(other, "compresses", False) for other in accepted_extensions):
+        raise exceptions.NegotiationError(f"{name} conflicts with another extension")
+
+
+class PerMessageCompress(Extension):
+    """
+    Per-Message Compress extension.
+
+    """
+
+    compresses = True
+
+    def __init__(self, codec: Codec, compress_min_size: int = 0) -> None:
+        """
+        Configure the Per-Message Compress extension.
+
+        """
+        self.codec = codec
+        self.compress_min_size = compress_min_size
+
+        # To handle continuation frames properly, we must keep track of
+        # whether that initial frame was encoded.
+        self.decode_cont_data = False
+        self.encode_cont_data = False
+
+    @property
+    def name(self) -> ExtensionName:
+        return ExtensionName(f"x-permessage-{self.codec.name}")
+
+    def __repr__(self) -> str:
+        return f"PerMessageCompress(codec={self.codec.name})"
+
+    def decode(
+        self,
+        frame: frames.Frame,
+        *,
+        max_size: Optional[int] = None,
+    ) -> frames.Frame:
+        """
+        Decode an incoming frame.
+
+        """
+        # Skip control frames.
+        if frame.opcode in frames.CTRL_OPCODES:
+            return frame
+
+        # Handle continuation data frames:
+        # - skip if the message isn't encoded
+        # - reset "decode continuation data" flag if it's a final frame
+        if frame.opcode is frames.OP_CONT:
+            if not self.decode_cont_data:
+                return frame
+            if frame.fin:
+                self.decode_cont_data = False
+
+        # Handle text and binary data frames:
+        # - skip if the message isn't encoded
+        # - set "decode continuation data" flag if it's a non-final frame
+        else:
+            if not frame.rsv1:
+                return frame
+            if not frame.fin:
+                self.decode_cont_data = True
+
+        data = self.codec.decompress(frame.data, max_size)
+
+        # Unset the rsv1 flag on the first frame of a compressed message.
+        return dataclasses.replace(frame, data=data, rsv1=False)
+
+    def encode(self, frame: frames.Frame) -> frames.Frame:
+        """
+        Encode an outgoing frame.
+
+        """
+        # Skip control frames.
+        if frame.opcode in frames.CTRL_OPCODES:
+            return frame
+
+        # Handle continuation data frames:
+        # - skip if the message isn't encoded
+        # - reset "encode continuation data" flag if it's a final frame
+        if frame.opcode is frames.OP_CONT:
+            if not self.encode_cont_data:
+                return frame
+            if frame.fin:
+                self.encode_cont_data = False
+
+        # Handle text and binary data frames:
+        # - skip if the message isn't worth compressing
+        # - set "encode continuation data" flag if it's a non-final frame
+        else:
+            if len(frame.data) < self.compress_min_size:
+                return frame
+            if not frame.fin:
+                self.encode_cont_data = True
+
+        data = self.codec.compress(frame.data)
+
+        # Set the rsv1 flag on the first frame of a compressed message.
+        rsv1 = frame.opcode is not frames.OP_CONT
+        return dataclasses.replace(frame, data=data, rsv1=rsv1)
+
+
+class ClientPerMessageCompressFactory(ClientExtensionFactory):
+    """
+    Client-side extension factory for the Per-Message Compress extension.
+
+    :param codec: compression algorithm
+    :param compress_min_size: don't compress messages whose first frame is
+        smaller than this many bytes, defaults to ``0``
+
+    """
+
+    def __init__(self, codec: Codec, compress_min_size: int = 0) -> None:
+        """
+        Configure the Per-Message Compress extension factory.
+
+        """
+        self.codec = codec
+        self.compress_min_size = compress_min_size
+
+    @property
+    def name(self) -> ExtensionName:
+        return ExtensionName(f"x-permessage-{self.codec.name}")
+
+    def get_request_params(self) -> List[ExtensionParameter]:
+        """
+        Build request parameters.
+
+        """
+        return []
+
+    def process_response_params(
+        self,
+        params: Sequence[ExtensionParameter],
+        accepted_extensions: Sequence[Extension],
+    ) -> PerMessageCompress:
+        """
+        Process response parameters.
+
+        Return an extension instance.
+
+        """
+        _check_rsv1(self.name, accepted_extensions)
+        for name, _ in params:
+            raise exceptions.InvalidParameterName(name)
+        return PerMessageCompress(self.codec, self.compress_min_size)
+
+
+class ServerPerMessageCompressFactory(ServerExtensionFactory):
+    """
+    Server-side extension factory for the Per-Message Compress extension.
+
+    :param codec: compression algorithm
+    :param compress_min_size: don't compress messages whose first frame is
+        smaller than this many bytes, defaults to ``0``
+
+    """
+
+    def __init__(self, codec: Codec, compress_min_size: int = 0) -> None:
+        """
+        Configure the Per-Message Compress extension factory.
+
+        """
+        self.codec = codec
+        self.compress_min_size = compress_min_size
+
+    @property
+    def name(self) -> ExtensionName:
+        return ExtensionName(f"x-permessage-{self.codec.name}")
+
+    def process_request_params(
+        self,
+        params: Sequence[ExtensionParameter],
+        accepted_extensions: Sequence[Extension],
+    ) -> Tuple[List[ExtensionParameter], PerMessageCompress]:
+        """
+        Process request parameters.
+
+        Return response params and an extension instance.
+
+        """
+        _check_rsv1(self.name, accepted_extensions)
+        for name, _ in params:
+            raise exceptions.InvalidParameterName(name)
+        return [], PerMessageCompress(self.codec, self.compress_min_size)
@@ -7,8 +7,9 @@ Extensions for WebSocket as specified in :rfc:`7692`.
 from __future__ import annotations
 
 import dataclasses
+import time
 import zlib
-from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union, cast
 
 from .. import exceptions, frames
 from ..typing import ExtensionName, ExtensionParameter
@@ -27,6 +28,22 @@ _EMPTY_UNCOMPRESSED_BLOCK = b"\x00\x00\xff\xff"
 
 _MAX_WINDOW_BITS_VALUES = [str(bits) for bits in range(8, 16)]
 
+# Signatures of common file formats that are already compressed.
+_INCOMPRESSIBLE_SIGNATURES = (
+    b"\x1f\x8b",  # gzip
+    b"\x28\xb5\x2f\xfd",  # zstd
+    b"BZh",  # bzip2
+    b"\xfd7zXZ\x00",  # xz
+    b"7z\xbc\xaf\x27\x1c",  # 7z
+    b"PK\x03\x04",  # zip and zip-based formats
+    b"\x89PNG\r\n\x1a\n",  # PNG
+    b"\xff\xd8\xff",  # JPEG
+    b"GIF87a",  # GIF
+    b"GIF89a",  # GIF
+    b"OggS",  # Ogg
+    b"wOF2",  # WOFF2
+)
+
 
 class PerMessageDeflate(Extension):
     """
@@ -36,6 +53,8 @@ class PerMessageDeflate(Extension):
 
     name = ExtensionName("permessage-deflate")
 
+    compresses = True
+
     def __init__(
         self,
         remote_no_context_takeover: bool,
@@ -43,6 +62,11 @@ class PerMessageDeflate(Extension):
         remote_max_window_bits: int,
         local_max_window_bits: int,
         compress_settings: Optional[Dict[Any, Any]] = None,
+        zdict: Optional[bytes] = None,
+        encoder_idle_timeout: Optional[float] = None,
+        compress_min_size: int = 0,
+        skip_incompressible: bool = False,
+        adaptive_compress_level: Optional[int] = None,
     ) -> None:
         """
         Configure the Per-Message Deflate extension.
@@ -56,26 +80,44 @@ class PerMessageDeflate(Extension):
         assert 8 <= remote_max_window_bits <= 15
         assert 8 <= local_max_window_bits <= 15
         assert "wbits" not in compress_settings
+        assert "zdict" not in compress_settings
 
         self.remote_no_context_takeover = remote_no_context_takeover
         self.local_no_context_takeover = local_no_context_takeover
         self.remote_max_window_bits = remote_max_window_bits
         self.local_max_window_bits = local_max_window_bits
         self.compress_settings = compress_settings
+        self.zdict = zdict
+        self.encoder_idle_timeout = encoder_idle_timeout
+        self.compress_min_size = compress_min_size
+        self.skip_incompressible = skip_incompressible
+        self.adaptive_compress_level = adaptive_compress_level
+        self.observes_write_buffer = adaptive_compress_level is not None
+
+        # The compression level may change between messages. The new level
+        # takes effect at the beginning of the next compressed message.
+        self.configured_compress_level = compress_settings.get(
+            "level", zlib.Z_DEFAULT_COMPRESSION
+        )
+        self.pending_compress_level: Optional[int] = None
+
+        # With context takeover, the encoder may be released when it's idle.
+        # Then, a new encoder is created for the next message. This is always
+        # safe because the decoder of the remote endpoint doesn't need to know
+        # that the compressor didn't reference data from previous messages.
+        self.encoder_released = False
+        self.encoder_last_used = time.monotonic()
 
         if not self.remote_no_context_takeover:
-            self.decoder = zlib.decompressobj(wbits=-self.remote_max_window_bits)
+            self.decoder = self._make_decoder()
 
         if not self.local_no_context_takeover:
-            self.encoder = zlib.compressobj(
-                wbits=-self.local_max_window_bits, **self.compress_settings
-            )
+            self.encoder = self._make_encoder()
 
         # To handle continuation frames properly, we must keep track of
         # whether that initial frame was encoded.
         self.decode_cont_data = False
-        # There's no need for self.encode_cont_data because we always encode
-        # outgoing frames, so it would always be True.
+        self.encode_cont_data = False
 
     def __repr__(self) -> str:
         return (
@@ -86,6 +128,37 @@ class PerMessageDeflate(Extension):
             f"local_max_window_bits={self.local_max_window_bits})"
         )
 
+    def _make_decoder(self) -> Any:
+        """
+        Create a decompression object for incoming messages.
+
+        """
+        if self.zdict is None:
+            return zlib.decompressobj(wbits=-self.remote_max_window_bits)
+        else:
+            return zlib.decompressobj(
+                wbits=-self.remote_max_window_bits, zdict=self.zdict
+            )
+
+    def _make_encoder(self) -> Any:
+        """
+        Create a compression object for outgoing messages.
+
+        """
+        # After releasing the encoder, don't use the preset dictionary, else
+        # the encoder could reference it while the decoder of the remote
+        # endpoint holds the end of the previous message in its window.
+        if self.zdict is None or self.encoder_released:
+            return zlib.compressobj(
+                wbits=-self.local_max_window_bits, **self.compress_settings
+            )
+        else:
+            return zlib.compressobj(
+                wbits=-self.local_max_window_bits,
+                zdict=self.zdict,
+                **self.compress_settings,
+            )
+
     def decode(
         self,
         frame: frames.Frame,
@@ -111,35 +184,51 @@ class PerMessageDeflate(Extension):
 
         # Handle text and binary data frames:
         # - skip if the message isn't encoded
-        # - unset the rsv1 flag on the first frame of a compressed message
         # - set "decode continuation data" flag if it's a non-final frame
         else:
             if not frame.rsv1:
                 return frame
-            frame = dataclasses.replace(frame, rsv1=False)
             if not frame.fin:
                 self.decode_cont_data = True
 
             # Re-initialize per-message decoder.
             if self.remote_no_context_takeover:
-                self.decoder = zlib.decompressobj(wbits=-self.remote_max_window_bits)
+                self.decoder = self._make_decoder()
 
         # Uncompress data. Protect against zip bombs by preventing zlib from
         # decompressing more than max_length bytes (except when the limit is
         # disabled with max_size = None).
-        data = frame.data
-        if frame.fin:
-            data += _EMPTY_UNCOMPRESSED_BLOCK
+        decoder = self.decoder
         max_length = 0 if max_size is None else max_size
-        data = self.decoder.decompress(data, max_length)
-        if self.decoder.unconsumed_tail:
+        data = decoder.decompress(frame.data, max_length)
+        if decoder.unconsumed_tail:
             raise exceptions.PayloadTooBig(f"over size limit (? > {max_size} bytes)")
 
+        # Feed the trailer separately rather than appending it to the payload,
+        # which would copy the payload. It doesn't produce data in practice.
+        if frame.fin:
+            if max_size is None:
+                tail = decoder.decompress(_EMPTY_UNCOMPRESSED_BLOCK)
+            else:
+                tail = decoder.decompress(
+                    _EMPTY_UNCOMPRESSED_BLOCK, max_size - len(data) + 1
+                )
+            if tail:
+                data += tail
+                if max_size is not None and len(data) > max_size:
+                    raise exceptions.PayloadTooBig(
+                        f"over size limit (? > {max_size} bytes)"
+                    )
+
         # Allow garbage collection of the decoder if it won't be reused.
         if frame.fin and self.remote_no_context_takeover:
             del self.decoder
 
-        return dataclasses.replace(frame, data=data)
+        # Unset the rsv1 flag on the first frame of a compressed message.
+        # Creating the frame directly is faster than dataclasses.replace().
+        return frames.Frame(
+            frame.opcode, data, frame.fin, False, frame.rsv2, frame.rsv3
+        )
 
     def encode(self, frame: frames.Frame) -> frames.Frame:
         """
@@ -150,17 +239,47 @@ class PerMessageDeflate(Extension):
         if frame.opcode in frames.CTRL_OPCODES:
             return frame
 
-        # Since we always encode messages, there's no "encode continuation
-        # data" flag similar to "decode continuation data" at this time.
+        # Handle continuation data frames:
+        # - skip if the message isn't encoded
+        # - reset "encode continuation data" flag if it's a final frame
+        if frame.opcode is frames.OP_CONT:
+            if not self.encode_cont_data:
+                return frame
+            if frame.fin:
+                self.encode_cont_data = False
 
-        if frame.opcode is not frames.OP_CONT:
-            # Set the rsv1 flag on the first frame of a compressed message.
+        # Handle text and binary data frames:
+        # - skip if the message isn't worth compressing
+        # - set the rsv1 flag on the first frame of a compressed message
+        # - set "encode continuation data" flag if it's a non-final frame
+        else:
+            if len(frame.data) < self.compress_min_size:
+                return frame
+            if (
+                self.skip_incompressible
+                and frame.opcode is frames.OP_BINARY
+                and bytes(frame.data[:8]).startswith(_INCOMPRESSIBLE_SIGNATURES)
+            ):
+                return frame
             frame = dataclasses.replace(frame, rsv1=True)
+            if not frame.fin:
+                self.encode_cont_data = True
+
+            # Apply a change of compression level.
+            if self.pending_compress_level is not None:
+                self._apply_compress_level(self.pending_compress_level)
+
             # Re-initialize per-message decoder.
             if self.local_no_context_takeover:
-                self.encoder = zlib.compressobj(
-                    wbits=-self.local_max_window_bits, **self.compress_settings
-                )
+                self.encoder = self._make_encoder()
+
+        # Re-initialize encoder if it was released while idle.
+        if self.encoder_released:
+            self.encoder = self._make_encoder()
+            self.encoder_released = False
+
+        if self.encoder_idle_timeout is not None:
+            self.encoder_last_used = time.monotonic()
 
         # Compress data.
         data = self.encoder.compress(frame.data) + self.encoder.flush(zlib.Z_SYNC_FLUSH)
@@ -173,6 +292,105 @@ class PerMessageDeflate(Extension):
 
         return dataclasses.replace(frame, data=data)
 
+    def release_idle_state(self) -> None:
+        """
+        Release the encoder if it has been idle for ``encoder_idle_timeout``.
+
+        """
+        if (
+            self.encoder_idle_timeout is None
+            or self.local_no_context_takeover
+            or self.encoder_released
+        ):
+            return
+
+        if time.monotonic() - self.encoder_last_used >= self.encoder_idle_timeout:
+            del self.encoder
+            self.encoder_released = True
+
+    @property
+    def compress_level(self) -> int:
+        """
+        Compression level for the next message.
+
+        """
+        if self.pending_compress_level is not None:
+            return self.pending_compress_level
+        return cast(
+            int, self.compress_settings.get("level", zlib.Z_DEFAULT_COMPRESSION)
+        )
+
+    def set_compress_level(self, level: int) -> None:
+        """
+        Change the compression level, starting with the next message.
+
+        With context takeover, changing the level resets the compression
+        context, which degrades the compression rate of the next message.
+
+        :param level: compression level, between 0 and 9, or -1 for the
+            default of :mod:`zlib`
+        :raises ValueError: if ``level`` is out of range
+
+        """
+        if not -1 <= level <= 9:
+            raise ValueError("compression level must be between -1 and 9")
+        self.pending_compress_level = level
+
+    def _apply_compress_level(self, level: int) -> None:
+        """
+        Reconfigure the encoder with a new compression level.
+
+        This must be called at the beginning of a message.
+
+        """
+        self.pending_compress_level = None
+        if level == self.compress_settings.get("level", zlib.Z_DEFAULT_COMPRESSION):
+            return
+        # Don't mutate compress_settings, which is shared with the factory.
+        self.compress_settings = dict(self.compress_settings, level=level)
+        # Like after an idle timeout, the encoder will be re-initialized.
+        if not self.local_no_context_takeover and not self.encoder_released:
+            del self.encoder
+            self.encoder_released = True
+
+    def observe_write_buffer(self, size: int, low: int, high: int) -> None:
+        """
+        Adapt the compression level to the size of the write buffer.
+
+        When the write buffer drains below the low-water limit, the network
+        keeps up and compression is CPU-bound: switch to the faster
+        ``adaptive_compress_level``. When it fills above the high-water
+        limit, the network is the bottleneck: switch back to the configured
+        level. In between, keep the current level, to avoid resetting the
+        compression context too often.
+
+        """
+        if self.adaptive_compress_level is None:
+            return
+
+        if size <= low:
+            self.set_compress_level(self.adaptive_compress_level)
+        elif size >= high:
+            self.set_compress_level(self.configured_compress_level)
+
+    @property
+    def memory_usage(self) -> int:
+        """
+        Estimate the memory allocated by :mod:`zlib` for this extension.
+
+        This excludes small allocations. It's a rough guide for measuring the
+        effect of compression settings on memory usage.
+
+        """
+        usage = 0
+        if hasattr(self, "decoder"):
+            usage += 1 << self.remote_max_window_bits
+        if hasattr(self, "encoder"):
+            mem_level = self.compress_settings.get("memLevel", zlib.DEF_MEM_LEVEL)
+            usage += 1 << (self.local_max_window_bits + 2)
+            usage += 1 << (mem_level + 9)
+        return usage
+
 
 def _build_parameters(
     server_no_context_takeover: bool,
@@ -260,6 +478,21 @@ def _extract_parameters(
     )
 
 
+def _check_rsv1(
+    name: ExtensionName,
+    accepted_extensions: Sequence[Extension],
+) -> None:
+    """
+    Prevent negotiating another compression extension.
+
+    It would also use the RSV1 bit.
+
+    """
+    # Extensions aren't required to inherit Extension.
+    if any(getattr(other, "compresses", False) for other in accepted_extensions):
+        raise exceptions.NegotiationError(f"{name} conflicts with another extension")
+
+
 class ClientPerMessageDeflateFactory(ClientExtensionFactory):
     """
     Client-side extension factory for the Per-Message Deflate extension.
@@ -275,7 +508,19 @@ class ClientPerMessageDeflateFactory(ClientExtensionFactory):
     :param server_max_window_bits: optional, defaults to ``None``
     :param client_max_window_bits: optional, defaults to ``None``
     :param compress_settings: optional, keyword arguments for
-        :func:`zlib.compressobj`, excluding ``wbits``
+        :func:`zlib.compressobj`, excluding ``wbits`` and ``zdict``
+    :param zdict: optional, preset dictionary for compression and
+        decompression; the other side must be configured with the same
+        dictionary because it isn't negotiated
+    :param encoder_idle_timeout: optional, release the compression context
+        when no message was sent for this many seconds, defaults to ``None``
+    :param compress_min_size: don't compress messages whose first frame is
+        smaller than this many bytes, defaults to ``0``
+    :param skip_incompressible: don't compress binary messages that start
+        with the signature of a compressed file format such as gzip, PNG, or
+        JPEG, defaults to ``False``
+    :param adaptive_compress_level: optional, compression level used while
+        the write buffer drains quickly, defaults to ``None``
 
     """
 
@@ -288,6 +533,11 @@ class ClientPerMessageDeflateFactory(ClientExtensionFactory):
         server_max_window_bits: Optional[int] = None,
         client_max_window_bits: Optional[Union[int, bool]] = None,
         compress_settings: Optional[Dict[str, Any]] = None,
+        zdict: Optional[bytes] = None,
+        encoder_idle_timeout: Optional[float] = None,
+        compress_min_size: int = 0,
+        skip_incompressible: bool = False,
+        adaptive_compress_level: Optional[int] = None,
     ) -> None:
         """
         Configure the Per-Message Deflate extension factory.
@@ -306,12 +556,25 @@ class ClientPerMessageDeflateFactory(ClientExtensionFactory):
                 "compress_settings must not include wbits, "
                 "set client_max_window_bits instead"
             )
+        if compress_settings is not None and "zdict" in compress_settings:
+            raise ValueError(
+                "compress_settings must not include zdict, set zdict instead"
+            )
+        if adaptive_compress_level is not None and not (
+            -1 <= adaptive_compress_level <= 9
+        ):
+            raise ValueError("adaptive_compress_level must be between -1 and 9")
 
         self.server_no_context_takeover = server_no_context_takeover
         self.client_no_context_takeover = client_no_context_takeover
         self.server_max_window_bits = server_max_window_bits
         self.client_max_window_bits = client_max_window_bits
         self.compress_settings = compress_settings
+        self.zdict = zdict
+        self.encoder_idle_timeout = encoder_idle_timeout
+        self.compress_min_size = compress_min_size
+        self.skip_incompressible = skip_incompressible
+        self.adaptive_compress_level = adaptive_compress_level
 
     def get_request_params(self) -> List[ExtensionParameter]:
         """
@@ -338,6 +601,7 @@ class ClientPerMessageDeflateFactory(ClientExtensionFactory):
         """
         if any(other.name == self.name for other in accepted_extensions):
             raise exceptions.NegotiationError(f"received duplicate {self.name}")
+        _check_rsv1(self.name, accepted_extensions)
 
         # Request parameters are available in instance variables.
 
@@ -428,6 +692,11 @@ class ClientPerMessageDeflateFactory(ClientExtensionFactory):
             server_max_window_bits or 15,  # remote_max_window_bits
             client_max_window_bits or 15,  # local_max_window_bits
             self.compress_settings,
+            self.zdict,
+            self.encoder_idle_timeout,
+            self.compress_min_size,
+            self.skip_incompressible,
+            self.adaptive_compress_level,
         )
 
 
@@ -473,7 +742,19 @@ class ServerPerMessageDeflateFactory(ServerExtensionFactory):
     :param server_max_window_bits: optional, defaults to ``None``
     :param client_max_window_bits: optional, defaults to ``None``
     :param compress_settings: optional, keyword arguments for
-        :func:`zlib.compressobj`, excluding ``wbits``
+        :func:`zlib.compressobj`, excluding ``wbits`` and ``zdict``
+    :param zdict: optional, preset dictionary for compression and
+        decompression; the other side must be configured with the same
+        dictionary because it isn't negotiated
+    :param encoder_idle_timeout: optional, release the compression context
+        when no message was sent for this many seconds, defaults to ``None``
+    :param compress_min_size: don't compress messages whose first frame is
+        smaller than this many bytes, defaults to ``0``
+    :param skip_incompressible: don't compress binary messages that start
+        with the signature of a compressed file format such as gzip, PNG, or
+        JPEG, defaults to ``False``
+    :param adaptive_compress_level: optional, compression level used while
+        the write buffer drains quickly, defaults to ``None``
 
     """
 
@@ -486,6 +767,11 @@ class ServerPerMessageDeflateFactory(ServerExtensionFactory):
         server_max_window_bits: Optional[int] = None,
         client_max_window_bits: Optional[int] = None,
         compress_settings: Optional[Dict[str, Any]] = None,
+        zdict: Optional[bytes] = None,
+        encoder_idle_timeout: Optional[float] = None,
+        compress_min_size: int = 0,
+        skip_incompressible: bool = False,
+        adaptive_compress_level: Optional[int] = None,
     ) -> None:
         """
         Configure the Per-Message Deflate extension factory.
@@ -500,12 +786,25 @@ class ServerPerMessageDeflateFactory(ServerExtensionFactory):
                 "compress_settings must not include wbits, "
                 "set server_max_window_bits instead"
             )
+        if compress_settings is not None and "zdict" in compress_settings:
+            raise ValueError(
+                "compress_settings must not include zdict, set zdict instead"
+            )
+        if adaptive_compress_level is not None and not (
+            -1 <= adaptive_compress_level <= 9
+        ):
+            raise ValueError("adaptive_compress_level must be between -1 and 9")
 
         self.server_no_context_takeover = server_no_context_takeover
         self.client_no_context_takeover = client_no_context_takeover
         self.server_max_window_bits = server_max_window_bits
         self.client_max_window_bits = client_max_window_bits
         self.compress_settings = compress_settings
+        self.zdict = zdict
+        self.encoder_idle_timeout = encoder_idle_timeout
+        self.compress_min_size = compress_min_size
+        self.skip_incompressible = skip_incompressible
+        self.adaptive_compress_level = adaptive_compress_level
 
     def process_request_params(
         self,
@@ -520,6 +819,7 @@ class ServerPerMessageDeflateFactory(ServerExtensionFactory):
         """
         if any(other.name == self.name for other in accepted_extensions):
             raise exceptions.NegotiationError(f"skipped duplicate {self.name}")
+        _check_rsv1(self.name, accepted_extensions)
 
         # Load request parameters in local variables.
         (
@@ -616,6 +916,11 @@ class ServerPerMessageDeflateFactory(ServerExtensionFactory):
                 client_max_window_bits or 15,  # remote_max_window_bits
                 server_max_window_bits or 15,  # local_max_window_bits
                 self.compress_settings,
+                self.zdict,
+                self.encoder_idle_timeout,
+                self.compress_min_size,
+                self.skip_incompressible,
+                self.adaptive_compress_level,
             ),
         )
 
@@ -8,8 +8,19 @@ from __future__ import annotations
 
 import base64
 import binascii
+import functools
 import re
-from typing import Callable, List, Optional, Sequence, Tuple, TypeVar, cast
+from typing import (
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
 from . import exceptions
 from .typing import (
@@ -33,6 +44,9 @@ __all__ = [
     "build_www_authenticate_basic",
     "parse_authorization_basic",
     "build_authorization_basic",
+    "set_header_cache_size",
+    "HeaderCacheInfo",
+    "header_cache_info",
 ]
 
 
@@ -154,7 +168,7 @@ def parse_list(
     ``header`` is assumed not to start or end with whitespace.
 
     (This function is designed for parsing an entire header value and
-    :func:`~websockets.http.read_headers` strips whitespace from values.)
+    :func:`~websockets.http11.parse_headers` strips whitespace from values.)
 
     Return a list of items.
 
@@ -228,7 +242,11 @@ def parse_connection(header: str) -> List[ConnectionOption]:
     :raises ~websockets.exceptions.InvalidHeaderFormat: on invalid inputs.
 
     """
-    return parse_list(parse_connection_option, header, 0, "Connection")
+    return list(_cached_parse_connection(header))
+
+
+def _parse_connection(header: str) -> Tuple[ConnectionOption, ...]:
+    return tuple(parse_list(parse_connection_option, header, 0, "Connection"))
 
 
 _protocol_re = re.compile(
@@ -265,7 +283,11 @@ def parse_upgrade(header: str) -> List[UpgradeProtocol]:
     :raises ~websockets.exceptions.InvalidHeaderFormat: on invalid inputs.
 
     """
-    return parse_list(parse_upgrade_protocol, header, 0, "Upgrade")
+    return list(_cached_parse_upgrade(header))
+
+
+def _parse_upgrade(header: str) -> Tuple[UpgradeProtocol, ...]:
+    return tuple(parse_list(parse_upgrade_protocol, header, 0, "Upgrade"))
 
 
 def parse_extension_item_param(
@@ -349,12 +371,90 @@ def parse_extension(header: str) -> List[ExtensionHeader]:
     :raises ~websockets.exceptions.InvalidHeaderFormat: on invalid inputs.
 
     """
-    return parse_list(parse_extension_item, header, 0, "Sec-WebSocket-Extensions")
+    return [
+        (name, list(parameters)) for name, parameters in _cached_parse_extension(header)
+    ]
+
+
+def _parse_extension(
+    header: str,
+) -> Tuple[Tuple[ExtensionName, Tuple[ExtensionParameter, ...]], ...]:
+    return tuple(
+        (name, tuple(parameters))
+        for name, parameters in parse_list(
+            parse_extension_item, header, 0, "Sec-WebSocket-Extensions"
+        )
+    )
 
 
 parse_extension_list = parse_extension  # alias for backwards compatibility
 
 
+# Clients send few distinct values in Connection, Upgrade, and
+# Sec-WebSocket-Extensions headers, usually the defaults of their browser or
+# library. Parsing results are cached in bounded LRU caches keyed on the raw
+# header value. Cached results are tuples, which callers cannot mutate; the
+# public parsers convert them to lists. Invalid headers raise an exception and
+# aren't cached.
+
+HEADER_CACHE_SIZE = 128
+
+_cached_parse_connection = functools.lru_cache(HEADER_CACHE_SIZE)(_parse_connection)
+_cached_parse_upgrade = functools.lru_cache(HEADER_CACHE_SIZE)(_parse_upgrade)
+_cached_parse_extension = functools.lru_cache(HEADER_CACHE_SIZE)(_parse_extension)
+
+
+def set_header_cache_size(size: int) -> None:
+    """
+    Configure the caches of parsed ``Connection``, ``Upgrade``, and
+    ``Sec-WebSocket-Extensions`` headers.
+
+    Each cache holds up to ``size`` distinct header values. This clears the
+    caches and resets their statistics.
+
+    :param size: maximum number of entries per cache; ``0`` disables caching
+    :raises ValueError: if ``size`` is negative
+
+    """
+    global _cached_parse_connection, _cached_parse_upgrade, _cached_parse_extension
+    if size < 0:
+        raise ValueError("size must be positive or zero")
+    _cached_parse_connection = functools.lru_cache(size)(_parse_connection)
+    _cached_parse_upgrade = functools.lru_cache(size)(_parse_upgrade)
+    _cached_parse_extension = functools.lru_cache(size)(_parse_extension)
+
+
+class HeaderCacheInfo(NamedTuple):
+    """
+    Statistics about a cache of parsed headers.
+
+    Fields are the same as in :meth:`functools.lru_cache` ``.cache_info()``.
+
+    """
+
+    hits: int
+    misses: int
+    maxsize: Optional[int]
+    currsize: int
+
+
+def header_cache_info() -> Dict[str, HeaderCacheInfo]:
+    """
+    Return statistics about the caches of parsed headers.
+
+    Statistics are returned as a mapping of header names to
+    :class:`HeaderCacheInfo` instances.
+
+    """
+    return {
+        "Connection": HeaderCacheInfo(*_cached_parse_connection.cache_info()),
+        "Upgrade": HeaderCacheInfo(*_cached_parse_upgrade.cache_info()),
+        "Sec-WebSocket-Extensions": HeaderCacheInfo(
+            *_cached_parse_extension.cache_info()
+        ),
+    }
+
+
 def build_extension_item(
     name: ExtensionName, parameters: List[ExtensionParameter]
 ) -> str:
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import email.utils
 import ipaddress
 import sys
+import time
+from typing import Dict, List, Optional, Tuple
 
+from . import datastructures
 from .imports import lazy_import
 from .version import version as websockets_version
 
@@ -24,7 +28,13 @@ lazy_import(
 )
 
 
-__all__ = ["USER_AGENT", "build_host"]
+__all__ = [
+    "USER_AGENT",
+    "build_date",
+    "build_host",
+    "ResponseTemplate",
+    "ResponseTemplateCache",
+]
 
 
 PYTHON_VERSION = "{}.{}".format(*sys.version_info)
@@ -52,3 +62,122 @@ def build_host(host: str, port: int, secure: bool) -> str:
         host = f"{host}:{port}"
 
     return host
+
+
+# Cache of the Date header: (timestamp in seconds, formatted date).
+_date_cache: Tuple[int, str] = (-1, "")
+
+
+def build_date() -> str:
+    """
+    Build a ``Date`` header.
+
+    Since its resolution is one second, formatting it once per second is
+    enough, even when accepting many connections.
+
+    """
+    global _date_cache
+    now = int(time.time())
+    timestamp, date = _date_cache
+    if timestamp != now:
+        date = email.utils.formatdate(now, usegmt=True)
+        _date_cache = now, date
+    return date
+
+
+class ResponseTemplate:
+    """
+    Template for responses that accept the opening handshake.
+
+    Only ``Sec-WebSocket-Accept`` and ``Date`` change between connections.
+    Other headers depend on settings that take few distinct values, such as
+    the negotiated extensions and subprotocol. A server may build a template
+    for each combination and reuse it for each connection.
+
+    :param headers: response headers; the value of ``Sec-WebSocket-Accept``
+        is a placeholder; if the value of ``Date`` is empty, it's filled in
+        with the current date
+
+    """
+
+    def __init__(self, headers: datastructures.Headers) -> None:
+        self.items: List[Tuple[str, str]] = list(headers.raw_items())
+        self.accept_index: Optional[int] = None
+        self.date_index: Optional[int] = None
+        for index, (name, value) in enumerate(self.items):
+            lower_name = name.lower()
+            if lower_name == "sec-websocket-accept":
+                self.accept_index = index
+            elif lower_name == "date" and value == "":
+                self.date_index = index
+        if self.accept_index is None:
+            raise ValueError("missing Sec-WebSocket-Accept header")
+
+    def render(self, accept: str, date: str) -> datastructures.Headers:
+        """
+        Build response headers from this template.
+
+        :param accept: value of the ``Sec-WebSocket-Accept`` header
+        :param date: value of the ``Date`` header, unless the template
+            provides one
+
+        """
+        items = self.items.copy()
+        assert self.accept_index is not None
+        items[self.accept_index] = items[self.accept_index][0], accept
+        if self.date_index is not None:
+            items[self.date_index] = items[self.date_index][0], date
+        return datastructures.Headers(items)
+
+
+# Since clients may influence the extensions and subprotocol headers, cap the
+# number of response templates.
+MAX_RESPONSE_TEMPLATES = 64
+
+
+class ResponseTemplateCache:
+    """
+    Cache of :class:`ResponseTemplate` by extensions and subprotocol headers,
+    and by additional headers, if any.
+
+    It holds up to :data:`MAX_RESPONSE_TEMPLATES` templates. When it's full,
+    other templates aren't cached.
+
+    """
+
+    def __init__(self) -> None:
+        self.templates: Dict[
+            Tuple[Optional[str], Optional[str], Tuple[Tuple[str, str], ...]],
+            ResponseTemplate,
+        ]
+        self.templates = {}
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def get(
+        self,
+        extensions_header: Optional[str],
+        protocol_header: Optional[str],
+        extra_headers: Tuple[Tuple[str, str], ...] = (),
+    ) -> Optional[ResponseTemplate]:
+        """
+        Return the template for the given headers, if it's cached.
+
+        """
+        return self.templates.get((extensions_header, protocol_header, extra_headers))
+
+    def add(
+        self,
+        extensions_header: Optional[str],
+        protocol_header: Optional[str],
+        template: ResponseTemplate,
+        extra_headers: Tuple[Tuple[str, str], ...] = (),
+    ) -> None:
+        """
+        Cache the template for the given headers, unless the cache is full.
+
+        """
+        if len(self.templates) < MAX_RESPONSE_TEMPLATES:
+            key = (extensions_header, protocol_header, extra_headers)
+            self.templates[key] = template
@@ -2,14 +2,21 @@ from __future__ import annotations
 
 import dataclasses
 import re
-from typing import Callable, Generator, Optional
+from typing import Callable, Generator, Optional, Tuple, TypeVar
 
 from . import datastructures, exceptions
+from .streams import StreamReader
 
 
 MAX_HEADERS = 256
 MAX_LINE = 4110
 
+# The start line, headers, and the empty line cannot exceed this size.
+MAX_HEAD = (MAX_HEADERS + 2) * MAX_LINE
+
+
+T = TypeVar("T")
+
 
 def d(value: bytes) -> str:
     """
@@ -38,6 +45,12 @@ _token_re = re.compile(rb"[-!#$%&\'*+.^_`|~0-9a-zA-Z]+")
 
 _value_re = re.compile(rb"[\x09\x20-\x7e\x80-\xff]*")
 
+# Regex for validating a block of header lines, each terminated by CRLF.
+
+_headers_re = re.compile(
+    rb"(?:[-!#$%&\'*+.^_`|~0-9a-zA-Z]+:[\x09\x20-\x7e\x80-\xff]*\r\n)*"
+)
+
 
 @dataclasses.dataclass
 class Request:
@@ -57,7 +70,15 @@ class Request:
 
     @classmethod
     def parse(
-        cls, read_line: Callable[[], Generator[None, None, bytes]]
+        cls,
+        read_line: Callable[[], Generator[None, None, bytes]],
+        *,
+        read_until: Optional[
+            Callable[
+                [bytes, int, Callable[[bytearray], None]],
+                Generator[None, None, bytes],
+            ]
+        ] = None,
     ) -> Generator[None, None, "Request"]:
         """
         Parse an HTTP/1.1 GET request and return ``(path, headers)``.
@@ -73,34 +94,17 @@ class Request:
 
         :param read_line: generator-based coroutine that reads a LF-terminated
             line or raises an exception if there isn't enough data
+        :param read_until: generator-based coroutine that reads data until a
+            separator or raises an exception if there isn't enough data; when
+            it's provided, the request line and headers are parsed in bulk
         :raises EOFError: if the connection is closed without a full HTTP request
         :raises exceptions.SecurityError: if the request exceeds a security limit
         :raises ValueError: if the request isn't well formatted
 
         """
-        # https://www.rfc-editor.org/rfc/rfc7230.html#section-3.1.1
-
-        # Parsing is simple because fixed values are expected for method and
-        # version and because path isn't checked. Since WebSocket software tends
-        # to implement HTTP/1.1 strictly, there's little need for lenient parsing.
-
-        try:
-            request_line = yield from parse_line(read_line)
-        except EOFError as exc:
-            raise EOFError("connection closed while reading HTTP request line") from exc
-
-        try:
-            method, raw_path, version = request_line.split(b" ", 2)
-        except ValueError:  # not enough values to unpack (expected 3, got 1-2)
-            raise ValueError(f"invalid HTTP request line: {d(request_line)}") from None
-
-        if method != b"GET":
-            raise ValueError(f"unsupported HTTP method: {d(method)}")
-        if version != b"HTTP/1.1":
-            raise ValueError(f"unsupported HTTP version: {d(version)}")
-        path = raw_path.decode("ascii", "surrogateescape")
-
-        headers = yield from parse_headers(read_line)
+        path, headers = yield from parse_head(
+            read_line, read_until, parse_request_line, "request line"
+        )
 
         # https://www.rfc-editor.org/rfc/rfc7230.html#section-3.3.3
 
@@ -145,6 +149,13 @@ class Response:
         read_line: Callable[[], Generator[None, None, bytes]],
         read_exact: Callable[[int], Generator[None, None, bytes]],
         read_to_eof: Callable[[], Generator[None, None, bytes]],
+        *,
+        read_until: Optional[
+            Callable[
+                [bytes, int, Callable[[bytearray], None]],
+                Generator[None, None, bytes],
+            ]
+        ] = None,
     ) -> Generator[None, None, "Response"]:
         """
         Parse an HTTP/1.1 response and return ``(status_code, reason, headers)``.
@@ -160,42 +171,20 @@ class Response:
             line or raises an exception if there isn't enough data
         :param read_exact: generator-based coroutine that reads the requested
             number of bytes or raises an exception if there isn't enough data
+        :param read_to_eof: generator-based coroutine that reads until the end
+            of the stream
+        :param read_until: generator-based coroutine that reads data until a
+            separator or raises an exception if there isn't enough data; when
+            it's provided, the status line and headers are parsed in bulk
         :raises EOFError: if the connection is closed without a full HTTP response
         :raises exceptions.SecurityError: if the response exceeds a security limit
         :raises LookupError: if the response isn't well formatted
         :raises ValueError: if the response isn't well formatted
 
         """
-        # https://www.rfc-editor.org/rfc/rfc7230.html#section-3.1.2
-
-        # As in parse_request, parsing is simple because a fixed value is expected
-        # for version, status_code is a 3-digit number, and reason can be ignored.
-
-        try:
-            status_line = yield from parse_line(read_line)
-        except EOFError as exc:
-            raise EOFError("connection closed while reading HTTP status line") from exc
-
-        try:
-            version, raw_status_code, raw_reason = status_line.split(b" ", 2)
-        except ValueError:  # not enough values to unpack (expected 3, got 1-2)
-            raise ValueError(f"invalid HTTP status line: {d(status_line)}") from None
-
-        if version != b"HTTP/1.1":
-            raise ValueError(f"unsupported HTTP version: {d(version)}")
-        try:
-            status_code = int(raw_status_code)
-        except ValueError:  # invalid literal for int() with base 10
-            raise ValueError(
-                f"invalid HTTP status code: {d(raw_status_code)}"
-            ) from None
-        if not 100 <= status_code < 1000:
-            raise ValueError(f"unsupported HTTP status code: {d(raw_status_code)}")
-        if not _value_re.fullmatch(raw_reason):
-            raise ValueError(f"invalid HTTP reason phrase: {d(raw_reason)}")
-        reason = raw_reason.decode()
-
-        headers = yield from parse_headers(read_line)
+        (status_code, reason), headers = yield from parse_head(
+            read_line, read_until, parse_status_line, "status line"
+        )
 
         # https://www.rfc-editor.org/rfc/rfc7230.html#section-3.3.3
 
@@ -239,6 +228,125 @@ class Response:
         return response
 
 
+def parse_request_line(request_line: bytes) -> str:
+    """
+    Parse the request line of an HTTP/1.1 GET request and return the path.
+
+    :raises ValueError: if the request line isn't well formatted
+
+    """
+    # https://www.rfc-editor.org/rfc/rfc7230.html#section-3.1.1
+
+    # Parsing is simple because fixed values are expected for method and
+    # version and because path isn't checked. Since WebSocket software tends
+    # to implement HTTP/1.1 strictly, there's little need for lenient parsing.
+
+    try:
+        method, raw_path, version = request_line.split(b" ", 2)
+    except ValueError:  # not enough values to unpack (expected 3, got 1-2)
+        raise ValueError(f"invalid HTTP request line: {d(request_line)}") from None
+
+    if method != b"GET":
+        raise ValueError(f"unsupported HTTP method: {d(method)}")
+    if version != b"HTTP/1.1":
+        raise ValueError(f"unsupported HTTP version: {d(version)}")
+    return raw_path.decode("ascii", "surrogateescape")
+
+
+def parse_status_line(status_line: bytes) -> Tuple[int, str]:
+    """
+    Parse the status line of an HTTP/1.1 response.
+
+    Return ``(status_code, reason)``.
+
+    :raises ValueError: if the status line isn't well formatted
+
+    """
+    # https://www.rfc-editor.org/rfc/rfc7230.html#section-3.1.2
+
+    # As in parse_request_line, parsing is simple because a fixed value is
+    # expected for version, status_code is a 3-digit number, and reason can be
+    # ignored.
+
+    try:
+        version, raw_status_code, raw_reason = status_line.split(b" ", 2)
+    except ValueError:  # not enough values to unpack (expected 3, got 1-2)
+        raise ValueError(f"invalid HTTP status line: {d(status_line)}") from None
+
+    if version != b"HTTP/1.1":
+        raise ValueError(f"unsupported HTTP version: {d(version)}")
+    try:
+        status_code = int(raw_status_code)
+    except ValueError:  # invalid literal for int() with base 10
+        raise ValueError(f"invalid HTTP status code: {d(raw_status_code)}") from None
+    if not 100 <= status_code < 1000:
+        raise ValueError(f"unsupported HTTP status code: {d(raw_status_code)}")
+    if not _value_re.fullmatch(raw_reason):
+        raise ValueError(f"invalid HTTP reason phrase: {d(raw_reason)}")
+    return status_code, raw_reason.decode()
+
+
+def parse_head(
+    read_line: Callable[[], Generator[None, None, bytes]],
+    read_until: Optional[
+        Callable[
+            [bytes, int, Callable[[bytearray], None]],
+            Generator[None, None, bytes],
+        ]
+    ],
+    parse_start_line: Callable[[bytes], T],
+    start_line_name: str,
+) -> Generator[None, None, Tuple[T, datastructures.Headers]]:
+    """
+    Parse the start line and headers of an HTTP message.
+
+    When ``read_until`` is provided, read them up to the empty line and parse
+    them in one pass. Lines are validated as they arrive, so an invalid message
+    is rejected without waiting for the empty line. Else, or if that fails,
+    parse them line by line, which reports errors accurately.
+
+    :param read_line: generator-based coroutine that reads a LF-terminated
+        line or raises an exception if there isn't enough data
+    :param read_until: generator-based coroutine that reads data until a
+        separator, calling a function to check data read so far, or raises an
+        exception if there isn't enough data
+    :param parse_start_line: function parsing the start line
+    :param start_line_name: name of the start line in error messages
+
+    """
+    if read_until is not None:
+        try:
+            head = yield from read_until(
+                b"\r\n\r\n", MAX_HEAD, check_head(parse_start_line)
+            )
+        except (EOFError, ValueError):
+            # Parse line by line in order to report the error accurately.
+            pass
+        else:
+            parsed = split_head(head)
+            if parsed is not None:
+                start_line, headers = parsed
+                return parse_start_line(start_line), headers
+            # Likewise, parse what was read line by line.
+            reader = StreamReader()
+            reader.feed_data(head)
+            reader.feed_eof()
+            read_line = reader.read_line
+
+    try:
+        start_line = yield from parse_line(read_line)
+    except EOFError as exc:
+        raise EOFError(
+            f"connection closed while reading HTTP {start_line_name}"
+        ) from exc
+
+    result = parse_start_line(start_line)
+
+    headers = yield from parse_headers(read_line)
+
+    return result, headers
+
+
 def parse_headers(
     read_line: Callable[[], Generator[None, None, bytes]]
 ) -> Generator[None, None, datastructures.Headers]:
@@ -284,6 +392,90 @@ def parse_headers(
     return headers
 
 
+def check_head(parse_start_line: Callable[[bytes], T]) -> Callable[[bytearray], None]:
+    """
+    Return a function validating complete lines of an incomplete HTTP head.
+
+    :func:`parse_head` passes it to ``read_until`` in order to reject invalid
+    messages as soon as an invalid line arrives. Each call validates the lines
+    that became complete since the previous call.
+
+    The function raises :exc:`ValueError` if a line is invalid or if there are
+    too many headers. Then :func:`parse_line` and :func:`parse_headers` should
+    parse the head in order to report the error. It raises
+    :exc:`~websockets.exceptions.SecurityError` if an incomplete line is too
+    long, because parsing it line by line would wait for the end of the line.
+
+    :param parse_start_line: function parsing the start line
+
+    """
+    offset = 0  # number of bytes validated
+    count = 0  # number of lines validated
+
+    def check(data: bytearray) -> None:
+        nonlocal offset, count
+        while True:
+            end = data.find(b"\n", offset) + 1
+            if end == 0:
+                # Security: enforce the same limit as parse_line.
+                if len(data) - offset > MAX_LINE:
+                    raise exceptions.SecurityError("line too long")
+                return
+            line = bytes(data[offset:end])
+            if len(line) > MAX_LINE or not line.endswith(b"\r\n"):
+                raise ValueError("invalid HTTP line")
+            if count == 0:
+                parse_start_line(line[:-2])
+            elif count > MAX_HEADERS or not _headers_re.fullmatch(line):
+                raise ValueError("invalid HTTP header line")
+            offset = end
+            count += 1
+
+    return check
+
+
+def split_head(head: bytes) -> Optional[Tuple[bytes, datastructures.Headers]]:
+    """
+    Parse the start line and headers of an HTTP message in one pass.
+
+    This is faster than :func:`parse_line` and :func:`parse_headers` but it
+    requires the start line, headers, and the empty line terminating them to
+    be available.
+
+    Return ``(start_line, headers)`` or :obj:`None` if ``head`` is invalid or
+    exceeds a security limit. Then :func:`parse_line` and
+    :func:`parse_headers` should parse ``head`` in order to report the error,
+    like :func:`parse_head` does.
+
+    :param head: start line and headers, terminated by an empty line
+
+    """
+    if not head.endswith(b"\r\n\r\n"):
+        return None
+    end = head.find(b"\r\n")
+    start_line = head[:end]
+    # The regex rules out LF in header lines. Check the start line.
+    if b"\n" in start_line or not _headers_re.fullmatch(head, end + 2, len(head) - 2):
+        return None
+    lines = head[end + 2 : -2].split(b"\r\n")[:-1]
+
+    # Security: enforce the same limits as parse_line and parse_headers.
+    if len(start_line) + 2 > MAX_LINE or len(lines) > MAX_HEADERS:
+        return None
+
+    items = []
+    for line in lines:
+        if len(line) + 2 > MAX_LINE:
+            return None
+        raw_name, raw_value = line.split(b":", 1)
+        name = raw_name.decode("ascii")  # guaranteed to be ASCII at this point
+        value = raw_value.strip(b" \t").decode("ascii", "surrogateescape")
+        items.append((name, value))
+
+    # Building Headers in bulk is faster than adding headers one by one.
+    return start_line, datastructures.Headers(items)
+
+
 def parse_line(
     read_line: Callable[[], Generator[None, None, bytes]]
 ) -> Generator[None, None, bytes]:
@@ -92,6 +92,14 @@ class WebSocketClientProtocol(WebSocketCommonProtocol):
 
     .. _Pong frame: https://www.rfc-editor.org/rfc/rfc6455.html#section-5.5.3
 
+    If ``lazy_keepalive`` is ``True``, receiving any frame postpones the next
+    Ping frame, which is only sent after ``ping_interval`` seconds without
+    receiving anything. This saves Ping and Pong frames on busy connections.
+    The default value is ``False``.
+
+    When a Pong frame acknowledges a keepalive Ping frame, the round-trip time
+    is stored in the :attr:`latency` attribute, in seconds.
+
     The ``close_timeout`` parameter defines a maximum wait time for completing
     the closing handshake and terminating the TCP connection. For legacy
     reasons, :meth:`close` completes in at most ``5 * close_timeout`` seconds.
@@ -135,6 +143,12 @@ class WebSocketClientProtocol(WebSocketCommonProtocol):
     The default value is 64 KiB, equal to asyncio's default (based on the
     current implementation of ``FlowControlMixin``).
 
+    The ``offload_threshold`` argument enables compressing and decompressing
+    frames of at least this many bytes in the default executor of the event
+    loop instead of blocking it. This reduces latency for other connections
+    when large messages are exchanged. Frames are still sent and received in
+    order. The default value is ``None``, which disables this behavior.
+
     As soon as the HTTP request and response in the opening handshake are
     processed:
 
@@ -462,9 +476,10 @@ class Connect:
     seconds, :func:`connect` raises :exc:`~asyncio.TimeoutError`. The default
     is 10 seconds. Set ``open_timeout`` to ``None`` to disable the timeout.
 
-    The behavior of ``ping_interval``, ``ping_timeout``, ``close_timeout``,
-    ``max_size``, ``max_queue``, ``read_limit``, and ``write_limit`` is
-    described in :class:`WebSocketClientProtocol`.
+    The behavior of ``ping_interval``, ``ping_timeout``, ``lazy_keepalive``,
+    ``close_timeout``, ``max_size``, ``max_queue``, ``read_limit``,
+    ``write_limit``, and ``offload_threshold`` is described in
+    :class:`WebSocketClientProtocol`.
 
     :func:`connect` also accepts the following optional arguments:
 
@@ -497,11 +512,13 @@ class Connect:
         open_timeout: Optional[float] = 10,
         ping_interval: Optional[float] = 20,
         ping_timeout: Optional[float] = 20,
+        lazy_keepalive: bool = False,
         close_timeout: Optional[float] = None,
         max_size: Optional[int] = 2 ** 20,
         max_queue: Optional[int] = 2 ** 5,
         read_limit: int = 2 ** 16,
         write_limit: int = 2 ** 16,
+        offload_threshold: Optional[int] = None,
         compression: Optional[str] = "deflate",
         origin: Optional[Origin] = None,
         extensions: Optional[Sequence[ClientExtensionFactory]] = None,
@@ -562,11 +579,13 @@ class Connect:
             create_protocol,
             ping_interval=ping_interval,
             ping_timeout=ping_timeout,
+            lazy_keepalive=lazy_keepalive,
             close_timeout=close_timeout,
             max_size=max_size,
             max_queue=max_queue,
             read_limit=read_limit,
             write_limit=write_limit,
+            offload_threshold=offload_threshold,
             loop=_loop,
             host=wsuri.host,
             port=wsuri.port,
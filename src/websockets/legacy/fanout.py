@@ -0,0 +1,284 @@
+"""
+:mod:`websockets.legacy.fanout` broadcasts messages across worker processes.
+
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import struct
+import tempfile
+from typing import Optional, Set
+
+from ..frames import prepare_data
+from ..typing import Data, LoggerLike
+from .protocol import WebSocketCommonProtocol, broadcast_frame
+
+
+__all__ = ["Fanout", "UnixSocketFanout"]
+
+
+class Fanout:
+    """
+    Broadcast messages to subscribed connections in all worker processes.
+
+    :func:`~websockets.broadcast` only reaches connections in the current
+    process. When a server runs in several processes, for example with
+    :func:`~websockets.server.serve_multi`, a message published with
+    :meth:`publish` in any worker must be forwarded to the other workers.
+
+    Each worker has a copy of the :class:`Fanout` instance. Connections
+    subscribe to the copy in their worker with :meth:`subscribe`::
+
+        fanout = UnixSocketFanout()
+
+        async def handler(websocket, path):
+            fanout.subscribe(websocket)
+            try:
+                await websocket.wait_closed()
+            finally:
+                fanout.unsubscribe(websocket)
+
+        async with serve_multi(handler, host, port, fanout=fanout):
+            ...
+
+    This base class doesn't forward messages to other processes. Subclasses
+    implement transports by overriding :meth:`start`, :meth:`stop`,
+    :meth:`after_fork`, :meth:`connect`, :meth:`disconnect`, and
+    :meth:`forward`. They must call
+    :meth:`deliver` once for each message published in another worker.
+
+    Messages are encoded once in the worker publishing them. Other workers
+    receive the encoded payload once and send it to their subscribers without
+    decoding it.
+
+    :param logger: logger for this fan-out layer; defaults to
+        ``logging.getLogger("websockets.server")``
+
+    """
+
+    def __init__(self, logger: Optional[LoggerLike] = None) -> None:
+        if logger is None:
+            logger = logging.getLogger("websockets.server")
+        self.logger = logger
+
+        # Connections subscribed in the current process.
+        self.subscribers: Set[WebSocketCommonProtocol] = set()
+
+    def subscribe(self, websocket: WebSocketCommonProtocol) -> None:
+        """
+        Subscribe a connection to messages published in any worker.
+
+        """
+        self.subscribers.add(websocket)
+
+    def unsubscribe(self, websocket: WebSocketCommonProtocol) -> None:
+        """
+        Unsubscribe a connection.
+
+        """
+        self.subscribers.discard(websocket)
+
+    def publish(self, message: Data) -> None:
+        """
+        Broadcast a message to subscribed connections in all workers.
+
+        Like :func:`~websockets.broadcast`, :meth:`publish` sends the message
+        to local subscribers synchronously, without backpressure.
+
+        :raises TypeError: if ``message`` doesn't have a supported type
+
+        """
+        if not isinstance(message, (str, bytes, bytearray, memoryview)):
+            raise TypeError("data must be str or bytes-like")
+
+        opcode, data = prepare_data(message)
+
+        # Forward the message first, so that other workers receive it even if
+        # sending it to local subscribers fails.
+        self.forward(opcode, data)
+        self.deliver(opcode, data)
+
+    def deliver(self, opcode: int, data: bytes) -> None:
+        """
+        Send an encoded message to subscribed connections in this worker.
+
+        """
+        broadcast_frame(self.subscribers, opcode, data)
+
+    def forward(self, opcode: int, data: bytes) -> None:
+        """
+        Send an encoded message to other workers.
+
+        """
+
+    async def start(self) -> None:
+        """
+        Set up the fan-out layer in the supervisor, before starting workers.
+
+        """
+
+    async def stop(self) -> None:
+        """
+        Tear down the fan-out layer in the supervisor, after workers exit.
+
+        """
+
+    def after_fork(self) -> None:
+        """
+        Release resources of the supervisor inherited by a worker.
+
+        This method runs in a worker process, before :meth:`connect`.
+
+        """
+
+    async def connect(self) -> None:
+        """
+        Connect a worker to the fan-out layer, before it starts serving.
+
+        """
+
+    async def disconnect(self) -> None:
+        """
+        Disconnect a worker from the fan-out layer, after it stops serving.
+
+        """
+
+
+# Messages are sent as an opcode and the length of the payload, followed by
+# the payload.
+HEADER = struct.Struct("!BI")
+
+
+class UnixSocketFanout(Fanout):
+    """
+    Broadcast messages across worker processes through a Unix socket.
+
+    :meth:`start` runs a hub listening on a Unix socket in the supervisor.
+    Each worker connects to the hub. The hub relays each message published by
+    a worker to every other worker, without decoding it, so that each worker
+    receives it once.
+
+    Messages are relayed without backpressure, like :func:`broadcast`.
+    Messages published while a worker is restarting don't reach it.
+
+    :param path: file system path to the Unix socket; defaults to a path in
+        a new temporary directory
+    :param logger: logger for this fan-out layer; defaults to
+        ``logging.getLogger("websockets.server")``
+
+    """
+
+    def __init__(
+        self, path: Optional[str] = None, logger: Optional[LoggerLike] = None
+    ) -> None:
+        super().__init__(logger)
+        self.path = path
+
+        # Temporary directory created for the Unix socket, if any.
+        self.temp_dir: Optional[str] = None
+
+        # In the supervisor: connections of workers to the hub.
+        self.hub: Optional[asyncio.base_events.Server] = None
+        self.peers: Set[asyncio.StreamWriter] = set()
+
+        # In a worker: connection to the hub.
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.read_task: Optional[asyncio.Task[None]] = None
+
+    async def start(self) -> None:
+        if self.path is None:
+            self.temp_dir = tempfile.mkdtemp()
+            self.path = os.path.join(self.temp_dir, "fanout.sock")
+        self.hub = await asyncio.start_unix_server(self.relay, self.path)
+
+    async def stop(self) -> None:
+        assert self.hub is not None and self.path is not None
+        for writer in list(self.peers):
+            writer.close()
+        self.hub.close()
+        await self.hub.wait_closed()
+        self.hub = None
+        os.unlink(self.path)
+        if self.temp_dir is not None:
+            os.rmdir(self.temp_dir)
+            self.temp_dir = None
+            self.path = None
+
+    async def relay(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Relay messages from a worker to other workers.
+
+        This coroutine runs in the supervisor.
+
+        """
+        self.peers.add(writer)
+        try:
+            while True:
+                header = await reader.readexactly(HEADER.size)
+                _, length = HEADER.unpack(header)
+                data = await reader.readexactly(length)
+                for peer in self.peers:
+                    if peer is not writer:
+                        peer.write(header)
+                        peer.write(data)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.peers.discard(writer)
+            writer.close()
+
+    def after_fork(self) -> None:
+        # Close the listening socket of the hub and the connections of other
+        # workers. They belong to the event loop of the supervisor, which
+        # doesn't run in the worker and keeps references to them. Close their
+        # file descriptors rather than closing them through the event loop.
+        if self.hub is not None:
+            for sock in self.hub.sockets:
+                os.close(sock.fileno())
+        for writer in self.peers:
+            os.close(writer.get_extra_info("socket").fileno())
+
+    async def connect(self) -> None:
+        assert self.path is not None, "call start() first"
+        reader, self.writer = await asyncio.open_unix_connection(self.path)
+        self.read_task = asyncio.get_event_loop().create_task(self.receive(reader))
+
+    async def disconnect(self) -> None:
+        assert self.writer is not None and self.read_task is not None
+        self.read_task.cancel()
+        self.writer.close()
+        try:
+            await self.read_task
+        except asyncio.CancelledError:
+            pass
+        self.writer = None
+        self.read_task = None
+
+    async def receive(self, reader: asyncio.StreamReader) -> None:
+        """
+        Deliver messages relayed by the hub.
+
+        This coroutine runs in a worker.
+
+        """
+        try:
+            while True:
+                opcode, length = HEADER.unpack(await reader.readexactly(HEADER.size))
+                data = await reader.readexactly(length)
+                try:
+                    self.deliver(opcode, data)
+                except Exception:
+                    self.logger.error("fanout delivery failed", exc_info=True)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.logger.error("fanout hub disconnected")
+
+    def forward(self, opcode: int, data: bytes) -> None:
+        if self.writer is None:
+            return
+        self.writer.write(HEADER.pack(opcode, len(data)))
+        self.writer.write(data)
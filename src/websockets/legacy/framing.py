@@ -12,6 +12,7 @@ See `section 5 of RFC 6455`_.
 
 from __future__ import annotations
 
+import asyncio
 import dataclasses
 import struct
 from typing import Any, Awaitable, Callable, NamedTuple, Optional, Sequence, Tuple
@@ -60,6 +61,7 @@ class Frame(NamedTuple):
         mask: bool,
         max_size: Optional[int] = None,
         extensions: Optional[Sequence[extensions.Extension]] = None,
+        offload_threshold: Optional[int] = None,
     ) -> "Frame":
         """
         Read a WebSocket frame.
@@ -72,6 +74,9 @@ class Frame(NamedTuple):
         :param extensions: list of classes with a ``decode()`` method that
             transforms the frame and return a new frame; extensions are applied
             in reverse order
+        :param offload_threshold: if the payload is at least this many bytes,
+            apply extensions in the default executor rather than on the event
+            loop
         :raises ~websockets.exceptions.PayloadTooBig: if the frame exceeds
             ``max_size``
         :raises ~websockets.exceptions.ProtocolError: if the frame
@@ -118,8 +123,17 @@ class Frame(NamedTuple):
 
         if extensions is None:
             extensions = []
-        for extension in reversed(extensions):
-            new_frame = extension.decode(new_frame, max_size=max_size)
+        if (
+            extensions
+            and offload_threshold is not None
+            and length >= offload_threshold
+            and opcode in frames.DATA_OPCODES
+        ):
+            new_frame = await asyncio.get_running_loop().run_in_executor(
+                None, _decode, new_frame, extensions, max_size
+            )
+        else:
+            new_frame = _decode(new_frame, extensions, max_size)
 
         new_frame.check()
 
@@ -159,6 +173,20 @@ class Frame(NamedTuple):
         write(self.new_frame.serialize(mask=mask, extensions=extensions))
 
 
+def _decode(
+    frame: frames.Frame,
+    extensions: Sequence[extensions.Extension],
+    max_size: Optional[int],
+) -> frames.Frame:
+    """
+    Apply extensions to an incoming frame, in reverse order.
+
+    """
+    for extension in reversed(extensions):
+        frame = extension.decode(frame, max_size=max_size)
+    return frame
+
+
 # Backwards compatibility with previously documented public APIs
 
 from ..frames import Close, prepare_ctrl as encode_data, prepare_data  # noqa
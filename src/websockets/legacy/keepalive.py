@@ -0,0 +1,150 @@
+"""
+:mod:`websockets.legacy.keepalive` sends keepalive pings for many connections
+with a single timer.
+
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .protocol import WebSocketCommonProtocol
+
+
+__all__ = ["KeepaliveScheduler"]
+
+
+# Like asyncio, consider that deadlines within the resolution of the clock are
+# reached. Else, a timer could fire too early, do nothing, and fire again.
+CLOCK_RESOLUTION = time.get_clock_info("monotonic").resolution
+
+
+class KeepaliveScheduler:
+    """
+    Schedule keepalive pings and pong deadlines of connections.
+
+    Rather than running a task per connection, which sleeps until it's time to
+    send a ping, then waits for the pong, connections register their next
+    deadline with the scheduler. The scheduler keeps deadlines in a heap and
+    runs a single timer on the event loop, for the earliest deadline. When the
+    timer fires, the scheduler processes all connections whose deadline is
+    reached in a batch, by calling their
+    :meth:`~websockets.legacy.protocol.WebSocketCommonProtocol.keepalive`
+    method, which returns their next deadline.
+
+    Each connection has at most one deadline. Scheduling a connection replaces
+    its previous deadline, if any.
+
+    :class:`~websockets.legacy.server.WebSocketServer` shares a scheduler
+    between all its connections. Each client connection has its own. Server
+    connections also register the deadline of the opening handshake, which
+    enforces ``open_timeout`` without a timer per connection.
+
+    :param loop: event loop running the connections
+
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop) -> None:
+        self.loop = loop
+
+        # Heap of [deadline, sequence number, connection] entries. Removing an
+        # entry from the middle of the heap would be inefficient. Entries are
+        # marked as removed by replacing the connection with None instead.
+        self.heap: List[List[Any]] = []
+
+        # Mapping of connections to their entry in the heap.
+        self.entries: Dict[WebSocketCommonProtocol, List[Any]] = {}
+
+        # Break ties between identical deadlines without comparing connections.
+        self.counter = itertools.count()
+
+        # Timer set for the earliest deadline.
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, protocol: object) -> bool:
+        return protocol in self.entries
+
+    def schedule(self, protocol: WebSocketCommonProtocol, when: float) -> None:
+        """
+        Set the next deadline of a connection.
+
+        :param protocol: connection
+        :param when: deadline, in terms of :meth:`~asyncio.loop.time`
+
+        """
+        self.push(protocol, when)
+        if self.timer is None or when < self.timer.when():
+            self.set_timer(when)
+
+    def unschedule(self, protocol: WebSocketCommonProtocol) -> None:
+        """
+        Remove the deadline of a connection, if it has one.
+
+        :param protocol: connection
+
+        """
+        entry = self.entries.pop(protocol, None)
+        if entry is not None:
+            entry[-1] = None
+        # Release memory and the timer when there's nothing left to do.
+        if not self.entries:
+            self.heap.clear()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+    def push(self, protocol: WebSocketCommonProtocol, when: float) -> None:
+        entry = self.entries.pop(protocol, None)
+        if entry is not None:
+            entry[-1] = None
+        entry = [when, next(self.counter), protocol]
+        self.entries[protocol] = entry
+        heapq.heappush(self.heap, entry)
+
+    def set_timer(self, when: float) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = self.loop.call_at(when, self.run)
+
+    def run(self) -> None:
+        """
+        Process all connections whose deadline is reached.
+
+        """
+        self.timer = None
+
+        heap = self.heap
+        entries = self.entries
+        now = self.loop.time() + CLOCK_RESOLUTION
+
+        due = []
+        while heap and heap[0][0] <= now:
+            protocol = heapq.heappop(heap)[-1]
+            if protocol is not None:
+                del entries[protocol]
+                due.append(protocol)
+
+        for protocol in due:
+            try:
+                when = protocol.keepalive()
+            except Exception:
+                protocol.logger.error("keepalive ping failed", exc_info=True)
+            else:
+                if when is not None:
+                    self.push(protocol, when)
+
+        # Skip removed entries to avoid firing the timer for nothing.
+        while heap and heap[0][-1] is None:
+            heapq.heappop(heap)
+        # Connections may have been scheduled or unscheduled in the meantime.
+        if heap and (self.timer is None or heap[0][0] < self.timer.when()):
+            self.set_timer(heap[0][0])
@@ -12,6 +12,7 @@ from __future__ import annotations
 import asyncio
 import codecs
 import collections
+import functools
 import logging
 import random
 import struct
@@ -44,6 +45,7 @@ from ..exceptions import (
 )
 from ..extensions import Extension
 from ..frames import (
+    DATA_OPCODES,
     OK_CLOSE_CODES,
     OP_BINARY,
     OP_CLOSE,
@@ -59,6 +61,7 @@ from ..frames import (
 from ..typing import Data, LoggerLike, Subprotocol
 from .compatibility import loop_if_py_lt_38
 from .framing import Frame
+from .keepalive import KeepaliveScheduler
 
 
 __all__ = ["WebSocketCommonProtocol", "broadcast"]
@@ -96,11 +99,13 @@ class WebSocketCommonProtocol(asyncio.Protocol):
         *,
         ping_interval: Optional[float] = 20,
         ping_timeout: Optional[float] = 20,
+        lazy_keepalive: bool = False,
         close_timeout: Optional[float] = None,
         max_size: Optional[int] = 2 ** 20,
         max_queue: Optional[int] = 2 ** 5,
         read_limit: int = 2 ** 16,
         write_limit: int = 2 ** 16,
+        offload_threshold: Optional[int] = None,
         logger: Optional[LoggerLike] = None,
         # The following arguments are kept only for backwards compatibility.
         host: Optional[str] = None,
@@ -127,11 +132,13 @@ class WebSocketCommonProtocol(asyncio.Protocol):
 
         self.ping_interval = ping_interval
         self.ping_timeout = ping_timeout
+        self.lazy_keepalive = lazy_keepalive
         self.close_timeout = close_timeout
         self.max_size = max_size
         self.max_queue = max_queue
         self.read_limit = read_limit
         self.write_limit = write_limit
+        self.offload_threshold = offload_threshold
 
         # Unique identifier. For logs.
         self.id = uuid.uuid4()
@@ -201,6 +208,9 @@ class WebSocketCommonProtocol(asyncio.Protocol):
         # Protect sending fragmented messages.
         self._fragmented_message_waiter: Optional[asyncio.Future[None]] = None
 
+        # Protect encoding a frame in an executor.
+        self._offload_waiter: Optional[asyncio.Future[None]] = None
+
         # Mapping of ping IDs to pong waiters, in chronological order.
         self.pings: Dict[bytes, asyncio.Future[None]] = {}
 
@@ -210,11 +220,26 @@ class WebSocketCommonProtocol(asyncio.Protocol):
         # Exception that occurred during data transfer, if any.
         self.transfer_data_exc: Optional[BaseException] = None
 
-        # Task sending keepalive pings.
-        self.keepalive_ping_task: asyncio.Task[None]
+        # Scheduler of keepalive pings. Servers share it between connections.
+        self.keepalive_scheduler: KeepaliveScheduler
+
+        # Keepalive pings don't go through self.pings. While waiting for a
+        # pong, keep track of the payload of the ping, when it was sent, and
+        # the pings sent with ping() immediately before and after it, because
+        # a pong acknowledges all previous pings.
+        self.keepalive_ping_data: Optional[bytes] = None
+        self.keepalive_ping_time = 0.0
+        self.keepalive_prev_ping: Optional[bytes] = None
+        self.keepalive_next_ping: Optional[bytes] = None
+
+        # Round-trip time of the last keepalive ping, in seconds.
+        self.latency = 0.0
+
+        # Time when the last frame was received, with lazy_keepalive.
+        self.last_frame_received = 0.0
 
-        # Task closing the TCP connection.
-        self.close_connection_task: asyncio.Task[None]
+        # Task closing the TCP connection, see close_connection_task.
+        self._close_connection_task: Optional[asyncio.Task[None]] = None
 
     # Copied from asyncio.FlowControlMixin
     async def _drain_helper(self) -> None:  # pragma: no cover
@@ -259,10 +284,45 @@ class WebSocketCommonProtocol(asyncio.Protocol):
             self.logger.debug("= connection is OPEN")
         # Start the task that receives incoming WebSocket messages.
         self.transfer_data_task = self.loop.create_task(self.transfer_data())
-        # Start the task that sends pings at regular intervals.
-        self.keepalive_ping_task = self.loop.create_task(self.keepalive_ping())
-        # Start the task that eventually closes the TCP connection.
-        self.close_connection_task = self.loop.create_task(self.close_connection())
+        # Close the TCP connection once the data transfer phase completes.
+        self.transfer_data_task.add_done_callback(self.transfer_data_done)
+        # Schedule the first keepalive ping.
+        if self.ping_interval is not None:
+            self.last_frame_received = self.loop.time()
+            if not hasattr(self, "keepalive_scheduler"):
+                self.keepalive_scheduler = KeepaliveScheduler(self.loop)
+            self.keepalive_scheduler.schedule(
+                self, self.loop.time() + self.ping_interval
+            )
+
+    def transfer_data_done(self, transfer_data_task: asyncio.Task[None]) -> None:
+        """
+        Callback when the data transfer phase completes.
+
+        """
+        self.start_close_connection()
+
+    def start_close_connection(self) -> asyncio.Task[None]:
+        """
+        Start :attr:`close_connection_task`, unless it's running already.
+
+        """
+        if self._close_connection_task is None:
+            self._close_connection_task = self.loop.create_task(self.close_connection())
+        return self._close_connection_task
+
+    @property
+    def close_connection_task(self) -> asyncio.Task[None]:
+        """
+        Task closing the TCP connection.
+
+        It's started when the data transfer phase completes, when the
+        connection fails, or when a coroutine needs to wait until the TCP
+        connection is closed, whichever happens first. Starting it lazily
+        saves a task per open connection.
+
+        """
+        return self.start_close_connection()
 
     @property
     def host(self) -> Optional[str]:
@@ -471,7 +531,9 @@ class WebSocketCommonProtocol(asyncio.Protocol):
         return message
 
     async def send(
-        self, message: Union[Data, Iterable[Data], AsyncIterable[Data]]
+        self,
+        message: Union[Data, Iterable[Data], AsyncIterable[Data]],
+        compress: bool = True,
     ) -> None:
         """
         Send a message.
@@ -494,6 +556,10 @@ class WebSocketCommonProtocol(asyncio.Protocol):
         If you wish to send the keys of a dict-like object as fragments, call
         its :meth:`~dict.keys` method and pass the result to :meth:`send`.
 
+        When a compression extension is negotiated, set ``compress`` to
+        ``False`` to send a message without compression, for example when it's
+        already compressed.
+
         Canceling :meth:`send` is discouraged. Instead, you should close the
         connection with :meth:`close`. Indeed, there are only two situations
         where :meth:`send` may yield control to the event loop:
@@ -505,6 +571,8 @@ class WebSocketCommonProtocol(asyncio.Protocol):
            Stopping in the middle of a fragmented message will cause a
            protocol error. Closing the connection has the same effect.
 
+        :param message: message to send
+        :param compress: whether the message may be compressed
         :raises ~websockets.exceptions.ConnectionClosed: when the
             connection is closed
         :raises TypeError: if ``message`` doesn't have a supported type
@@ -513,16 +581,26 @@ class WebSocketCommonProtocol(asyncio.Protocol):
         await self.ensure_open()
 
         # While sending a fragmented message, prevent sending other messages
-        # until all fragments are sent.
-        while self._fragmented_message_waiter is not None:
-            await asyncio.shield(self._fragmented_message_waiter)
+        # until all fragments are sent. While encoding a frame in an executor,
+        # prevent sending other messages until the frame is sent.
+        while (
+            self._fragmented_message_waiter is not None
+            or self._offload_waiter is not None
+        ):
+            if self._fragmented_message_waiter is not None:
+                await asyncio.shield(self._fragmented_message_waiter)
+            else:
+                assert self._offload_waiter is not None
+                await asyncio.shield(self._offload_waiter)
+
+        extensions = self.prepare_extensions(compress)
 
         # Unfragmented message -- this case must be handled first because
         # strings and bytes-like objects are iterable.
 
         if isinstance(message, (str, bytes, bytearray, memoryview)):
             opcode, data = prepare_data(message)
-            await self.write_frame(True, opcode, data)
+            await self.write_frame(True, opcode, data, extensions=extensions)
 
         # Catch a common mistake -- passing a dict to send().
 
@@ -533,9 +611,6 @@ class WebSocketCommonProtocol(asyncio.Protocol):
 
         elif isinstance(message, Iterable):
 
-            # Work around https://github.com/python/mypy/issues/6227
-            message = cast(Iterable[Data], message)
-
             iter_message = iter(message)
             try:
                 message_chunk = next(iter_message)
@@ -546,17 +621,17 @@ class WebSocketCommonProtocol(asyncio.Protocol):
             self._fragmented_message_waiter = asyncio.Future()
             try:
                 # First fragment.
-                await self.write_frame(False, opcode, data)
+                await self.write_frame(False, opcode, data, extensions=extensions)
 
                 # Other fragments.
                 for message_chunk in iter_message:
                     confirm_opcode, data = prepare_data(message_chunk)
                     if confirm_opcode != opcode:
                         raise TypeError("data contains inconsistent types")
-                    await self.write_frame(False, OP_CONT, data)
+                    await self.write_frame(False, OP_CONT, data, extensions=extensions)
 
                 # Final fragment.
-                await self.write_frame(True, OP_CONT, b"")
+                await self.write_frame(True, OP_CONT, b"", extensions=extensions)
 
             except Exception:
                 # We're half-way through a fragmented message and we can't
@@ -587,7 +662,7 @@ class WebSocketCommonProtocol(asyncio.Protocol):
             self._fragmented_message_waiter = asyncio.Future()
             try:
                 # First fragment.
-                await self.write_frame(False, opcode, data)
+                await self.write_frame(False, opcode, data, extensions=extensions)
 
                 # Other fragments.
                 # https://github.com/python/mypy/issues/5738
@@ -597,10 +672,10 @@ class WebSocketCommonProtocol(asyncio.Protocol):
                     confirm_opcode, data = prepare_data(message_chunk)
                     if confirm_opcode != opcode:
                         raise TypeError("data contains inconsistent types")
-                    await self.write_frame(False, OP_CONT, data)
+                    await self.write_frame(False, OP_CONT, data, extensions=extensions)
 
                 # Final fragment.
-                await self.write_frame(True, OP_CONT, b"")
+                await self.write_frame(True, OP_CONT, b"", extensions=extensions)
 
             except Exception:
                 # We're half-way through a fragmented message and we can't
@@ -707,15 +782,21 @@ class WebSocketCommonProtocol(asyncio.Protocol):
             data = prepare_ctrl(data)
 
         # Protect against duplicates if a payload is explicitly set.
-        if data in self.pings:
+        if data in self.pings or (
+            data is not None and data == self.keepalive_ping_data
+        ):
             raise RuntimeError("already waiting for a pong with the same data")
 
         # Generate a unique random payload otherwise.
-        while data is None or data in self.pings:
+        while data is None or data in self.pings or data == self.keepalive_ping_data:
             data = struct.pack("!I", random.getrandbits(32))
 
         self.pings[data] = self.loop.create_future()
 
+        # A pong for this ping acknowledges the pending keepalive ping too.
+        if self.keepalive_ping_data is not None and self.keepalive_next_ping is None:
+            self.keepalive_next_ping = data
+
         await self.write_frame(True, OP_PING, data)
 
         return asyncio.shield(self.pings[data])
@@ -984,27 +1065,41 @@ class WebSocketCommonProtocol(asyncio.Protocol):
                         pass
 
             elif frame.opcode == OP_PONG:
-                if frame.data in self.pings:
-                    # Sending a pong for only the most recent ping is legal.
-                    # Acknowledge all previous pings too in that case.
-                    ping_id = None
-                    ping_ids = []
-                    for ping_id, ping in self.pings.items():
-                        ping_ids.append(ping_id)
-                        if not ping.done():
-                            ping.set_result(None)
-                        if ping_id == frame.data:
-                            break
-                    else:  # pragma: no cover
-                        assert False, "ping_id is in self.pings"
-                    # Remove acknowledged pings from self.pings.
-                    for ping_id in ping_ids:
-                        del self.pings[ping_id]
+                if frame.data == self.keepalive_ping_data:
+                    self.keepalive_pong()
+                elif frame.data in self.pings:
+                    ping_ids = self.acknowledge_pings(frame.data)
+                    if self.keepalive_next_ping in ping_ids:
+                        self.keepalive_pong()
 
             # 5.6. Data Frames
             else:
                 return frame
 
+    def acknowledge_pings(self, data: bytes) -> List[bytes]:
+        """
+        Acknowledge the ping with the given payload and all previous pings.
+
+        Sending a pong for only the most recent ping is legal.
+
+        Return the payloads of acknowledged pings.
+
+        """
+        ping_id = None
+        ping_ids = []
+        for ping_id, ping in self.pings.items():
+            ping_ids.append(ping_id)
+            if not ping.done():
+                ping.set_result(None)
+            if ping_id == data:
+                break
+        else:  # pragma: no cover
+            assert False, "ping_id is in self.pings"
+        # Remove acknowledged pings from self.pings.
+        for ping_id in ping_ids:
+            del self.pings[ping_id]
+        return ping_ids
+
     async def read_frame(self, max_size: Optional[int]) -> Frame:
         """
         Read a single frame from the connection.
@@ -1015,19 +1110,55 @@ class WebSocketCommonProtocol(asyncio.Protocol):
             mask=not self.is_client,
             max_size=max_size,
             extensions=self.extensions,
+            offload_threshold=self.offload_threshold,
         )
+        if self.lazy_keepalive:
+            self.last_frame_received = self.loop.time()
         if self.debug:
             self.logger.debug("< %s", frame)
         return frame
 
-    def write_frame_sync(self, fin: bool, opcode: int, data: bytes) -> None:
+    def prepare_extensions(self, compress: bool = True) -> List[Extension]:
+        """
+        Return the extensions that apply to the next message.
+
+        Let extensions adapt to the state of the write buffer.
+
+        """
+        if not self.extensions:
+            return self.extensions
+
+        # Extensions aren't required to inherit Extension.
+        for extension in self.extensions:
+            if getattr(extension, "observes_write_buffer", False):
+                transport = self.transport
+                size = transport.get_write_buffer_size()
+                low, high = transport.get_write_buffer_limits()
+                extension.observe_write_buffer(size, low, high)
+
+        if compress:
+            return self.extensions
+        return [
+            extension
+            for extension in self.extensions
+            if not getattr(extension, "compresses", False)
+        ]
+
+    def write_frame_sync(
+        self,
+        fin: bool,
+        opcode: int,
+        data: bytes,
+        *,
+        extensions: Optional[List[Extension]] = None,
+    ) -> None:
         frame = Frame(fin, Opcode(opcode), data)
         if self.debug:
             self.logger.debug("> %s", frame)
         frame.write(
             self.transport.write,
             mask=self.is_client,
-            extensions=self.extensions,
+            extensions=self.extensions if extensions is None else extensions,
         )
 
     async def drain(self) -> None:
@@ -1046,16 +1177,86 @@ class WebSocketCommonProtocol(asyncio.Protocol):
             await self.ensure_open()
 
     async def write_frame(
-        self, fin: bool, opcode: int, data: bytes, *, _state: int = State.OPEN
+        self,
+        fin: bool,
+        opcode: int,
+        data: bytes,
+        *,
+        extensions: Optional[List[Extension]] = None,
+        _state: int = State.OPEN,
     ) -> None:
         # Defensive assertion for protocol compliance.
         if self.state is not _state:  # pragma: no cover
             raise InvalidState(
                 f"Cannot write to a WebSocket in the {self.state.name} state"
             )
-        self.write_frame_sync(fin, opcode, data)
+        if extensions is None:
+            extensions = self.extensions
+        if (
+            self.offload_threshold is not None
+            and len(data) >= self.offload_threshold
+            and opcode in DATA_OPCODES
+            and extensions
+        ):
+            await self.write_frame_in_executor(fin, opcode, data, extensions=extensions)
+        else:
+            self.write_frame_sync(fin, opcode, data, extensions=extensions)
         await self.drain()
 
+    async def write_frame_in_executor(
+        self,
+        fin: bool,
+        opcode: int,
+        data: bytes,
+        *,
+        extensions: Optional[List[Extension]] = None,
+    ) -> None:
+        """
+        Encode a frame with extensions in the default executor and write it.
+
+        This avoids blocking the event loop while compressing large frames.
+
+        """
+        if extensions is None:
+            extensions = self.extensions
+        frame = Frame(fin, Opcode(opcode), data)
+        if self.debug:
+            self.logger.debug("> %s", frame)
+
+        # Prevent other coroutines from sending data frames until this frame
+        # is written, in order to preserve the ordering of frames and the
+        # consistency of the compression context.
+        assert self._offload_waiter is None
+        self._offload_waiter = self.loop.create_future()
+
+        try:
+            try:
+                data = await self.loop.run_in_executor(
+                    None,
+                    functools.partial(
+                        frame.new_frame.serialize,
+                        mask=self.is_client,
+                        extensions=extensions,
+                    ),
+                )
+            except asyncio.CancelledError:
+                # The frame may have been encoded and not sent. Since the
+                # compression context may be out of sync with the remote
+                # endpoint, the connection is unusable.
+                self.fail_connection(1011)
+                raise
+
+            # If the closing handshake started while the frame was encoded,
+            # it's too late to send it.
+            if self.state is not State.OPEN:
+                await self.ensure_open()
+
+            self.transport.write(data)
+
+        finally:
+            self._offload_waiter.set_result(None)
+            self._offload_waiter = None
+
     async def write_close_frame(
         self, close: Close, data: Optional[bytes] = None
     ) -> None:
@@ -1083,60 +1284,117 @@ class WebSocketCommonProtocol(asyncio.Protocol):
             # 7.1.2. Start the WebSocket Closing Handshake
             await self.write_frame(True, OP_CLOSE, data, _state=State.CLOSING)
 
-    async def keepalive_ping(self) -> None:
+    def write_close_frame_sync(
+        self, close: Close, data: Optional[bytes] = None
+    ) -> None:
         """
-        Send a Ping frame and wait for a Pong frame at regular intervals.
+        Write a close frame if and only if the connection state is OPEN.
+
+        Unlike :meth:`write_close_frame`, don't drain the write buffer. This
+        is acceptable for a single close frame. Keeping this method synchronous
+        guarantees that it can't get stuck and avoids running a coroutine.
+
+        """
+        if self.state is State.OPEN:
+            self.state = State.CLOSING
+            if self.debug:
+                self.logger.debug("= connection is CLOSING")
 
-        This coroutine exits when the connection terminates and one of the
-        following happens:
+            self.close_sent = close
+            if self.close_rcvd is not None:
+                self.close_rcvd_then_sent = True
+            if data is None:
+                data = close.serialize()
 
-        - :meth:`ping` raises :exc:`ConnectionClosed`, or
-        - :meth:`close_connection` cancels :attr:`keepalive_ping_task`.
+            self.write_frame_sync(True, OP_CLOSE, data)
 
+    def keepalive(self) -> Optional[float]:
         """
-        if self.ping_interval is None:
-            return
+        Send a keepalive ping or check that the last one was acknowledged.
 
-        try:
-            while True:
-                await asyncio.sleep(
-                    self.ping_interval,
-                    **loop_if_py_lt_38(self.loop),
-                )
+        :attr:`keepalive_scheduler` calls this method when the deadline set by
+        the previous call is reached. It returns the next deadline, in terms of
+        :meth:`~asyncio.loop.time`, or ``None`` to stop keepalive pings.
 
-                # ping() raises CancelledError if the connection is closed,
-                # when close_connection() cancels self.keepalive_ping_task.
+        When a pong acknowledges the keepalive ping, :meth:`keepalive_pong`
+        schedules the next ping ``ping_interval`` seconds later. If the pong
+        isn't received within ``ping_timeout`` seconds, the connection fails.
+        If ``ping_timeout`` is ``None``, pings are sent every ``ping_interval``
+        seconds regardless of pongs.
 
-                # ping() raises ConnectionClosed if the connection is lost,
-                # when connection_lost() calls abort_pings().
+        With ``lazy_keepalive``, the ping is postponed until no frame was
+        received for ``ping_interval`` seconds.
 
-                self.logger.debug("%% sending keepalive ping")
-                pong_waiter = await self.ping()
+        Keepalive pings stop when the connection is closing.
 
-                if self.ping_timeout is not None:
-                    try:
-                        await asyncio.wait_for(
-                            pong_waiter,
-                            self.ping_timeout,
-                            **loop_if_py_lt_38(self.loop),
-                        )
-                        self.logger.debug("%% received keepalive pong")
-                    except asyncio.TimeoutError:
-                        if self.debug:
-                            self.logger.debug("! timed out waiting for keepalive pong")
-                        self.fail_connection(1011, "keepalive ping timeout")
-                        break
-
-        # Remove this branch when dropping support for Python < 3.8
-        # because CancelledError no longer inherits Exception.
-        except asyncio.CancelledError:
-            raise
+        """
+        if self.keepalive_ping_data is not None and self.ping_timeout is not None:
+            if self.debug:
+                self.logger.debug("! timed out waiting for keepalive pong")
+            self.fail_connection(1011, "keepalive ping timeout")
+            return None
+
+        # Don't send pings once the closing handshake has started.
+        if self.state is not State.OPEN:
+            return None
 
-        except ConnectionClosed:
+        # Receiving frames shows that the connection is alive.
+        if self.lazy_keepalive:
+            assert self.ping_interval is not None
+            deadline = self.last_frame_received + self.ping_interval
+            if deadline > self.loop.time():
+                return deadline
+
+        # Let extensions release memory if the connection is idle. Not while
+        # a frame is encoded in an executor, as they're still using it.
+        # Extensions aren't required to inherit Extension.
+        if self._offload_waiter is None:
+            for extension in self.extensions:
+                if isinstance(extension, Extension):
+                    extension.release_idle_state()
+
+        self.logger.debug("%% sending keepalive ping")
+        data = None
+        while data is None or data in self.pings:
+            data = struct.pack("!I", random.getrandbits(32))
+        prev_ping = None
+        for prev_ping in self.pings:
             pass
+        self.keepalive_ping_data = data
+        self.keepalive_ping_time = self.loop.time()
+        self.keepalive_prev_ping = prev_ping
+        self.keepalive_next_ping = None
+        # A ping is small. Unlike ping(), don't wait until the write buffer is
+        # drained. This avoids running a coroutine for each keepalive ping.
+        self.write_frame_sync(True, OP_PING, data)
+
+        if self.ping_timeout is None:
+            assert self.ping_interval is not None
+            return self.keepalive_ping_time + self.ping_interval
+        return self.keepalive_ping_time + self.ping_timeout
+
+    def keepalive_pong(self) -> None:
+        """
+        Handle a pong acknowledging the keepalive ping.
 
-        except Exception:
-            self.logger.error("keepalive ping failed", exc_info=True)
+        Measure :attr:`latency` and schedule the next keepalive ping.
+
+        """
+        self.latency = self.loop.time() - self.keepalive_ping_time
+        self.logger.debug("%% received keepalive pong")
+        prev_ping = self.keepalive_prev_ping
+        self.keepalive_ping_data = None
+        self.keepalive_prev_ping = None
+        self.keepalive_next_ping = None
+        # Acknowledge pings sent with ping() before the keepalive ping.
+        if prev_ping in self.pings:
+            self.acknowledge_pings(prev_ping)
+        # When ping_timeout is None, keepalive() scheduled the next ping.
+        if self.ping_timeout is not None and self.state is State.OPEN:
+            assert self.ping_interval is not None
+            self.keepalive_scheduler.schedule(
+                self, self.loop.time() + self.ping_interval
+            )
 
     async def close_connection(self) -> None:
         """
@@ -1158,9 +1416,9 @@ class WebSocketCommonProtocol(asyncio.Protocol):
                 except asyncio.CancelledError:
                     pass
 
-            # Cancel the keepalive ping task.
-            if hasattr(self, "keepalive_ping_task"):
-                self.keepalive_ping_task.cancel()
+            # Stop keepalive pings.
+            if hasattr(self, "keepalive_scheduler"):
+                self.keepalive_scheduler.unschedule(self)
 
             # A client should wait for a TCP close from the server.
             if self.is_client and hasattr(self, "transfer_data_task"):
@@ -1272,32 +1530,16 @@ class WebSocketCommonProtocol(asyncio.Protocol):
         # sent if it's CLOSING), except when failing the connection because of
         # an error reading from or writing to the network.
         # Don't send a close frame if the connection is broken.
-        if code != 1006 and self.state is State.OPEN:
-            close = Close(code, reason)
-
+        if code != 1006:
             # Write the close frame without draining the write buffer.
 
             # Keeping fail_connection() synchronous guarantees it can't
             # get stuck and simplifies the implementation of the callers.
-            # Not drainig the write buffer is acceptable in this context.
-
-            # This duplicates a few lines of code from write_close_frame().
-
-            self.state = State.CLOSING
-            if self.debug:
-                self.logger.debug("= connection is CLOSING")
-
-            # If self.close_rcvd was set, the connection state would be
-            # CLOSING. Therefore self.close_rcvd isn't set and we don't
-            # have to set self.close_rcvd_then_sent.
-            assert self.close_rcvd is None
-            self.close_sent = close
+            self.write_close_frame_sync(Close(code, reason))
 
-            self.write_frame_sync(True, OP_CLOSE, close.serialize())
-
-        # Start close_connection_task if the opening handshake didn't succeed.
-        if not hasattr(self, "close_connection_task"):
-            self.close_connection_task = self.loop.create_task(self.close_connection())
+        # Start close_connection_task if it isn't running yet, for example
+        # if the opening handshake didn't succeed.
+        self.start_close_connection()
 
     def abort_pings(self) -> None:
         """
@@ -1350,6 +1592,10 @@ class WebSocketCommonProtocol(asyncio.Protocol):
 
         self.abort_pings()
 
+        # Stop keepalive pings.
+        if hasattr(self, "keepalive_scheduler"):
+            self.keepalive_scheduler.unschedule(self)
+
         # If self.connection_lost_waiter isn't pending, that's a bug, because:
         # - it's set only here in connection_lost() which is called only once;
         # - it must never be canceled.
@@ -1449,6 +1695,24 @@ def broadcast(websockets: Iterable[WebSocketCommonProtocol], message: Data) -> N
 
     opcode, data = prepare_data(message)
 
+    broadcast_frame(websockets, opcode, data)
+
+
+def broadcast_frame(
+    websockets: Iterable[WebSocketCommonProtocol], opcode: int, data: bytes
+) -> None:
+    """
+    Broadcast an unfragmented message, already encoded, to several connections.
+
+    This is the implementation of :func:`broadcast`. It lets callers that
+    receive messages in encoded form skip decoding and encoding them again.
+
+    :param opcode: :data:`~websockets.frames.OP_TEXT` or
+        :data:`~websockets.frames.OP_BINARY`
+    :param data: payload; UTF-8 encoded for text messages
+    :raises RuntimeError: if a connection is busy sending a fragmented message
+
+    """
     for websocket in websockets:
         if websocket.state is not State.OPEN:
             continue
@@ -1456,4 +1720,10 @@ def broadcast(websockets: Iterable[WebSocketCommonProtocol], message: Data) -> N
         if websocket._fragmented_message_waiter is not None:
             raise RuntimeError("busy sending a fragmented message")
 
-        websocket.write_frame_sync(True, opcode, data)
+        # While a frame is encoded in an executor, the compression context
+        # is in use. Send the message without compressing it.
+        if websocket._offload_waiter is not None:
+            extensions = websocket.prepare_extensions(compress=False)
+            websocket.write_frame_sync(True, opcode, data, extensions=extensions)
+        else:
+            websocket.write_frame_sync(True, opcode, data)
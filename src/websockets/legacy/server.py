@@ -6,17 +6,23 @@
 from __future__ import annotations
 
 import asyncio
-import email.utils
+import errno
 import functools
 import http
 import logging
+import math
+import multiprocessing
+import os
+import signal
 import socket
+import threading
 import warnings
 from types import TracebackType
 from typing import (
     Any,
     Awaitable,
     Callable,
+    Dict,
     Generator,
     List,
     Optional,
@@ -41,21 +47,35 @@ from ..exceptions import (
 )
 from ..extensions import Extension, ServerExtensionFactory
 from ..extensions.permessage_deflate import enable_server_permessage_deflate
+from ..frames import Close
 from ..headers import (
     build_extension,
     parse_extension,
     parse_subprotocol,
     validate_subprotocols,
 )
-from ..http import USER_AGENT
+from ..http import USER_AGENT, ResponseTemplate, ResponseTemplateCache, build_date
+from ..http11 import MAX_HEAD
 from ..typing import ExtensionHeader, LoggerLike, Origin, Subprotocol
+from ..utils import accept_key
 from .compatibility import loop_if_py_lt_38
+from .fanout import Fanout
 from .handshake import build_response, check_request
 from .http import read_request
+from .keepalive import KeepaliveScheduler
 from .protocol import WebSocketCommonProtocol
 
 
-__all__ = ["serve", "unix_serve", "WebSocketServerProtocol", "WebSocketServer"]
+__all__ = [
+    "serve",
+    "serve_multi",
+    "serve_threaded",
+    "unix_serve",
+    "WebSocketServerProtocol",
+    "WebSocketServer",
+    "WebSocketServerPool",
+    "ThreadedWebSocketServer",
+]
 
 
 HeadersLikeOrCallable = Union[HeadersLike, Callable[[str, Headers], HeadersLike]]
@@ -63,6 +83,41 @@ HeadersLikeOrCallable = Union[HeadersLike, Callable[[str, Headers], HeadersLike]
 HTTPResponse = Tuple[http.HTTPStatus, HeadersLike, bytes]
 
 
+# Delay suggested to clients rejected by admission control, in seconds.
+RETRY_AFTER = 1
+
+
+def build_service_unavailable() -> bytes:
+    """
+    Build the HTTP 503 response sent to clients rejected by admission control.
+
+    The response doesn't depend on the request, so it's built only once. It
+    doesn't include a Date header, which is optional for 5xx responses.
+
+    """
+    body = b"Too many connections. Try again later.\n"
+    headers = Headers()
+    headers["Retry-After"] = str(RETRY_AFTER)
+    headers["Server"] = USER_AGENT
+    headers["Content-Length"] = str(len(body))
+    headers["Content-Type"] = "text/plain"
+    headers["Connection"] = "close"
+    status = http.HTTPStatus.SERVICE_UNAVAILABLE
+    response = f"HTTP/1.1 {status.value} {status.phrase}\r\n{headers}"
+    return response.encode() + body
+
+
+SERVICE_UNAVAILABLE = build_service_unavailable()
+
+
+# When the server closes, close frames are written in chunks of this many
+# connections, yielding to the event loop between chunks.
+CLOSE_CHUNK_SIZE = 1000
+
+# With close_drain, close frames are written every CLOSE_DRAIN_INTERVAL.
+CLOSE_DRAIN_INTERVAL = 0.01
+
+
 class WebSocketServerProtocol(WebSocketCommonProtocol):
     """
     :class:`~asyncio.Protocol` subclass implementing a WebSocket server.
@@ -95,6 +150,11 @@ class WebSocketServerProtocol(WebSocketCommonProtocol):
     It raises a :exc:`~websockets.exceptions.ConnectionClosedError` exception
     when the connection is closed with any other code.
 
+    If the opening handshake doesn't complete within ``open_timeout`` seconds,
+    the TCP connection is aborted. This prevents stalled clients from holding
+    resources. The default value is 10 seconds. Set ``open_timeout`` to
+    ``None`` to disable the timeout.
+
     Once the connection is open, a `Ping frame`_ is sent every
     ``ping_interval`` seconds. This serves as a keepalive. It helps keeping
     the connection open, especially in the presence of proxies with short
@@ -110,6 +170,14 @@ class WebSocketServerProtocol(WebSocketCommonProtocol):
 
     .. _Pong frame: https://www.rfc-editor.org/rfc/rfc6455.html#section-5.5.3
 
+    If ``lazy_keepalive`` is ``True``, receiving any frame postpones the next
+    Ping frame, which is only sent after ``ping_interval`` seconds without
+    receiving anything. This saves Ping and Pong frames on busy connections.
+    The default value is ``False``.
+
+    When a Pong frame acknowledges a keepalive Ping frame, the round-trip time
+    is stored in the :attr:`latency` attribute, in seconds.
+
     The ``close_timeout`` parameter defines a maximum wait time for completing
     the closing handshake and terminating the TCP connection. For legacy
     reasons, :meth:`close` completes in at most ``4 * close_timeout`` seconds.
@@ -153,6 +221,12 @@ class WebSocketServerProtocol(WebSocketCommonProtocol):
     The default value is 64 KiB, equal to asyncio's default (based on the
     current implementation of ``FlowControlMixin``).
 
+    The ``offload_threshold`` argument enables compressing and decompressing
+    frames of at least this many bytes in the default executor of the event
+    loop instead of blocking it. This reduces latency for other connections
+    when large messages are exchanged. Frames are still sent and received in
+    order. The default value is ``None``, which disables this behavior.
+
     As soon as the HTTP request and response in the opening handshake are
     processed:
 
@@ -189,6 +263,7 @@ class WebSocketServerProtocol(WebSocketCommonProtocol):
         select_subprotocol: Optional[
             Callable[[Sequence[Subprotocol], Sequence[Subprotocol]], Subprotocol]
         ] = None,
+        open_timeout: Optional[float] = 10,
         logger: Optional[LoggerLike] = None,
         **kwargs: Any,
     ) -> None:
@@ -201,6 +276,8 @@ class WebSocketServerProtocol(WebSocketCommonProtocol):
             origins = [None if origin == "" else origin for origin in origins]
         self.ws_handler = ws_handler
         self.ws_server = ws_server
+        self.keepalive_scheduler = ws_server.keepalive_scheduler
+        self.open_timeout = open_timeout
         self.origins = origins
         self.available_extensions = extensions
         self.available_subprotocols = subprotocols
@@ -220,6 +297,35 @@ class WebSocketServerProtocol(WebSocketCommonProtocol):
         # schedules its execution, and the moment the handler starts running.
         self.ws_server.register(self)
         self.handler_task = self.loop.create_task(self.handler())
+        # Rather than wrapping the opening handshake in wait_for(), which sets
+        # a timer for each connection, rely on the keepalive scheduler, which
+        # batches deadlines of all connections. See keepalive().
+        if self.open_timeout is not None:
+            self.keepalive_scheduler.schedule(
+                self, self.loop.time() + self.open_timeout
+            )
+
+    def connection_open(self) -> None:
+        # Cancel the opening handshake timeout. This must happen before
+        # scheduling the first keepalive ping, which replaces the deadline.
+        if self.open_timeout is not None:
+            self.keepalive_scheduler.unschedule(self)
+        super().connection_open()
+
+    def keepalive(self) -> Optional[float]:
+        """
+        Abort the connection if the opening handshake timed out.
+
+        Then, once the connection is open, send keepalive pings as described
+        in :meth:`~websockets.legacy.protocol.WebSocketCommonProtocol.keepalive`.
+
+        """
+        if self.state is State.CONNECTING:
+            self.logger.info("connection failed (opening handshake timed out)")
+            self.transport.abort()
+            self.handler_task.cancel()
+            return None
+        return super().keepalive()
 
     async def handler(self) -> None:
         """
@@ -288,7 +394,7 @@ class WebSocketServerProtocol(WebSocketCommonProtocol):
                         ),
                     )
 
-                headers.setdefault("Date", email.utils.formatdate(usegmt=True))
+                headers.setdefault("Date", build_date())
                 headers.setdefault("Server", USER_AGENT)
                 headers.setdefault("Content-Length", str(len(body)))
                 headers.setdefault("Content-Type", "text/plain")
@@ -300,6 +406,8 @@ class WebSocketServerProtocol(WebSocketCommonProtocol):
                 )
                 await self.close_transport()
                 return
+            finally:
+                self.ws_server.handshakes -= 1
 
             try:
                 await self.ws_handler(self, path)
@@ -683,23 +791,44 @@ class WebSocketServerProtocol(WebSocketCommonProtocol):
             request_headers, available_subprotocols
         )
 
-        response_headers = Headers()
+        # Unless extra headers depend on the request, only the key and the
+        # date change between connections. Reuse a template for the rest.
+        # Extra headers may be mutable or differ between connections. Take a
+        # snapshot and look up the template with it.
+        templates = self.ws_server.response_templates
+        template = None
+        extra_items: Optional[Tuple[Tuple[str, str], ...]] = None
+        if not callable(extra_headers):
+            if extra_headers is None:
+                extra_items = ()
+            else:
+                extra_headers = Headers(extra_headers)
+                extra_items = tuple(extra_headers.raw_items())
+            template = templates.get(extensions_header, protocol_header, extra_items)
+        if template is None:
+            response_headers = Headers()
+
+            build_response(response_headers, key)
+
+            if extensions_header is not None:
+                response_headers["Sec-WebSocket-Extensions"] = extensions_header
 
-        build_response(response_headers, key)
+            if protocol_header is not None:
+                response_headers["Sec-WebSocket-Protocol"] = protocol_header
 
-        if extensions_header is not None:
-            response_headers["Sec-WebSocket-Extensions"] = extensions_header
+            if callable(extra_headers):
+                extra_headers = extra_headers(path, self.request_headers)
+            if extra_headers is not None:
+                response_headers.update(extra_headers)
 
-        if protocol_header is not None:
-            response_headers["Sec-WebSocket-Protocol"] = protocol_header
+            response_headers.setdefault("Date", "")  # filled in by the template
+            response_headers.setdefault("Server", USER_AGENT)
 
-        if callable(extra_headers):
-            extra_headers = extra_headers(path, self.request_headers)
-        if extra_headers is not None:
-            response_headers.update(extra_headers)
+            template = ResponseTemplate(response_headers)
+            if extra_items is not None:
+                templates.add(extensions_header, protocol_header, template, extra_items)
 
-        response_headers.setdefault("Date", email.utils.formatdate(usegmt=True))
-        response_headers.setdefault("Server", USER_AGENT)
+        response_headers = template.render(accept_key(key), build_date())
 
         self.write_http_response(http.HTTPStatus.SWITCHING_PROTOCOLS, response_headers)
 
@@ -710,6 +839,93 @@ class WebSocketServerProtocol(WebSocketCommonProtocol):
         return path
 
 
+def format_sockname(sock: socket.socket) -> str:
+    """
+    Format the address of a listening socket for logging.
+
+    """
+    if sock.family == socket.AF_INET:
+        return "%s:%d" % sock.getsockname()
+    elif sock.family == socket.AF_INET6:
+        return "[%s]:%d" % sock.getsockname()[:2]
+    elif sock.family == socket.AF_UNIX:
+        return cast(str, sock.getsockname())
+    # In the unlikely event that someone runs websockets over a protocol
+    # other than IP or Unix sockets, avoid crashing.
+    else:  # pragma: no cover
+        return str(sock.getsockname())
+
+
+class TokenBucket:
+    """
+    Limit the rate of events to ``rate`` per second, with bursts of ``burst``.
+
+    """
+
+    def __init__(
+        self, loop: asyncio.AbstractEventLoop, rate: float, burst: int
+    ) -> None:
+        self.loop = loop
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.time = loop.time()
+
+    def take(self) -> bool:
+        """
+        Consume a token if one is available.
+
+        """
+        now = self.loop.time()
+        self.tokens = min(self.burst, self.tokens + (now - self.time) * self.rate)
+        self.time = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class ServiceUnavailableProtocol(asyncio.Protocol):
+    """
+    Reject a connection with a HTTP 503 error.
+
+    Wait for the end of the request headers, send a precomputed response, and
+    close the connection. Closing the connection before reading the request
+    could reset it and prevent the client from receiving the response.
+
+    """
+
+    def __init__(self, ws_server: WebSocketServer) -> None:
+        self.ws_server = ws_server
+        self.received = 0
+        self.tail = b""
+        # Like WebSocketServerProtocol, for tracking connections.
+        self.connection_lost_waiter: asyncio.Future[None]
+        self.connection_lost_waiter = ws_server.loop.create_future()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = cast(asyncio.Transport, transport)
+        self.timeout = self.ws_server.loop.call_later(
+            self.ws_server.close_timeout, self.transport.abort
+        )
+
+    def data_received(self, data: bytes) -> None:
+        if self.transport.is_closing():
+            return
+        self.received += len(data)
+        tail = self.tail + data
+        if b"\r\n\r\n" in tail or self.received > MAX_HEAD:
+            self.transport.write(SERVICE_UNAVAILABLE)
+            self.transport.close()
+            self.ws_server.logger.info("connection rejected (503 Service Unavailable)")
+        else:
+            self.tail = tail[-3:]
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.timeout.cancel()
+        self.connection_lost_waiter.set_result(None)
+
+
 class WebSocketServer:
     """
     WebSocket server returned by :func:`serve`.
@@ -731,7 +947,16 @@ class WebSocketServer:
     """
 
     def __init__(
-        self, loop: asyncio.AbstractEventLoop, logger: Optional[LoggerLike] = None
+        self,
+        loop: asyncio.AbstractEventLoop,
+        logger: Optional[LoggerLike] = None,
+        *,
+        max_handshakes: Optional[int] = None,
+        max_connections: Optional[int] = None,
+        accept_rate: Optional[float] = None,
+        accept_burst: Optional[int] = None,
+        close_timeout: float = 10,
+        close_drain: float = 0,
     ) -> None:
         # Store a reference to loop to avoid relying on self.server._loop.
         self.loop = loop
@@ -743,12 +968,34 @@ class WebSocketServer:
         # Keep track of active connections.
         self.websockets: Set[WebSocketServerProtocol] = set()
 
+        # Number of connections performing the opening handshake.
+        self.handshakes = 0
+
+        # Admission control, see admit().
+        self.max_handshakes = max_handshakes
+        self.max_connections = max_connections
+        self.accept_bucket: Optional[TokenBucket] = None
+        if accept_rate is not None:
+            if accept_burst is None:
+                accept_burst = max(1, int(accept_rate))
+            self.accept_bucket = TokenBucket(loop, accept_rate, accept_burst)
+        self.close_timeout = close_timeout
+
+        # Duration over which close frames are spread when closing the server.
+        self.close_drain = close_drain
+
         # Task responsible for closing the server and terminating connections.
         self.close_task: Optional[asyncio.Task[None]] = None
 
         # Completed when the server is closed and connections are terminated.
         self.closed_waiter: asyncio.Future[None] = loop.create_future()
 
+        # Scheduler of keepalive pings, shared by all connections.
+        self.keepalive_scheduler = KeepaliveScheduler(loop)
+
+        # Templates of successful handshake responses, see handshake().
+        self.response_templates = ResponseTemplateCache()
+
     def wrap(self, server: asyncio.AbstractServer) -> None:
         """
         Attach to a given :class:`~asyncio.Server`.
@@ -766,17 +1013,7 @@ class WebSocketServer:
         self.server = server
         assert server.sockets is not None
         for sock in server.sockets:
-            if sock.family == socket.AF_INET:
-                name = "%s:%d" % sock.getsockname()
-            elif sock.family == socket.AF_INET6:
-                name = "[%s]:%d" % sock.getsockname()[:2]
-            elif sock.family == socket.AF_UNIX:
-                name = sock.getsockname()
-            # In the unlikely event that someone runs websockets over a
-            # protocol other than IP or Unix sockets, avoid crashing.
-            else:  # pragma: no cover
-                name = str(sock.getsockname())
-            self.logger.info("server listening on %s", name)
+            self.logger.info("server listening on %s", format_sockname(sock))
 
     def register(self, protocol: WebSocketServerProtocol) -> None:
         """
@@ -784,6 +1021,33 @@ class WebSocketServer:
 
         """
         self.websockets.add(protocol)
+        self.handshakes += 1
+
+    def admit(
+        self, create_protocol: Callable[[], asyncio.Protocol]
+    ) -> asyncio.Protocol:
+        """
+        Create a protocol for a new TCP connection, unless limits are reached.
+
+        When the server has ``max_connections`` connections, when it performs
+        ``max_handshakes`` opening handshakes, or when connections arrive
+        faster than ``accept_rate``, reject the connection with a HTTP 503
+        error without creating a :class:`WebSocketServerProtocol`.
+
+        """
+        if (
+            (
+                self.max_connections is not None
+                and len(self.websockets) >= self.max_connections
+            )
+            or (
+                self.max_handshakes is not None
+                and self.handshakes >= self.max_handshakes
+            )
+            or (self.accept_bucket is not None and not self.accept_bucket.take())
+        ):
+            return ServiceUnavailableProtocol(self)
+        return create_protocol()
 
     def unregister(self, protocol: WebSocketServerProtocol) -> None:
         """
@@ -810,7 +1074,11 @@ class WebSocketServer:
           unavailable) error; this happens when the server accepted the TCP
           connection but didn't complete the WebSocket opening handshake prior
           to closing;
-        * closes open WebSocket connections with close code 1001 (going away).
+        * closes open WebSocket connections with close code 1001 (going away);
+          close frames are spread over ``close_drain`` seconds, if set, to
+          avoid a surge of reconnections;
+        * aborts TCP connections that aren't closed ``close_timeout`` seconds
+          after sending the last close frame.
 
         :meth:`close` is idempotent.
 
@@ -841,26 +1109,49 @@ class WebSocketServer:
 
         # Close OPEN connections with status code 1001. Since the server was
         # closed, handshake() closes OPENING connections with a HTTP 503
-        # error. Wait until all connections are closed.
+        # error.
+
+        # Rather than running close() in a task for each connection, start
+        # closing handshakes synchronously, in chunks. Connection handlers
+        # complete closing handshakes, as usual.
+        websockets = list(self.websockets)
+        if websockets:
+            count = len(websockets)
+            if self.close_drain > 0:
+                chunks = math.ceil(self.close_drain / CLOSE_DRAIN_INTERVAL)
+                chunks = min(count, chunks)
+                delay = self.close_drain / chunks
+            else:
+                chunks = math.ceil(count / CLOSE_CHUNK_SIZE)
+                delay = 0
+            chunk_size = math.ceil(count / chunks)
 
-        # asyncio.wait doesn't accept an empty first argument
-        if self.websockets:
-            await asyncio.wait(
-                [
-                    asyncio.create_task(websocket.close(1001))
-                    for websocket in self.websockets
-                ],
-                **loop_if_py_lt_38(self.loop),
-            )
+            close = Close(1001, "")
+            data = close.serialize()
+            for start in range(0, count, chunk_size):
+                if start:
+                    await asyncio.sleep(delay, **loop_if_py_lt_38(self.loop))
+                for websocket in websockets[start : start + chunk_size]:
+                    websocket.write_close_frame_sync(close, data)
 
-        # Wait until all connection handlers are complete.
+        # Wait until all connection handlers are complete. Abort connections
+        # that aren't closed when close_timeout elapses, all at once.
 
         # asyncio.wait doesn't accept an empty first argument.
         if self.websockets:
-            await asyncio.wait(
+            _, pending = await asyncio.wait(
                 [websocket.handler_task for websocket in self.websockets],
+                timeout=self.close_timeout,
                 **loop_if_py_lt_38(self.loop),
             )
+            if pending:
+                self.logger.info(
+                    "closing handshake timed out; aborting %d connections",
+                    len(pending),
+                )
+                for websocket in self.websockets:
+                    websocket.transport.abort()
+                await asyncio.wait(pending, **loop_if_py_lt_38(self.loop))
 
         # Tell wait_closed() to return.
         self.closed_waiter.set_result(None)
@@ -939,9 +1230,28 @@ class Serve:
     be replaced by a wrapper or a subclass to customize the protocol that
     manages the connection.
 
-    The behavior of ``ping_interval``, ``ping_timeout``, ``close_timeout``,
-    ``max_size``, ``max_queue``, ``read_limit``, and ``write_limit`` is
-    described in :class:`WebSocketServerProtocol`.
+    The behavior of ``open_timeout``, ``ping_interval``, ``ping_timeout``,
+    ``lazy_keepalive``, ``close_timeout``, ``max_size``, ``max_queue``,
+    ``read_limit``, ``write_limit``, and ``offload_threshold`` is described in
+    :class:`WebSocketServerProtocol`.
+
+    :func:`serve` provides admission control against surges of connections,
+    for example when many clients reconnect after a restart:
+
+    * ``max_handshakes`` limits the number of concurrent opening handshakes;
+    * ``max_connections`` limits the number of open connections;
+    * ``accept_rate`` limits the rate of new connections per second; the rate
+      may be exceeded in bursts of up to ``accept_burst`` connections, which
+      defaults to ``accept_rate``.
+
+    When a limit is reached, new connections are rejected with a HTTP 503
+    error including a ``Retry-After`` header, without creating a
+    :class:`WebSocketServerProtocol`. By default, there's no limit.
+
+    When the server closes, ``close_drain`` spreads close frames over this
+    many seconds in order to stagger reconnections of clients. The default
+    value is ``0``, which sends all close frames right away. Connections that
+    aren't closed ``close_timeout`` seconds later are aborted.
 
     :func:`serve` also accepts the following optional arguments:
 
@@ -987,11 +1297,19 @@ class Serve:
         create_protocol: Optional[Callable[[Any], WebSocketServerProtocol]] = None,
         ping_interval: Optional[float] = 20,
         ping_timeout: Optional[float] = 20,
+        lazy_keepalive: bool = False,
         close_timeout: Optional[float] = None,
         max_size: Optional[int] = 2 ** 20,
         max_queue: Optional[int] = 2 ** 5,
         read_limit: int = 2 ** 16,
         write_limit: int = 2 ** 16,
+        offload_threshold: Optional[int] = None,
+        open_timeout: Optional[float] = 10,
+        max_handshakes: Optional[int] = None,
+        max_connections: Optional[int] = None,
+        accept_rate: Optional[float] = None,
+        accept_burst: Optional[int] = None,
+        close_drain: float = 0,
         compression: Optional[str] = "deflate",
         origins: Optional[Sequence[Optional[Origin]]] = None,
         extensions: Optional[Sequence[ServerExtensionFactory]] = None,
@@ -1037,7 +1355,16 @@ class Serve:
             loop = _loop
             warnings.warn("remove loop argument", DeprecationWarning)
 
-        ws_server = WebSocketServer(logger=logger, loop=loop)
+        ws_server = WebSocketServer(
+            logger=logger,
+            loop=loop,
+            max_handshakes=max_handshakes,
+            max_connections=max_connections,
+            accept_rate=accept_rate,
+            accept_burst=accept_burst,
+            close_timeout=close_timeout,
+            close_drain=close_drain,
+        )
 
         secure = kwargs.get("ssl") is not None
 
@@ -1049,7 +1376,7 @@ class Serve:
         if subprotocols is not None:
             validate_subprotocols(subprotocols)
 
-        factory = functools.partial(
+        factory: Callable[[], asyncio.Protocol] = functools.partial(
             create_protocol,
             ws_handler,
             ws_server,
@@ -1058,11 +1385,14 @@ class Serve:
             secure=secure,
             ping_interval=ping_interval,
             ping_timeout=ping_timeout,
+            lazy_keepalive=lazy_keepalive,
             close_timeout=close_timeout,
             max_size=max_size,
             max_queue=max_queue,
             read_limit=read_limit,
             write_limit=write_limit,
+            offload_threshold=offload_threshold,
+            open_timeout=open_timeout,
             loop=_loop,
             legacy_recv=legacy_recv,
             origins=origins,
@@ -1074,6 +1404,13 @@ class Serve:
             logger=logger,
         )
 
+        if (
+            max_handshakes is not None
+            or max_connections is not None
+            or accept_rate is not None
+        ):
+            factory = functools.partial(ws_server.admit, factory)
+
         if kwargs.pop("unix", False):
             path: Optional[str] = kwargs.pop("path", None)
             # unix_serve(path) must not specify host and port parameters.
@@ -1090,6 +1427,10 @@ class Serve:
         self._create_server = create_server
         self.ws_server = ws_server
 
+        # serve_threaded() uses the protocol factory for connections accepted
+        # in another thread.
+        self.factory = factory
+
     # async with serve(...)
 
     async def __aenter__(self) -> WebSocketServer:
@@ -1142,3 +1483,974 @@ def unix_serve(
 
     """
     return serve(ws_handler, path=path, unix=True, **kwargs)
+
+
+def check_limits(kwargs: Dict[str, Any], count: int, unit: str) -> None:
+    """
+    Check that limits on connections can be split between ``count`` servers.
+
+    :raises ValueError: if a limit is lower than ``count``
+
+    """
+    for name in ["max_handshakes", "max_connections"]:
+        limit = kwargs.get(name)
+        if limit is not None and limit < count:
+            raise ValueError(f"{name} must be at least {unit}")
+
+
+def split_limits(kwargs: Dict[str, Any], count: int, index: int) -> Dict[str, Any]:
+    """
+    Return arguments of :func:`serve` for one of ``count`` servers.
+
+    Limits on connections apply to all servers together. Split them evenly.
+
+    """
+    kwargs = dict(kwargs)
+    for name in ["max_handshakes", "max_connections", "accept_burst"]:
+        limit = kwargs.get(name)
+        if limit is not None:
+            share = limit // count + (1 if index < limit % count else 0)
+            kwargs[name] = max(1, share)
+    accept_rate = kwargs.get("accept_rate")
+    if accept_rate is not None:
+        kwargs["accept_rate"] = accept_rate / count
+    return kwargs
+
+
+def bind_sockets(
+    host: Optional[Union[str, Sequence[str]]],
+    port: Optional[int],
+    *,
+    reuse_port: bool = False,
+    backlog: int = 100,
+) -> List[socket.socket]:
+    """
+    Create listening sockets like :meth:`~asyncio.loop.create_server`.
+
+    """
+    if host == "":
+        host = None
+    hosts: Sequence[Optional[str]]
+    if host is None or isinstance(host, str):
+        hosts = [host]
+    else:
+        hosts = host
+
+    infos = set()
+    for host in hosts:
+        infos.update(
+            socket.getaddrinfo(
+                host, port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE
+            )
+        )
+
+    sockets = []
+    try:
+        for family, type, proto, _, address in sorted(infos):
+            sock = socket.socket(family, type, proto)
+            sockets.append(sock)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            if reuse_port:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            # Like asyncio, don't accept IPv4 connections on IPv6 sockets.
+            if family == socket.AF_INET6:
+                sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+            sock.bind(address)
+            sock.listen(backlog)
+            sock.setblocking(False)
+    except BaseException:
+        for sock in sockets:
+            sock.close()
+        raise
+    return sockets
+
+
+# When a worker process exits less than WORKER_MIN_UPTIME seconds after it
+# started, e.g. because the server cannot start, restarting it immediately
+# would fork processes in a loop. After the first quick exit, delay restarts
+# by WORKER_RESTART_DELAY, doubling up to WORKER_RESTART_MAX_DELAY.
+WORKER_MIN_UPTIME = 1.0
+WORKER_RESTART_DELAY = 0.1
+WORKER_RESTART_MAX_DELAY = 30.0
+
+
+class WebSocketServerPool:
+    """
+    WebSocket servers running in worker processes, returned by
+    :func:`serve_multi`.
+
+    Like :class:`WebSocketServer`, this class provides the
+    :meth:`close` and :meth:`wait_closed` methods.
+
+    It supervises worker processes and restarts them if they exit while the
+    pool is serving.
+
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        ws_handler: Callable[[WebSocketServerProtocol, str], Awaitable[Any]],
+        worker_sockets: Sequence[Sequence[socket.socket]],
+        serve_kwargs: Dict[str, Any],
+        fanout: Optional[Fanout] = None,
+        logger: Optional[LoggerLike] = None,
+    ) -> None:
+        self.loop = loop
+
+        if logger is None:
+            logger = logging.getLogger("websockets.server")
+        self.logger = logger
+
+        self.ws_handler = ws_handler
+        self.serve_kwargs = serve_kwargs
+
+        # Fan-out layer broadcasting messages across workers, if any.
+        self.fanout = fanout
+
+        # Listening sockets of each worker. Workers share the same sockets
+        # unless serve_multi() was called with reuse_port=True.
+        self.worker_sockets = worker_sockets
+
+        # Workers are forked, so they inherit listening sockets and don't
+        # require pickling ws_handler and serve_kwargs.
+        self.context = multiprocessing.get_context("fork")
+
+        # Number of open connections in each worker, updated by the worker.
+        self.counts = self.context.RawArray("l", len(worker_sockets))
+
+        # Worker processes.
+        self.processes: List[Optional[multiprocessing.process.BaseProcess]] = [
+            None
+        ] * len(worker_sockets)
+
+        # Completed when each worker process exits.
+        self.exit_waiters: Dict[int, asyncio.Future[None]] = {}
+
+        # Start time of each worker process and delay before restarting it.
+        self.start_times = [0.0] * len(worker_sockets)
+        self.restart_delays = [0.0] * len(worker_sockets)
+
+        # Delayed restarts of worker processes.
+        self.restart_handles: Dict[int, asyncio.TimerHandle] = {}
+
+        # Task responsible for stopping workers.
+        self.close_task: Optional[asyncio.Task[None]] = None
+
+        # Completed when workers are stopped and sockets are closed.
+        self.closed_waiter: asyncio.Future[None] = loop.create_future()
+
+    def start(self) -> None:
+        """
+        Start all worker processes.
+
+        """
+        for sock in self.sockets:
+            self.logger.info("server listening on %s", format_sockname(sock))
+        for index in range(len(self.processes)):
+            self.start_worker(index)
+
+    def start_worker(self, index: int) -> None:
+        """
+        Start the worker process with the given index.
+
+        """
+        self.counts[index] = 0
+        process = self.context.Process(
+            target=self.run_worker,
+            args=(index,),
+            name=f"websockets-worker-{index}",
+            daemon=True,
+        )
+        # Block SIGTERM until the worker is ready to handle it. Else, closing
+        # the server while the worker is starting would kill it abruptly.
+        mask = signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGTERM})
+        try:
+            process.start()
+        finally:
+            signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+        self.processes[index] = process
+        self.start_times[index] = self.loop.time()
+        self.exit_waiters[index] = self.loop.create_future()
+        self.loop.add_reader(process.sentinel, self.worker_exited, index, process)
+
+    def worker_exited(
+        self, index: int, process: multiprocessing.process.BaseProcess
+    ) -> None:
+        """
+        Handle the termination of a worker process.
+
+        """
+        self.loop.remove_reader(process.sentinel)
+        process.join()
+        self.counts[index] = 0
+        self.exit_waiters.pop(index).set_result(None)
+        if self.close_task is None:
+            if self.loop.time() - self.start_times[index] < WORKER_MIN_UPTIME:
+                delay = self.restart_delays[index]
+                self.restart_delays[index] = min(
+                    max(2 * delay, WORKER_RESTART_DELAY), WORKER_RESTART_MAX_DELAY
+                )
+            else:
+                delay = self.restart_delays[index] = 0.0
+            if delay == 0.0:
+                self.logger.error(
+                    "worker %d exited with code %s; restarting",
+                    index,
+                    process.exitcode,
+                )
+                self.start_worker(index)
+            else:
+                self.logger.error(
+                    "worker %d exited with code %s; restarting in %.1f seconds",
+                    index,
+                    process.exitcode,
+                    delay,
+                )
+                self.restart_handles[index] = self.loop.call_later(
+                    delay, self.restart_worker, index
+                )
+
+    def restart_worker(self, index: int) -> None:
+        """
+        Restart the worker process with the given index after a delay.
+
+        """
+        del self.restart_handles[index]
+        self.start_worker(index)
+
+    def run_worker(self, index: int) -> None:
+        """
+        Run the server of the worker with the given index.
+
+        This method runs in the worker process.
+
+        """
+        # Forget signal handling inherited from the event loop of the parent.
+        # Let the parent handle SIGINT e.g. on Ctrl-C and send SIGTERM.
+        signal.set_wakeup_fd(-1)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+        # Release listening sockets of other workers.
+        sockets = self.worker_sockets[index]
+        for sock in self.sockets:
+            if sock not in sockets:
+                sock.close()
+
+        # Release resources of the fan-out layer in the supervisor.
+        if self.fanout is not None:
+            self.fanout.after_fork()
+
+        asyncio.run(self.serve_worker(index, sockets))
+
+    async def serve_worker(self, index: int, sockets: Sequence[socket.socket]) -> None:
+        """
+        Serve connections on the given sockets until receiving SIGTERM.
+
+        This coroutine runs in the worker process.
+
+        """
+        loop = asyncio.get_event_loop()
+        stop: asyncio.Future[None] = loop.create_future()
+
+        def on_sigterm() -> None:
+            if not stop.done():
+                stop.set_result(None)
+
+        loop.add_signal_handler(signal.SIGTERM, on_sigterm)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGTERM})
+
+        counts = self.counts
+        kwargs = split_limits(self.serve_kwargs, len(self.worker_sockets), index)
+        create_protocol: Callable[..., WebSocketServerProtocol]
+        create_protocol = kwargs.pop("create_protocol", None)
+        if create_protocol is None:
+            create_protocol = WebSocketServerProtocol
+
+        def discard(waiter: asyncio.Future[None]) -> None:
+            counts[index] -= 1
+
+        def count_connections(*args: Any, **kwargs: Any) -> WebSocketServerProtocol:
+            protocol = create_protocol(*args, **kwargs)
+            counts[index] += 1
+            protocol.connection_lost_waiter.add_done_callback(discard)
+            return protocol
+
+        if self.fanout is not None:
+            await self.fanout.connect()
+
+        servers = [
+            await serve(
+                self.ws_handler,
+                sock=sock,
+                create_protocol=count_connections,
+                logger=self.logger,
+                **kwargs,
+            )
+            for sock in sockets
+        ]
+
+        await stop
+
+        for server in servers:
+            server.close()
+        for server in servers:
+            await server.wait_closed()
+
+        if self.fanout is not None:
+            await self.fanout.disconnect()
+
+    @property
+    def sockets(self) -> List[socket.socket]:
+        """
+        List of :class:`~socket.socket` objects the workers are listening to.
+
+        """
+        sockets: List[socket.socket] = []
+        for worker_sockets in self.worker_sockets:
+            sockets.extend(s for s in worker_sockets if s not in sockets)
+        return sockets
+
+    @property
+    def connections(self) -> int:
+        """
+        Number of open connections across all workers.
+
+        """
+        return sum(self.counts)
+
+    def is_serving(self) -> bool:
+        """
+        Tell whether the server is accepting new connections or shutting down.
+
+        """
+        return self.close_task is None
+
+    def close(self) -> None:
+        """
+        Close the server.
+
+        This method sends ``SIGTERM`` to each worker process. Then workers
+        close their server as described in :meth:`WebSocketServer.close`.
+
+        :meth:`close` is idempotent.
+
+        """
+        if self.close_task is None:
+            self.close_task = self.loop.create_task(self._close())
+
+    async def _close(self) -> None:
+        """
+        Implementation of :meth:`close`.
+
+        """
+        self.logger.info("server closing")
+
+        # Cancel delayed restarts of workers.
+        for handle in self.restart_handles.values():
+            handle.cancel()
+        self.restart_handles.clear()
+
+        # Tell workers to close their server. Then wait until they exit.
+        for index in self.exit_waiters:
+            process = self.processes[index]
+            assert process is not None
+            process.terminate()
+
+        # asyncio.wait doesn't accept an empty first argument.
+        if self.exit_waiters:
+            await asyncio.wait(
+                list(self.exit_waiters.values()),
+                **loop_if_py_lt_38(self.loop),
+            )
+
+        for sock in self.sockets:
+            sock.close()
+
+        if self.fanout is not None:
+            await self.fanout.stop()
+
+        # Tell wait_closed() to return.
+        self.closed_waiter.set_result(None)
+
+        self.logger.info("server closed")
+
+    async def wait_closed(self) -> None:
+        """
+        Wait until the server is closed.
+
+        When :meth:`wait_closed` returns, all worker processes have exited.
+
+        """
+        await asyncio.shield(self.closed_waiter)
+
+
+class ServeMulti:
+    """
+    Create, start, and return WebSocket servers on ``host`` and ``port`` in
+    several worker processes.
+
+    This lets a server use several CPU cores. Each worker process runs an
+    event loop and a server created with :func:`serve`.
+
+    ``workers`` is the number of worker processes. It defaults to the number
+    of CPUs.
+
+    By default, workers share listening sockets and the operating system
+    distributes connections between workers that are accepting connections.
+    When ``reuse_port`` is ``True``, each worker gets its own listening
+    sockets with the ``SO_REUSEPORT`` option and the operating system spreads
+    connections evenly between workers, where this option is supported.
+
+    Since :func:`~websockets.broadcast` only reaches connections in the
+    current worker, ``fanout`` accepts a :class:`~websockets.legacy.fanout.Fanout`
+    for broadcasting messages to connections in all workers. It's started
+    before workers and each worker connects to it before serving.
+
+    Awaiting :func:`serve_multi` yields a :class:`WebSocketServerPool`, which
+    restarts workers if they exit and provides :meth:`~WebSocketServerPool.close`
+    and :meth:`~WebSocketServerPool.wait_closed` methods for terminating all
+    workers. :attr:`~WebSocketServerPool.connections` counts open connections
+    across workers.
+
+    :func:`serve_multi` can be used as an asynchronous context manager::
+
+        stop = asyncio.Future()  # set this future to exit the server
+
+        async with serve_multi(..., workers=4):
+            await stop
+
+    Other arguments are passed to :func:`serve` in each worker.
+
+    ``max_handshakes``, ``max_connections``, ``accept_rate``, and
+    ``accept_burst`` apply to the whole server. They're split evenly between
+    workers. If connections aren't evenly distributed, a worker may reject
+    connections before the server reaches these limits.
+
+    Workers are created with :func:`os.fork`. Start them before creating
+    threads. :func:`serve_multi` is only available on Unix.
+
+    """
+
+    def __init__(
+        self,
+        ws_handler: Callable[[WebSocketServerProtocol, str], Awaitable[Any]],
+        host: Optional[Union[str, Sequence[str]]] = None,
+        port: Optional[int] = None,
+        *,
+        workers: Optional[int] = None,
+        reuse_port: bool = False,
+        fanout: Optional[Fanout] = None,
+        logger: Optional[LoggerLike] = None,
+        **kwargs: Any,
+    ) -> None:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        for name in ["sock", "unix", "path", "reuse_address", "loop"]:
+            if name in kwargs:
+                raise TypeError(f"serve_multi() doesn't support {name}")
+        check_limits(kwargs, workers, "workers")
+
+        self.ws_handler = ws_handler
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.reuse_port = reuse_port
+        self.fanout = fanout
+        self.logger = logger
+        self.kwargs = kwargs
+
+    def bind(self) -> List[List[socket.socket]]:
+        """
+        Create listening sockets for each worker.
+
+        """
+        backlog = self.kwargs.get("backlog", 100)
+        sockets = bind_sockets(
+            self.host, self.port, reuse_port=self.reuse_port, backlog=backlog
+        )
+        if not self.reuse_port:
+            return [sockets] * self.workers
+
+        worker_sockets = [sockets]
+        try:
+            for _ in range(self.workers - 1):
+                # Bind to the same addresses, including ports picked by the
+                # operating system when port is 0.
+                worker_sockets.append(
+                    [
+                        new_sock
+                        for sock in sockets
+                        for new_sock in bind_sockets(
+                            sock.getsockname()[0],
+                            sock.getsockname()[1],
+                            reuse_port=True,
+                            backlog=backlog,
+                        )
+                    ]
+                )
+        except BaseException:
+            for sockets in worker_sockets:
+                for sock in sockets:
+                    sock.close()
+            raise
+        return worker_sockets
+
+    # async with serve_multi(...)
+
+    async def __aenter__(self) -> WebSocketServerPool:
+        self.ws_server_pool = await self
+        return self.ws_server_pool
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.ws_server_pool.close()
+        await self.ws_server_pool.wait_closed()
+
+    # await serve_multi(...)
+
+    def __await__(self) -> Generator[Any, None, WebSocketServerPool]:
+        # Create a suitable iterator by calling __await__ on a coroutine.
+        return self.__await_impl__().__await__()
+
+    async def __await_impl__(self) -> WebSocketServerPool:
+        ws_server_pool = WebSocketServerPool(
+            asyncio.get_event_loop(),
+            self.ws_handler,
+            self.bind(),
+            self.kwargs,
+            self.fanout,
+            self.logger,
+        )
+        try:
+            if self.fanout is not None:
+                await self.fanout.start()
+            ws_server_pool.start()
+        except BaseException:
+            for sock in ws_server_pool.sockets:
+                sock.close()
+            raise
+        return ws_server_pool
+
+
+serve_multi = ServeMulti
+
+
+# Like asyncio, when accepting connections fails for lack of resources, pause
+# accepting connections for one second.
+ACCEPT_RETRY_DELAY = 1
+
+
+class ServerThread:
+    """
+    Event loop running in a thread for :class:`ThreadedWebSocketServer`.
+
+    It stands in for the :class:`~asyncio.Server` of the
+    :class:`WebSocketServer` running in this thread, which handles connections
+    accepted by :class:`ThreadedWebSocketServer`.
+
+    """
+
+    def __init__(self, pool: ThreadedWebSocketServer, index: int) -> None:
+        self.pool = pool
+        self.index = index
+        # Type as BaseEventLoop for connect_accepted_socket().
+        self.loop = cast(asyncio.BaseEventLoop, asyncio.new_event_loop())
+        self.thread = threading.Thread(
+            target=self.run, name=f"websockets-worker-{index}", daemon=True
+        )
+        self.serving = True
+
+        # Number of open connections. Only updated in the thread of the pool.
+        self.connections = 0
+
+        # Completed once the WebSocketServer is ready or failed to start.
+        self.ready: asyncio.Future[None] = pool.loop.create_future()
+        self.error: Optional[BaseException] = None
+
+    def run(self) -> None:
+        """
+        Run the event loop of this thread until the pool closes.
+
+        """
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.serve = Serve(
+                self.pool.ws_handler,
+                create_protocol=self.pool.create_protocol,
+                logger=self.pool.logger,
+                **split_limits(
+                    self.pool.serve_kwargs, len(self.pool.threads), self.index
+                ),
+            )
+            # Attach without calling wrap(), which would log sockets in every
+            # thread. ThreadedWebSocketServer logs them once.
+            self.serve.ws_server.server = cast(asyncio.AbstractServer, self)
+        except BaseException as exc:
+            self.error = exc
+            self.loop.close()
+            return
+        finally:
+            self.pool.loop.call_soon_threadsafe(self.ready.set_result, None)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+
+    def discard(self, waiter: asyncio.Future[None]) -> None:
+        self.pool.loop.call_soon_threadsafe(self.pool.discard, self)
+
+    def accept(self, sock: socket.socket) -> None:
+        """
+        Handle a connection accepted by the pool.
+
+        This method runs in the thread of the pool.
+
+        """
+        self.connections += 1
+        asyncio.run_coroutine_threadsafe(self.connect_accepted_socket(sock), self.loop)
+
+    async def connect_accepted_socket(self, sock: socket.socket) -> None:
+        try:
+            _, protocol = await self.loop.connect_accepted_socket(
+                self.serve.factory, sock, ssl=self.pool.serve_kwargs.get("ssl")
+            )
+        except Exception:
+            self.pool.logger.error("error accepting connection", exc_info=True)
+            sock.close()
+            self.pool.loop.call_soon_threadsafe(self.pool.discard, self)
+        else:
+            # Rejected connections are counted until they're closed too.
+            waiter = cast(
+                Union[WebSocketServerProtocol, ServiceUnavailableProtocol], protocol
+            ).connection_lost_waiter
+            waiter.add_done_callback(self.discard)
+
+    async def shutdown(self) -> None:
+        """
+        Close the :class:`WebSocketServer` running in this thread.
+
+        """
+        ws_server = self.serve.ws_server
+        ws_server.close()
+        await ws_server.wait_closed()
+        self.loop.stop()
+
+    # Implement the subset of asyncio.Server used by WebSocketServer.
+
+    @property
+    def sockets(self) -> List[socket.socket]:
+        return self.pool.sockets
+
+    def is_serving(self) -> bool:
+        return self.serving
+
+    def close(self) -> None:
+        self.serving = False
+
+    async def wait_closed(self) -> None:
+        pass
+
+
+class ThreadedWebSocketServer:
+    """
+    WebSocket servers running event loops in threads, returned by
+    :func:`serve_threaded`.
+
+    Like :class:`WebSocketServer`, this class provides the :meth:`close` and
+    :meth:`wait_closed` methods.
+
+    It accepts connections in the thread that created it and dispatches them
+    to the event loops of other threads.
+
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        ws_handler: Callable[[WebSocketServerProtocol, str], Awaitable[Any]],
+        sockets: List[socket.socket],
+        threads: int,
+        balance: str,
+        serve_kwargs: Dict[str, Any],
+        logger: Optional[LoggerLike] = None,
+    ) -> None:
+        self.loop = loop
+
+        if logger is None:
+            logger = logging.getLogger("websockets.server")
+        self.logger = logger
+
+        self.ws_handler = ws_handler
+        self.sockets = sockets
+        self.balance = balance
+
+        self.serve_kwargs = dict(serve_kwargs)
+        create_protocol = self.serve_kwargs.pop("create_protocol", None)
+        if create_protocol is None:
+            create_protocol = WebSocketServerProtocol
+        self.create_protocol = create_protocol
+
+        # Event loops running in threads.
+        self.threads = [ServerThread(self, index) for index in range(threads)]
+        self.next_thread = 0
+
+        # Task responsible for closing the server and terminating threads.
+        self.close_task: Optional[asyncio.Task[None]] = None
+
+        # Completed when threads are terminated and sockets are closed.
+        self.closed_waiter: asyncio.Future[None] = loop.create_future()
+
+    async def start(self) -> None:
+        """
+        Start threads, then accept connections.
+
+        """
+        for thread in self.threads:
+            thread.thread.start()
+        for thread in self.threads:
+            await thread.ready
+
+        errors = [thread.error for thread in self.threads if thread.error is not None]
+        if errors:
+            for thread in self.threads:
+                if thread.error is None:
+                    thread.loop.call_soon_threadsafe(thread.loop.stop)
+                await self.loop.run_in_executor(None, thread.thread.join)
+            for sock in self.sockets:
+                sock.close()
+            raise errors[0]
+
+        for sock in self.sockets:
+            self.logger.info("server listening on %s", format_sockname(sock))
+            self.loop.add_reader(sock.fileno(), self.accept, sock)
+
+    def accept(self, sock: socket.socket) -> None:
+        """
+        Accept connections and dispatch them to threads.
+
+        """
+        backlog = self.serve_kwargs.get("backlog", 100)
+        for _ in range(backlog):
+            try:
+                conn, _ = sock.accept()
+                conn.setblocking(False)
+            except (BlockingIOError, InterruptedError, ConnectionAbortedError):
+                return
+            except OSError as exc:
+                if exc.errno not in (
+                    errno.EMFILE,
+                    errno.ENFILE,
+                    errno.ENOBUFS,
+                    errno.ENOMEM,
+                ):
+                    raise
+                self.logger.error("error accepting connection", exc_info=True)
+                self.loop.remove_reader(sock.fileno())
+                self.loop.call_later(ACCEPT_RETRY_DELAY, self.resume, sock)
+                return
+            else:
+                self.select_thread().accept(conn)
+
+    def resume(self, sock: socket.socket) -> None:
+        if self.close_task is None:
+            self.loop.add_reader(sock.fileno(), self.accept, sock)
+
+    def select_thread(self) -> ServerThread:
+        """
+        Choose the thread handling the next connection.
+
+        """
+        if self.balance == "least-connections":
+            return min(self.threads, key=lambda thread: thread.connections)
+        thread = self.threads[self.next_thread]
+        self.next_thread = (self.next_thread + 1) % len(self.threads)
+        return thread
+
+    def discard(self, thread: ServerThread) -> None:
+        thread.connections -= 1
+
+    @property
+    def connections(self) -> int:
+        """
+        Number of open connections across all threads.
+
+        """
+        return sum(thread.connections for thread in self.threads)
+
+    def is_serving(self) -> bool:
+        """
+        Tell whether the server is accepting new connections or shutting down.
+
+        """
+        return self.close_task is None
+
+    def close(self) -> None:
+        """
+        Close the server.
+
+        This method stops accepting connections. Then it closes the server in
+        each thread as described in :meth:`WebSocketServer.close`.
+
+        :meth:`close` is idempotent.
+
+        """
+        if self.close_task is None:
+            self.close_task = self.loop.create_task(self._close())
+
+    async def _close(self) -> None:
+        """
+        Implementation of :meth:`close`.
+
+        """
+        self.logger.info("server closing")
+
+        # Stop accepting new connections.
+        for sock in self.sockets:
+            self.loop.remove_reader(sock.fileno())
+
+        # Close servers in all threads. Then wait until threads terminate.
+        await asyncio.wait(
+            [
+                asyncio.wrap_future(
+                    asyncio.run_coroutine_threadsafe(thread.shutdown(), thread.loop)
+                )
+                for thread in self.threads
+            ],
+            **loop_if_py_lt_38(self.loop),
+        )
+        for thread in self.threads:
+            await self.loop.run_in_executor(None, thread.thread.join)
+
+        for sock in self.sockets:
+            sock.close()
+
+        # Tell wait_closed() to return.
+        self.closed_waiter.set_result(None)
+
+        self.logger.info("server closed")
+
+    async def wait_closed(self) -> None:
+        """
+        Wait until the server is closed.
+
+        When :meth:`wait_closed` returns, all threads have terminated.
+
+        """
+        await asyncio.shield(self.closed_waiter)
+
+
+class ServeThreaded:
+    """
+    Create, start, and return WebSocket servers on ``host`` and ``port``
+    running event loops in several threads.
+
+    This lets a server use several CPU cores for work that releases the GIL,
+    such as compression with :mod:`zlib`, without running several processes.
+
+    ``threads`` is the number of threads running event loops. It defaults to
+    the number of CPUs. Each thread runs a server created with :func:`serve`.
+
+    The event loop calling :func:`serve_threaded` accepts connections and
+    dispatches them to threads. ``balance`` defines how: ``"round-robin"``
+    cycles through threads; ``"least-connections"`` picks the thread with the
+    fewest open connections.
+
+    Awaiting :func:`serve_threaded` yields a :class:`ThreadedWebSocketServer`,
+    which provides :meth:`~ThreadedWebSocketServer.close` and
+    :meth:`~ThreadedWebSocketServer.wait_closed` methods for terminating all
+    threads. :attr:`~ThreadedWebSocketServer.connections` counts open
+    connections across threads.
+
+    :func:`serve_threaded` can be used as an asynchronous context manager::
+
+        stop = asyncio.Future()  # set this future to exit the server
+
+        async with serve_threaded(..., threads=4):
+            await stop
+
+    Other arguments are passed to :func:`serve` in each thread. Since
+    connection handlers run in different threads, they must not share state
+    without synchronization.
+
+    ``max_handshakes``, ``max_connections``, ``accept_rate``, and
+    ``accept_burst`` apply to the whole server. They're split evenly between
+    threads. With ``balance="round-robin"``, a thread may reject connections
+    before the server reaches these limits.
+
+    """
+
+    def __init__(
+        self,
+        ws_handler: Callable[[WebSocketServerProtocol, str], Awaitable[Any]],
+        host: Optional[Union[str, Sequence[str]]] = None,
+        port: Optional[int] = None,
+        *,
+        threads: Optional[int] = None,
+        balance: str = "round-robin",
+        logger: Optional[LoggerLike] = None,
+        **kwargs: Any,
+    ) -> None:
+        if threads is None:
+            threads = os.cpu_count() or 1
+        if threads < 1:
+            raise ValueError("threads must be at least 1")
+        if balance not in ["round-robin", "least-connections"]:
+            raise ValueError(f"unsupported balance: {balance}")
+        for name in ["sock", "unix", "path", "reuse_port", "loop"]:
+            if name in kwargs:
+                raise TypeError(f"serve_threaded() doesn't support {name}")
+        check_limits(kwargs, threads, "threads")
+
+        self.ws_handler = ws_handler
+        self.host = host
+        self.port = port
+        self.threads = threads
+        self.balance = balance
+        self.logger = logger
+        self.kwargs = kwargs
+
+    # async with serve_threaded(...)
+
+    async def __aenter__(self) -> ThreadedWebSocketServer:
+        self.ws_server = await self
+        return self.ws_server
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.ws_server.close()
+        await self.ws_server.wait_closed()
+
+    # await serve_threaded(...)
+
+    def __await__(self) -> Generator[Any, None, ThreadedWebSocketServer]:
+        # Create a suitable iterator by calling __await__ on a coroutine.
+        return self.__await_impl__().__await__()
+
+    async def __await_impl__(self) -> ThreadedWebSocketServer:
+        backlog = self.kwargs.get("backlog", 100)
+        ws_server = ThreadedWebSocketServer(
+            asyncio.get_event_loop(),
+            self.ws_handler,
+            bind_sockets(self.host, self.port, backlog=backlog),
+            self.threads,
+            self.balance,
+            self.kwargs,
+            self.logger,
+        )
+        await ws_server.start()
+        return ws_server
+
+
+serve_threaded = ServeThreaded
@@ -2,7 +2,6 @@ from __future__ import annotations
 
 import base64
 import binascii
-import email.utils
 import http
 from typing import Generator, List, Optional, Sequence, Tuple, cast
 
@@ -24,7 +23,7 @@ from .headers import (
     parse_subprotocol,
     parse_upgrade,
 )
-from .http import USER_AGENT
+from .http import USER_AGENT, ResponseTemplate, ResponseTemplateCache, build_date
 from .http11 import Request, Response
 from .typing import (
     ConnectionOption,
@@ -48,6 +47,9 @@ class ServerConnection(Connection):
 
     side = SERVER
 
+    # Templates of successful responses, shared by all connections.
+    response_templates = ResponseTemplateCache()
+
     def __init__(
         self,
         origins: Optional[Sequence[Optional[Origin]]] = None,
@@ -118,21 +120,27 @@ class ServerConnection(Connection):
                 ),
             )
 
-        headers = Headers()
+        template = self.response_templates.get(extensions_header, protocol_header)
+        if template is None:
+            headers = Headers()
+
+            headers["Date"] = ""  # filled in by the template
 
-        headers["Date"] = email.utils.formatdate(usegmt=True)
+            headers["Upgrade"] = "websocket"
+            headers["Connection"] = "Upgrade"
+            headers["Sec-WebSocket-Accept"] = ""  # filled in by the template
 
-        headers["Upgrade"] = "websocket"
-        headers["Connection"] = "Upgrade"
-        headers["Sec-WebSocket-Accept"] = accept_key(key)
+            if extensions_header is not None:
+                headers["Sec-WebSocket-Extensions"] = extensions_header
 
-        if extensions_header is not None:
-            headers["Sec-WebSocket-Extensions"] = extensions_header
+            if protocol_header is not None:
+                headers["Sec-WebSocket-Protocol"] = protocol_header
 
-        if protocol_header is not None:
-            headers["Sec-WebSocket-Protocol"] = protocol_header
+            headers["Server"] = USER_AGENT
 
-        headers["Server"] = USER_AGENT
+            template = ResponseTemplate(headers)
+            self.response_templates.add(extensions_header, protocol_header, template)
+        headers = template.render(accept_key(key), build_date())
 
         self.logger.info("connection open")
         return Response(101, "Switching Protocols", headers)
@@ -389,7 +397,7 @@ class ServerConnection(Connection):
         body = text.encode()
         if headers is None:
             headers = Headers()
-        headers.setdefault("Date", email.utils.formatdate(usegmt=True))
+        headers.setdefault("Date", build_date())
         headers.setdefault("Connection", "close")
         headers.setdefault("Content-Length", str(len(body)))
         headers.setdefault("Content-Type", "text/plain; charset=utf-8")
@@ -420,7 +428,10 @@ class ServerConnection(Connection):
 
     def parse(self) -> Generator[None, None, None]:
         if self.state is CONNECTING:
-            request = yield from Request.parse(self.reader.read_line)
+            request = yield from Request.parse(
+                self.reader.read_line,
+                read_until=self.reader.read_until,
+            )
 
             if self.debug:
                 self.logger.debug("< GET %s HTTP/1.1", request.path)
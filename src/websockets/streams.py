@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Generator
+from typing import Callable, Generator, Optional
 
 
 class StreamReader:
@@ -8,8 +8,8 @@ class StreamReader:
     Generator-based stream reader.
 
     This class doesn't support concurrent calls to :meth:`read_line()`,
-    :meth:`read_exact()`, or :meth:`read_to_eof()`. Make sure calls are
-    serialized.
+    :meth:`read_until()`, :meth:`read_exact()`, or :meth:`read_to_eof()`. Make
+    sure calls are serialized.
 
     """
 
@@ -42,6 +42,54 @@ class StreamReader:
         del self.buffer[:n]
         return r
 
+    def read_until(
+        self,
+        separator: bytes,
+        max_size: int,
+        check: Optional[Callable[[bytearray], None]] = None,
+    ) -> Generator[None, None, bytes]:
+        """
+        Read bytes from the stream until ``separator``.
+
+        The return value includes ``separator``.
+
+        If an exception is raised, data remains in the buffer and may be read
+        with other methods.
+
+        This is a generator-based coroutine.
+
+        :param separator: bytes terminating the data to read
+        :param max_size: maximum size of the data, including ``separator``
+        :param check: function called with the buffer, before waiting for more
+            data, when ``separator`` isn't found yet; it must not modify the
+            buffer; it may raise an exception to stop reading
+        :raises EOFError: if the stream ends without ``separator``
+        :raises ValueError: if ``separator`` isn't found in the first
+            ``max_size`` bytes
+
+        """
+        n = 0  # number of bytes to read
+        p = 0  # number of bytes without separator
+        while True:
+            n = self.buffer.find(separator, p)
+            if n >= 0:
+                n += len(separator)
+                break
+            if len(self.buffer) > max_size:
+                raise ValueError(f"separator not found in {max_size} bytes")
+            if check is not None:
+                check(self.buffer)
+            p = max(len(self.buffer) - len(separator) + 1, 0)
+            if self.eof:
+                p = len(self.buffer)
+                raise EOFError(f"stream ends after {p} bytes, before separator")
+            yield
+        if n > max_size:
+            raise ValueError(f"separator not found in {max_size} bytes")
+        r = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return r
+
     def read_exact(self, n: int) -> Generator[None, None, bytes]:
         """
         Read ``n`` bytes from the stream.
@@ -0,0 +1,326 @@
+import unittest
+
+from websockets.exceptions import (
+    InvalidParameterName,
+    NegotiationError,
+    PayloadTooBig,
+    ProtocolError,
+)
+from websockets.extensions.permessage_compress import *
+from websockets.extensions.permessage_deflate import (
+    ClientPerMessageDeflateFactory,
+    PerMessageDeflate,
+    ServerPerMessageDeflateFactory,
+)
+from websockets.frames import (
+    OP_BINARY,
+    OP_CLOSE,
+    OP_CONT,
+    OP_PING,
+    OP_PONG,
+    OP_TEXT,
+    Close,
+    Frame,
+)
+
+from .utils import OpExtension
+
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+class ZlibCodecTests(unittest.TestCase):
+    def setUp(self):
+        self.codec = ZlibCodec()
+
+    def test_name(self):
+        self.assertEqual(self.codec.name, "zlib")
+
+    def test_compress_decompress(self):
+        data = "café".encode("utf-8") * 10
+        self.assertEqual(self.codec.decompress(self.codec.compress(data)), data)
+
+    def test_compress_decompress_empty(self):
+        self.assertEqual(self.codec.decompress(self.codec.compress(b"")), b"")
+
+    def test_settings(self):
+        codec = ZlibCodec(level=1, wbits=9)
+        data = "café".encode("utf-8") * 10
+        self.assertEqual(codec.decompress(codec.compress(data)), data)
+
+    def test_invalid_wbits(self):
+        with self.assertRaises(ValueError):
+            ZlibCodec(wbits=8)
+
+    def test_decompress_max_size(self):
+        data = self.codec.compress(b"a" * 20)
+        self.assertEqual(self.codec.decompress(data, max_size=20), b"a" * 20)
+        with self.assertRaises(PayloadTooBig):
+            self.codec.decompress(data, max_size=10)
+
+    def test_decompress_max_size_exceeded_by_one_byte(self):
+        # zlib fills the output buffer and still holds pending output.
+        data = self.codec.compress(b"a" * 100000)
+        self.assertEqual(self.codec.decompress(data, max_size=100000), b"a" * 100000)
+        with self.assertRaises(PayloadTooBig):
+            self.codec.decompress(data, max_size=99999)
+
+    def test_decompress_invalid_data(self):
+        with self.assertRaises(ProtocolError):
+            self.codec.decompress(b"\xff\xff\xff\xff")
+
+    def test_decompress_truncated_data(self):
+        data = self.codec.compress("café".encode("utf-8") * 10)
+        with self.assertRaises(ProtocolError):
+            self.codec.decompress(data[:-1])
+
+
+@unittest.skipIf(zstandard is None, "this test requires zstandard")
+class ZstdCodecTests(unittest.TestCase):
+    def setUp(self):
+        self.codec = ZstdCodec()
+
+    def test_name(self):
+        self.assertEqual(self.codec.name, "zstd")
+
+    def test_compress_decompress(self):
+        data = "café".encode("utf-8") * 10
+        self.assertEqual(self.codec.decompress(self.codec.compress(data)), data)
+
+    def test_decompress_max_size(self):
+        data = self.codec.compress(b"a" * 20)
+        self.assertEqual(self.codec.decompress(data, max_size=20), b"a" * 20)
+        with self.assertRaises(PayloadTooBig):
+            self.codec.decompress(data, max_size=10)
+
+    def test_decompress_max_size_unknown_content_size(self):
+        compressor = zstandard.ZstdCompressor(write_content_size=False)
+        data = compressor.compress(b"a" * 20)
+        with self.assertRaises(PayloadTooBig):
+            self.codec.decompress(data, max_size=10)
+
+    def test_decompress_unknown_content_size(self):
+        compressor = zstandard.ZstdCompressor(write_content_size=False)
+        data = compressor.compress(b"a" * 20)
+        self.assertEqual(self.codec.decompress(data, max_size=20), b"a" * 20)
+        self.assertEqual(self.codec.decompress(data), b"a" * 20)
+
+    def test_decompress_invalid_data(self):
+        with self.assertRaises(ProtocolError):
+            self.codec.decompress(b"\xff\xff\xff\xff")
+
+    def test_decompress_truncated_data(self):
+        data = self.codec.compress("café".encode("utf-8") * 10)
+        with self.assertRaises(ProtocolError) as raised:
+            self.codec.decompress(data[:-1])
+        self.assertEqual(str(raised.exception), "truncated compressed data")
+
+    def test_decompress_truncated_data_unknown_content_size(self):
+        compressor = zstandard.ZstdCompressor(write_content_size=False)
+        data = compressor.compress("café".encode("utf-8") * 10)
+        with self.assertRaises(ProtocolError) as raised:
+            self.codec.decompress(data[:-1], max_size=100)
+        self.assertEqual(str(raised.exception), "truncated compressed data")
+
+
+class PerMessageCompressTests(unittest.TestCase):
+    def setUp(self):
+        self.extension = PerMessageCompress(ZlibCodec())
+
+    def test_name(self):
+        self.assertEqual(self.extension.name, "x-permessage-zlib")
+
+    def test_repr(self):
+        self.assertEqual(repr(self.extension), "PerMessageCompress(codec=zlib)")
+
+    # Control frames aren't encoded or decoded.
+
+    def test_no_encode_decode_control_frames(self):
+        for frame in [
+            Frame(OP_PING, b""),
+            Frame(OP_PONG, b""),
+            Frame(OP_CLOSE, Close(1000, "").serialize()),
+        ]:
+            with self.subTest(frame=frame):
+                self.assertEqual(self.extension.encode(frame), frame)
+                self.assertEqual(self.extension.decode(frame), frame)
+
+    # Data frames are encoded and decoded.
+
+    def test_encode_decode_text_frame(self):
+        frame = Frame(OP_TEXT, "café".encode("utf-8"))
+
+        enc_frame = self.extension.encode(frame)
+
+        self.assertTrue(enc_frame.rsv1)
+        self.assertEqual(enc_frame.data, ZlibCodec().compress(frame.data))
+
+        dec_frame = self.extension.decode(enc_frame)
+
+        self.assertEqual(dec_frame, frame)
+
+    def test_encode_decode_binary_frame(self):
+        frame = Frame(OP_BINARY, b"tea")
+
+        enc_frame = self.extension.encode(frame)
+
+        self.assertTrue(enc_frame.rsv1)
+
+        dec_frame = self.extension.decode(enc_frame)
+
+        self.assertEqual(dec_frame, frame)
+
+    def test_encode_decode_fragmented_text_frame(self):
+        frame1 = Frame(OP_TEXT, "café".encode("utf-8"), fin=False)
+        frame2 = Frame(OP_CONT, " & ".encode("utf-8"), fin=False)
+        frame3 = Frame(OP_CONT, "croissants".encode("utf-8"))
+
+        enc_frame1 = self.extension.encode(frame1)
+        enc_frame2 = self.extension.encode(frame2)
+        enc_frame3 = self.extension.encode(frame3)
+
+        # Only the first frame has the rsv1 bit set.
+        self.assertTrue(enc_frame1.rsv1)
+        self.assertFalse(enc_frame2.rsv1)
+        self.assertFalse(enc_frame3.rsv1)
+        # Each frame is compressed independently.
+        self.assertEqual(enc_frame2.data, ZlibCodec().compress(frame2.data))
+
+        dec_frame1 = self.extension.decode(enc_frame1)
+        dec_frame2 = self.extension.decode(enc_frame2)
+        dec_frame3 = self.extension.decode(enc_frame3)
+
+        self.assertEqual(dec_frame1, frame1)
+        self.assertEqual(dec_frame2, frame2)
+        self.assertEqual(dec_frame3, frame3)
+        self.assertFalse(self.extension.encode_cont_data)
+        self.assertFalse(self.extension.decode_cont_data)
+
+    def test_no_decode_text_frame(self):
+        frame = Frame(OP_TEXT, "café".encode("utf-8"))
+
+        # Try decoding a frame that wasn't encoded.
+        self.assertEqual(self.extension.decode(frame), frame)
+
+    def test_no_decode_fragmented_text_frame(self):
+        frame1 = Frame(OP_TEXT, "café".encode("utf-8"), fin=False)
+        frame2 = Frame(OP_CONT, "croissants".encode("utf-8"))
+
+        self.assertEqual(self.extension.decode(frame1), frame1)
+        self.assertEqual(self.extension.decode(frame2), frame2)
+
+    def test_compress_min_size(self):
+        extension = PerMessageCompress(ZlibCodec(), compress_min_size=5)
+
+        small_frame1 = Frame(OP_TEXT, b"caf", fin=False)
+        small_frame2 = Frame(OP_CONT, "é".encode("utf-8") * 10)
+        frame = Frame(OP_TEXT, "café".encode("utf-8"))
+
+        self.assertEqual(extension.encode(small_frame1), small_frame1)
+        self.assertEqual(extension.encode(small_frame2), small_frame2)
+        self.assertTrue(extension.encode(frame).rsv1)
+
+    def test_decompress_max_size(self):
+        frame = Frame(OP_TEXT, ("a" * 20).encode("utf-8"))
+
+        enc_frame = self.extension.encode(frame)
+
+        with self.assertRaises(PayloadTooBig):
+            self.extension.decode(enc_frame, max_size=10)
+
+
+class ClientPerMessageCompressFactoryTests(unittest.TestCase):
+    def setUp(self):
+        self.factory = ClientPerMessageCompressFactory(ZlibCodec())
+
+    def test_name(self):
+        self.assertEqual(self.factory.name, "x-permessage-zlib")
+
+    def test_get_request_params(self):
+        self.assertEqual(self.factory.get_request_params(), [])
+
+    def test_process_response_params(self):
+        extension = self.factory.process_response_params([], [])
+        self.assertIsInstance(extension, PerMessageCompress)
+        self.assertIs(extension.codec, self.factory.codec)
+
+    def test_process_response_params_compress_min_size(self):
+        factory = ClientPerMessageCompressFactory(ZlibCodec(), compress_min_size=5)
+        extension = factory.process_response_params([], [])
+        self.assertEqual(extension.compress_min_size, 5)
+
+    def test_process_response_params_error(self):
+        with self.assertRaises(InvalidParameterName):
+            self.factory.process_response_params([("level", "1")], [])
+
+    def test_process_response_params_deduplication(self):
+        with self.assertRaises(NegotiationError):
+            self.factory.process_response_params([], [PerMessageCompress(ZlibCodec())])
+
+    def test_process_response_params_conflict(self):
+        with self.assertRaises(NegotiationError):
+            self.factory.process_response_params(
+                [], [PerMessageDeflate(False, False, 15, 15)]
+            )
+
+    def test_permessage_deflate_conflict(self):
+        factory = ClientPerMessageDeflateFactory()
+        with self.assertRaises(NegotiationError):
+            factory.process_response_params([], [PerMessageCompress(ZlibCodec())])
+
+    def test_process_response_params_conflict_custom_extension(self):
+        extension = OpExtension()
+        extension.compresses = True
+        with self.assertRaises(NegotiationError):
+            self.factory.process_response_params([], [extension])
+        # Other extensions don't conflict.
+        self.factory.process_response_params([], [OpExtension()])
+
+
+class ServerPerMessageCompressFactoryTests(unittest.TestCase):
+    def setUp(self):
+        self.factory = ServerPerMessageCompressFactory(ZlibCodec())
+
+    def test_name(self):
+        self.assertEqual(self.factory.name, "x-permessage-zlib")
+
+    def test_process_request_params(self):
+        params, extension = self.factory.process_request_params([], [])
+        self.assertEqual(params, [])
+        self.assertIsInstance(extension, PerMessageCompress)
+        self.assertIs(extension.codec, self.factory.codec)
+
+    def test_process_request_params_compress_min_size(self):
+        factory = ServerPerMessageCompressFactory(ZlibCodec(), compress_min_size=5)
+        _, extension = factory.process_request_params([], [])
+        self.assertEqual(extension.compress_min_size, 5)
+
+    def test_process_request_params_error(self):
+        with self.assertRaises(InvalidParameterName):
+            self.factory.process_request_params([("level", "1")], [])
+
+    def test_process_request_params_deduplication(self):
+        with self.assertRaises(NegotiationError):
+            self.factory.process_request_params([], [PerMessageCompress(ZlibCodec())])
+
+    def test_process_request_params_conflict(self):
+        with self.assertRaises(NegotiationError):
+            self.factory.process_request_params(
+                [], [PerMessageDeflate(False, False, 15, 15)]
+            )
+
+    def test_permessage_deflate_conflict(self):
+        factory = ServerPerMessageDeflateFactory()
+        with self.assertRaises(NegotiationError):
+            factory.process_request_params([], [PerMessageCompress(ZlibCodec())])
+
+    def test_process_request_params_conflict_custom_extension(self):
+        extension = OpExtension()
+        extension.compresses = True
+        with self.assertRaises(NegotiationError):
+            self.factory.process_request_params([], [extension])
+        # Other extensions don't conflict.
+        self.factory.process_request_params([], [OpExtension()])
@@ -258,6 +258,256 @@ class PerMessageDeflateTests(unittest.TestCase, ExtensionTestsMixin):
             ),
         )
 
+    # Small or incompressible messages can be sent without compression.
+
+    def test_compress_min_size(self):
+        extension = PerMessageDeflate(False, False, 15, 15, compress_min_size=5)
+        decoder = PerMessageDeflate(False, False, 15, 15)
+
+        small_frame = Frame(OP_TEXT, b"caf")
+        frame = Frame(OP_TEXT, "café".encode("utf-8"))
+
+        enc_small_frame = extension.encode(small_frame)
+        enc_frame = extension.encode(frame)
+
+        self.assertEqual(enc_small_frame, small_frame)
+        self.assertEqual(enc_frame.data, b"JNL;\xbc\x12\x00")
+        self.assertEqual(decoder.decode(enc_small_frame), small_frame)
+        self.assertEqual(decoder.decode(enc_frame), frame)
+
+    def test_compress_min_size_fragmented_message(self):
+        extension = PerMessageDeflate(False, False, 15, 15, compress_min_size=5)
+
+        frame1 = Frame(OP_TEXT, b"caf", fin=False)
+        frame2 = Frame(OP_CONT, "é".encode("utf-8") * 10, fin=False)
+        frame3 = Frame(OP_CONT, b"")
+
+        self.assertEqual(extension.encode(frame1), frame1)
+        self.assertEqual(extension.encode(frame2), frame2)
+        self.assertEqual(extension.encode(frame3), frame3)
+
+        # The next message is compressed.
+        frame = Frame(OP_TEXT, "café".encode("utf-8"))
+        enc_frame = extension.encode(frame)
+        self.assertTrue(enc_frame.rsv1)
+        self.assertEqual(enc_frame.data, b"JNL;\xbc\x12\x00")
+
+    def test_skip_incompressible(self):
+        extension = PerMessageDeflate(False, False, 15, 15, skip_incompressible=True)
+
+        for data in [
+            b"\x1f\x8b\x08\x00" + bytes(20),  # gzip
+            b"\x89PNG\r\n\x1a\n" + bytes(20),  # PNG
+            b"\xff\xd8\xff\xe0" + bytes(20),  # JPEG
+        ]:
+            with self.subTest(data=data):
+                frame = Frame(OP_BINARY, data)
+                self.assertEqual(extension.encode(frame), frame)
+
+    def test_skip_incompressible_compresses_other_messages(self):
+        extension = PerMessageDeflate(False, False, 15, 15, skip_incompressible=True)
+
+        for frame in [
+            Frame(OP_BINARY, bytes(20)),
+            Frame(OP_TEXT, b"GIF89a" + bytes(20)),
+        ]:
+            with self.subTest(frame=frame):
+                self.assertTrue(extension.encode(frame).rsv1)
+
+    def test_skip_incompressible_disabled(self):
+        frame = Frame(OP_BINARY, b"\x1f\x8b\x08\x00" + bytes(20))
+        self.assertTrue(self.extension.encode(frame).rsv1)
+
+    # A preset dictionary can be configured.
+
+    def test_zdict(self):
+        zdict = b'{"type": "message", "text": "'
+        frame = Frame(OP_TEXT, b'{"type": "message", "text": "caf\xc3\xa9"}')
+
+        extension = PerMessageDeflate(True, True, 15, 15, zdict=zdict)
+        enc_frame = extension.encode(frame)
+        dec_frame = extension.decode(enc_frame)
+
+        self.assertEqual(dec_frame, frame)
+
+        # The dictionary improves compression of a small message.
+        extension_without_zdict = PerMessageDeflate(True, True, 15, 15)
+        self.assertLess(
+            len(enc_frame.data),
+            len(extension_without_zdict.encode(frame).data),
+        )
+
+    def test_zdict_context_takeover(self):
+        zdict = b'{"type": "message", "text": "'
+        frame = Frame(OP_TEXT, b'{"type": "message", "text": "caf\xc3\xa9"}')
+
+        encoder = PerMessageDeflate(False, False, 15, 15, zdict=zdict)
+        decoder = PerMessageDeflate(False, False, 15, 15, zdict=zdict)
+
+        for _ in range(3):
+            self.assertEqual(decoder.decode(encoder.encode(frame)), frame)
+
+    def test_zdict_mismatch(self):
+        zdict = b'{"type": "message", "text": "'
+        frame = Frame(OP_TEXT, b'{"type": "message", "text": "caf\xc3\xa9"}')
+
+        encoder = PerMessageDeflate(True, True, 15, 15, zdict=zdict)
+        decoder = PerMessageDeflate(True, True, 15, 15)
+
+        with self.assertRaises(zlib.error) as exc:
+            decoder.decode(encoder.encode(frame))
+        self.assertIn("invalid distance too far back", str(exc.exception))
+
+    # The encoder can be released when it's idle.
+
+    def test_encoder_idle_timeout(self):
+        extension = PerMessageDeflate(False, False, 15, 15, encoder_idle_timeout=0)
+        decoder = PerMessageDeflate(False, False, 15, 15)
+
+        frame = Frame(OP_TEXT, "café".encode("utf-8"))
+        self.assertEqual(decoder.decode(extension.encode(frame)), frame)
+
+        extension.release_idle_state()
+        self.assertFalse(hasattr(extension, "encoder"))
+
+        # A new encoder is created; the decoder keeps working.
+        enc_frame = extension.encode(frame)
+        self.assertEqual(enc_frame.data, b"JNL;\xbc\x12\x00")
+        self.assertEqual(decoder.decode(enc_frame), frame)
+
+    def test_encoder_idle_timeout_not_reached(self):
+        extension = PerMessageDeflate(False, False, 15, 15, encoder_idle_timeout=60)
+
+        extension.encode(Frame(OP_TEXT, "café".encode("utf-8")))
+        extension.release_idle_state()
+        self.assertTrue(hasattr(extension, "encoder"))
+
+    def test_encoder_idle_timeout_disabled(self):
+        self.extension.release_idle_state()
+        self.assertTrue(hasattr(self.extension, "encoder"))
+
+    def test_encoder_idle_timeout_fragmented_message(self):
+        extension = PerMessageDeflate(False, False, 15, 15, encoder_idle_timeout=0)
+        decoder = PerMessageDeflate(False, False, 15, 15)
+
+        frame1 = Frame(OP_TEXT, "café".encode("utf-8"), fin=False)
+        frame2 = Frame(OP_CONT, "café".encode("utf-8"))
+        dec_frame1 = decoder.decode(extension.encode(frame1))
+        extension.release_idle_state()
+        dec_frame2 = decoder.decode(extension.encode(frame2))
+
+        self.assertEqual(dec_frame1, frame1)
+        self.assertEqual(dec_frame2, frame2)
+
+    def test_encoder_idle_timeout_zdict(self):
+        zdict = b'{"type": "message", "text": "'
+        frame = Frame(OP_TEXT, b'{"type": "message", "text": "caf\xc3\xa9"}')
+
+        extension = PerMessageDeflate(
+            False, False, 15, 15, zdict=zdict, encoder_idle_timeout=0
+        )
+        decoder = PerMessageDeflate(False, False, 15, 15, zdict=zdict)
+
+        self.assertEqual(decoder.decode(extension.encode(frame)), frame)
+        extension.release_idle_state()
+        self.assertEqual(decoder.decode(extension.encode(frame)), frame)
+
+    def test_memory_usage(self):
+        extension = PerMessageDeflate(
+            False, False, 12, 12, {"memLevel": 5}, encoder_idle_timeout=0
+        )
+        # 16 KiB + 16 KiB for the encoder, 4 KiB for the decoder
+        self.assertEqual(extension.memory_usage, 36864)
+
+        extension.release_idle_state()
+        self.assertEqual(extension.memory_usage, 4096)
+
+    def test_memory_usage_no_context_takeover(self):
+        extension = PerMessageDeflate(True, True, 15, 15)
+        self.assertEqual(extension.memory_usage, 0)
+
+    # The compression level can change between messages.
+
+    def test_set_compress_level(self):
+        extension = PerMessageDeflate(False, False, 15, 15)
+        decoder = PerMessageDeflate(False, False, 15, 15)
+
+        frame = Frame(OP_TEXT, "café".encode("utf-8"))
+        self.assertEqual(decoder.decode(extension.encode(frame)), frame)
+
+        extension.set_compress_level(1)
+        self.assertEqual(extension.compress_level, 1)
+
+        # A new encoder is created; the decoder keeps working.
+        enc_frame = extension.encode(frame)
+        self.assertEqual(extension.compress_settings, {"level": 1})
+        self.assertEqual(decoder.decode(enc_frame), frame)
+        self.assertEqual(decoder.decode(extension.encode(frame)), frame)
+
+    def test_set_compress_level_unchanged(self):
+        extension = PerMessageDeflate(False, False, 15, 15, {"level": 6})
+        encoder = extension.encoder
+
+        extension.set_compress_level(6)
+        extension.encode(Frame(OP_TEXT, "café".encode("utf-8")))
+
+        self.assertIs(extension.encoder, encoder)
+
+    def test_set_compress_level_fragmented_message(self):
+        extension = PerMessageDeflate(False, False, 15, 15)
+        decoder = PerMessageDeflate(False, False, 15, 15)
+
+        frame1 = Frame(OP_TEXT, "café".encode("utf-8"), fin=False)
+        frame2 = Frame(OP_CONT, "café".encode("utf-8"))
+        dec_frame1 = decoder.decode(extension.encode(frame1))
+        extension.set_compress_level(1)
+        dec_frame2 = decoder.decode(extension.encode(frame2))
+
+        self.assertEqual(dec_frame1, frame1)
+        self.assertEqual(dec_frame2, frame2)
+        # The new level applies to the next message.
+        self.assertEqual(extension.compress_settings, {})
+
+    def test_set_compress_level_local_no_context_takeover(self):
+        extension = PerMessageDeflate(False, True, 15, 15)
+        decoder = PerMessageDeflate(True, False, 15, 15)
+
+        extension.set_compress_level(9)
+
+        frame = Frame(OP_TEXT, "café".encode("utf-8"))
+        self.assertEqual(decoder.decode(extension.encode(frame)), frame)
+        self.assertEqual(extension.compress_settings, {"level": 9})
+
+    def test_set_compress_level_error(self):
+        for level in [-2, 10]:
+            with self.subTest(level=level):
+                with self.assertRaises(ValueError):
+                    self.extension.set_compress_level(level)
+
+    def test_adaptive_compress_level(self):
+        extension = PerMessageDeflate(
+            False, False, 15, 15, {"level": 9}, adaptive_compress_level=1
+        )
+        self.assertEqual(extension.compress_level, 9)
+        self.assertTrue(extension.observes_write_buffer)
+
+        # The write buffer drains quickly.
+        extension.observe_write_buffer(0, 16384, 65536)
+        self.assertEqual(extension.compress_level, 1)
+        extension.observe_write_buffer(32768, 16384, 65536)
+        self.assertEqual(extension.compress_level, 1)
+
+        # The write buffer fills up.
+        extension.observe_write_buffer(65536, 16384, 65536)
+        self.assertEqual(extension.compress_level, 9)
+        extension.observe_write_buffer(32768, 16384, 65536)
+        self.assertEqual(extension.compress_level, 9)
+
+    def test_adaptive_compress_level_disabled(self):
+        self.assertFalse(self.extension.observes_write_buffer)
+        self.extension.observe_write_buffer(0, 16384, 65536)
+        self.assertEqual(self.extension.compress_level, -1)
+
     # Frames aren't decoded beyond max_size.
 
     def test_decompress_max_size(self):
@@ -270,6 +520,22 @@ class PerMessageDeflateTests(unittest.TestCase, ExtensionTestsMixin):
         with self.assertRaises(PayloadTooBig):
             self.extension.decode(enc_frame, max_size=10)
 
+    def test_decompress_exactly_max_size(self):
+        frame = Frame(OP_TEXT, ("a" * 20).encode("utf-8"))
+
+        enc_frame = self.extension.encode(frame)
+        dec_frame = self.extension.decode(enc_frame, max_size=20)
+
+        self.assertEqual(dec_frame, frame)
+
+    def test_decode_preserves_rsv2_rsv3(self):
+        frame = Frame(OP_TEXT, "café".encode("utf-8"), rsv2=True, rsv3=True)
+
+        enc_frame = self.extension.encode(frame)
+        dec_frame = self.extension.decode(enc_frame)
+
+        self.assertEqual(dec_frame, frame)
+
 
 class ClientPerMessageDeflateFactoryTests(unittest.TestCase, ExtensionTestsMixin):
     def test_name(self):
@@ -296,11 +562,16 @@ class ClientPerMessageDeflateFactoryTests(unittest.TestCase, ExtensionTestsMixin
             (True, True, 15, 16),  # client_max_window_bits > 15
             (False, False, True, None),  # server_max_window_bits
             (False, False, None, None, {"wbits": 11}),
+            (False, False, None, None, {"zdict": b"zdict"}),
         ]:
             with self.subTest(config=config):
                 with self.assertRaises(ValueError):
                     ClientPerMessageDeflateFactory(*config)
 
+    def test_init_error_adaptive_compress_level(self):
+        with self.assertRaises(ValueError):
+            ClientPerMessageDeflateFactory(adaptive_compress_level=10)
+
     def test_get_request_params(self):
         for config, result in [
             # Test without any parameter
@@ -508,6 +779,21 @@ class ClientPerMessageDeflateFactoryTests(unittest.TestCase, ExtensionTestsMixin
                     expected = PerMessageDeflate(*result)
                     self.assertExtensionEqual(extension, expected)
 
+    def test_process_response_params_zdict(self):
+        factory = ClientPerMessageDeflateFactory(zdict=b"zdict")
+        extension = factory.process_response_params([], [])
+        self.assertEqual(extension.zdict, b"zdict")
+
+    def test_process_response_params_encoder_idle_timeout(self):
+        factory = ClientPerMessageDeflateFactory(encoder_idle_timeout=60)
+        extension = factory.process_response_params([], [])
+        self.assertEqual(extension.encoder_idle_timeout, 60)
+
+    def test_process_response_params_adaptive_compress_level(self):
+        factory = ClientPerMessageDeflateFactory(adaptive_compress_level=1)
+        extension = factory.process_response_params([], [])
+        self.assertEqual(extension.adaptive_compress_level, 1)
+
     def test_process_response_params_deduplication(self):
         factory = ClientPerMessageDeflateFactory(False, False, None, None)
         with self.assertRaises(NegotiationError):
@@ -587,11 +873,16 @@ class ServerPerMessageDeflateFactoryTests(unittest.TestCase, ExtensionTestsMixin
             (False, False, None, True),  # client_max_window_bits
             (False, False, True, None),  # server_max_window_bits
             (False, False, None, None, {"wbits": 11}),
+            (False, False, None, None, {"zdict": b"zdict"}),
         ]:
             with self.subTest(config=config):
                 with self.assertRaises(ValueError):
                     ServerPerMessageDeflateFactory(*config)
 
+    def test_init_error_adaptive_compress_level(self):
+        with self.assertRaises(ValueError):
+            ServerPerMessageDeflateFactory(adaptive_compress_level=10)
+
     def test_process_request_params(self):
         # Parameters in result appear swapped vs. config because the order is
         # (remote, local) vs. (server, client).
@@ -845,6 +1136,21 @@ class ServerPerMessageDeflateFactoryTests(unittest.TestCase, ExtensionTestsMixin
                     expected = PerMessageDeflate(*result)
                     self.assertExtensionEqual(extension, expected)
 
+    def test_process_request_params_zdict(self):
+        factory = ServerPerMessageDeflateFactory(zdict=b"zdict")
+        _, extension = factory.process_request_params([], [])
+        self.assertEqual(extension.zdict, b"zdict")
+
+    def test_process_request_params_encoder_idle_timeout(self):
+        factory = ServerPerMessageDeflateFactory(encoder_idle_timeout=60)
+        _, extension = factory.process_request_params([], [])
+        self.assertEqual(extension.encoder_idle_timeout, 60)
+
+    def test_process_request_params_adaptive_compress_level(self):
+        factory = ServerPerMessageDeflateFactory(adaptive_compress_level=1)
+        _, extension = factory.process_request_params([], [])
+        self.assertEqual(extension.adaptive_compress_level, 1)
+
     def test_process_response_params_deduplication(self):
         factory = ServerPerMessageDeflateFactory(False, False, None, None)
         with self.assertRaises(NegotiationError):
@@ -2,9 +2,12 @@ import asyncio
 import contextlib
 import functools
 import http
+import io
 import logging
+import os
 import pathlib
 import random
+import signal
 import socket
 import ssl
 import sys
@@ -24,6 +27,12 @@ from websockets.exceptions import (
     InvalidStatusCode,
     NegotiationError,
 )
+from websockets.extensions.permessage_compress import (
+    ClientPerMessageCompressFactory,
+    PerMessageCompress,
+    ServerPerMessageCompressFactory,
+    ZlibCodec,
+)
 from websockets.extensions.permessage_deflate import (
     ClientPerMessageDeflateFactory,
     PerMessageDeflate,
@@ -31,10 +40,11 @@ from websockets.extensions.permessage_deflate import (
 )
 from websockets.http import USER_AGENT
 from websockets.legacy.client import *
-from websockets.legacy.handshake import build_response
+from websockets.legacy.fanout import UnixSocketFanout
 from websockets.legacy.http import read_response
 from websockets.legacy.server import *
 from websockets.uri import parse_uri
+from websockets.utils import accept_key
 
 from ..extensions.test_base import (
     ClientNoOpExtensionFactory,
@@ -651,6 +661,69 @@ class CommonClientServerTests:
         self.assertEqual(resp_headers.count("Server"), 1)
         self.assertIn("('Server', 'Eggs')", resp_headers)
 
+    @with_server(extra_headers={"X-Spam": "Eggs"})
+    def test_protocol_response_template(self):
+        for _ in range(2):
+            self.start_client("/headers")
+            self.loop.run_until_complete(self.client.recv())
+            resp_headers = self.loop.run_until_complete(self.client.recv())
+            self.stop_client()
+            self.assertIn("('X-Spam', 'Eggs')", resp_headers)
+            self.assertIn("'Date'", resp_headers)
+        self.assertEqual(len(self.server.response_templates), 1)
+
+    def test_protocol_response_template_mutable_extra_headers(self):
+        extra_headers = [("X-Spam", "Eggs")]
+        self.start_server(extra_headers=extra_headers)
+        try:
+            for value in ["Eggs", "Ham"]:
+                extra_headers[:] = [("X-Spam", value)]
+                self.start_client("/headers")
+                self.loop.run_until_complete(self.client.recv())
+                resp_headers = self.loop.run_until_complete(self.client.recv())
+                self.stop_client()
+                self.assertIn(f"('X-Spam', '{value}')", resp_headers)
+            self.assertEqual(len(self.server.response_templates), 2)
+        finally:
+            self.stop_server()
+
+    @with_server(ping_interval=20)
+    @with_client(ping_interval=20)
+    def test_keepalive_scheduler(self):
+        (server_websocket,) = self.server.websockets
+        scheduler = self.server.keepalive_scheduler
+        # Server connections share the scheduler of the server.
+        self.assertIs(server_websocket.keepalive_scheduler, scheduler)
+        self.assertIn(server_websocket, scheduler)
+        # Client connections have their own scheduler.
+        self.assertIsNot(self.client.keepalive_scheduler, scheduler)
+        self.assertIn(self.client, self.client.keepalive_scheduler)
+        # The echo handler doesn't return until the client closes.
+        self.loop.run_until_complete(self.client.close())
+
+    @with_server(lazy_keepalive=True)
+    @with_client(lazy_keepalive=True)
+    def test_lazy_keepalive(self):
+        (server_websocket,) = self.server.websockets
+        self.assertTrue(server_websocket.lazy_keepalive)
+        self.assertTrue(self.client.lazy_keepalive)
+        # The echo handler doesn't return until the client closes.
+        self.loop.run_until_complete(self.client.close())
+
+    @with_server(extra_headers=lambda p, r: {"X-Spam": "Eggs"})
+    def test_protocol_response_template_callable(self):
+        self.start_client("/headers")
+        self.stop_client()
+        self.assertEqual(len(self.server.response_templates), 0)
+
+    @with_server(extra_headers={"Date": "Thu, 01 Jan 1970 00:00:00 GMT"})
+    @with_client("/headers")
+    def test_protocol_custom_response_date(self):
+        self.loop.run_until_complete(self.client.recv())
+        resp_headers = self.loop.run_until_complete(self.client.recv())
+        self.assertEqual(resp_headers.count("Date"), 1)
+        self.assertIn("('Date', 'Thu, 01 Jan 1970 00:00:00 GMT')", resp_headers)
+
     @with_server(create_protocol=HealthCheckServerProtocol)
     def test_http_request_http_endpoint(self):
         # Making a HTTP request to a HTTP endpoint succeeds.
@@ -902,6 +975,24 @@ class CommonClientServerTests:
             repr([PerMessageDeflate(False, False, 12, 12)]),
         )
 
+    @with_server(extensions=[ServerPerMessageCompressFactory(ZlibCodec())])
+    @with_client(
+        "/extensions", extensions=[ClientPerMessageCompressFactory(ZlibCodec())]
+    )
+    def test_compression_codec(self):
+        server_extensions = self.loop.run_until_complete(self.client.recv())
+        self.assertEqual(server_extensions, repr([PerMessageCompress(ZlibCodec())]))
+        self.assertEqual(
+            repr(self.client.extensions), repr([PerMessageCompress(ZlibCodec())])
+        )
+
+    @with_server(compression="deflate", offload_threshold=1000)
+    @with_client(compression="deflate", offload_threshold=1000)
+    def test_compression_deflate_offload(self):
+        self.loop.run_until_complete(self.client.send("Hello!" * 1000))
+        reply = self.loop.run_until_complete(self.client.recv())
+        self.assertEqual(reply, "Hello!" * 1000)
+
     def test_compression_unsupported_server(self):
         with self.assertRaises(ValueError):
             self.start_server(compression="xz")
@@ -1011,12 +1102,12 @@ class CommonClientServerTests:
             self.start_client()
 
     @with_server()
-    @unittest.mock.patch("websockets.legacy.server.build_response")
-    def test_server_sends_invalid_handshake_response(self, _build_response):
-        def wrong_build_response(headers, key):
-            return build_response(headers, "42")
+    @unittest.mock.patch("websockets.legacy.server.accept_key")
+    def test_server_sends_invalid_handshake_response(self, _accept_key):
+        def wrong_accept_key(key):
+            return accept_key("42")
 
-        _build_response.side_effect = wrong_build_response
+        _accept_key.side_effect = wrong_accept_key
 
         with self.assertRaises(InvalidHandshake):
             self.start_client()
@@ -1091,6 +1182,94 @@ class CommonClientServerTests:
         )
         self.assertEqual(exception.status_code, 503)
 
+    @with_server(open_timeout=10 * MS)
+    def test_open_timeout(self):
+        host, port = self.server.sockets[0].getsockname()[:2]
+        kwargs = {}
+        if self.secure:
+            kwargs = {"ssl": self.client_context, "server_hostname": "localhost"}
+        reader, writer = self.loop.run_until_complete(
+            asyncio.open_connection(host, port, **kwargs)
+        )
+        # The client doesn't send a request. The server aborts the connection.
+        with self.assertLogs("websockets.server", logging.INFO) as logs:
+            data = self.loop.run_until_complete(
+                asyncio.wait_for(reader.read(), timeout=1)
+            )
+        self.assertEqual(data, b"")
+        self.assertIn(
+            "connection failed (opening handshake timed out)",
+            [record.getMessage() for record in logs.records],
+        )
+        writer.close()
+
+    @with_server(open_timeout=10 * MS)
+    def test_open_timeout_stops_after_handshake(self):
+        with self.temp_client():
+            self.loop.run_until_complete(asyncio.sleep(20 * MS))
+            self.loop.run_until_complete(self.client.send("Hello!"))
+            reply = self.loop.run_until_complete(self.client.recv())
+            self.assertEqual(reply, "Hello!")
+
+    def assertServiceUnavailable(self, exception):
+        self.assertEqual(
+            str(exception), "server rejected WebSocket connection: HTTP 503"
+        )
+        self.assertEqual(exception.status_code, 503)
+        self.assertEqual(exception.headers["Retry-After"], "1")
+
+    @with_server(create_protocol=SlowOpeningHandshakeProtocol, max_handshakes=1)
+    def test_max_handshakes(self):
+        kwargs = {"ssl": self.client_context} if self.secure else {}
+        first_client = asyncio.ensure_future(
+            connect(get_server_uri(self.server, self.secure), **kwargs),
+            loop=self.loop,
+        )
+        while not self.server.handshakes:
+            self.loop.run_until_complete(asyncio.sleep(MS))
+
+        with self.assertRaises(InvalidStatusCode) as raised:
+            self.start_client()
+        self.assertServiceUnavailable(raised.exception)
+
+        # Connections are admitted again once the handshake completes.
+        first_client = self.loop.run_until_complete(first_client)
+        with self.temp_client():
+            self.loop.run_until_complete(self.client.send("Hello!"))
+            reply = self.loop.run_until_complete(self.client.recv())
+            self.assertEqual(reply, "Hello!")
+        self.loop.run_until_complete(first_client.close())
+
+    @with_server(max_connections=1)
+    def test_max_connections(self):
+        self.start_client()
+        first_client = self.client
+
+        with self.assertRaises(InvalidStatusCode) as raised:
+            self.start_client()
+        self.assertServiceUnavailable(raised.exception)
+
+        # Connections are admitted again once the connection terminates.
+        self.loop.run_until_complete(first_client.close())
+        while self.server.websockets:
+            self.loop.run_until_complete(asyncio.sleep(MS))
+        with self.temp_client():
+            self.loop.run_until_complete(self.client.send("Hello!"))
+            reply = self.loop.run_until_complete(self.client.recv())
+            self.assertEqual(reply, "Hello!")
+
+    @with_server(accept_rate=1, accept_burst=2)
+    def test_accept_rate(self):
+        for _ in range(2):
+            with self.temp_client():
+                self.loop.run_until_complete(self.client.send("Hello!"))
+                reply = self.loop.run_until_complete(self.client.recv())
+                self.assertEqual(reply, "Hello!")
+
+        with self.assertRaises(InvalidStatusCode) as raised:
+            self.start_client()
+        self.assertServiceUnavailable(raised.exception)
+
     @with_server()
     def test_server_shuts_down_during_connection_handling(self):
         with self.temp_client():
@@ -1103,6 +1282,42 @@ class CommonClientServerTests:
         self.assertEqual(self.client.close_code, 1001)
         self.assertEqual(server_ws.close_code, 1001)
 
+    @with_server(close_drain=20 * MS)
+    def test_server_shuts_down_with_close_drain(self):
+        clients = []
+        for _ in range(3):
+            self.start_client("/slow_stop")
+            clients.append(self.client)
+
+        start = self.loop.time()
+        self.server.close()
+        self.loop.run_until_complete(self.server.wait_closed())
+
+        # Close frames are spread over the drain window.
+        self.assertGreaterEqual(self.loop.time() - start, 10 * MS)
+        for client in clients:
+            self.assertEqual(client.close_code, 1001)
+
+    @with_server(close_timeout=20 * MS)
+    def test_server_shuts_down_aborts_unresponsive_connections(self):
+        self.start_client("/slow_stop")
+        server_ws = next(iter(self.server.websockets))
+        # The client doesn't answer the close frame.
+        self.client.transport.pause_reading()
+
+        with self.assertLogs("websockets.server", logging.INFO) as logs:
+            self.server.close()
+            self.loop.run_until_complete(self.server.wait_closed())
+
+        self.assertIn(
+            "closing handshake timed out; aborting 1 connections",
+            [record.getMessage() for record in logs.records],
+        )
+        self.assertEqual(server_ws.close_code, 1006)
+
+        self.client.transport.resume_reading()
+        self.loop.run_until_complete(self.client.wait_closed())
+
     @with_server()
     def test_server_shuts_down_waits_until_handlers_terminate(self):
         # This handler waits a bit after the connection is closed in order
@@ -1493,3 +1708,273 @@ class LoggerTests(ClientServerTestsMixin, AsyncioTestCase):
 
         self.assertGreater(len(server_logs.records), 0)
         self.assertGreater(len(client_logs.records), 0)
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "this test requires os.fork")
+class ServeMultiTests(AsyncioTestCase):
+    async def wait_for_connections(self, pool, connections):
+        # Workers update the count of connections asynchronously.
+        for _ in range(100):
+            if pool.connections == connections:
+                break
+            await asyncio.sleep(10 * MS)
+        self.assertEqual(pool.connections, connections)
+
+    async def test_serve_multi(self):
+        async with serve_multi(default_handler, "localhost", 0, workers=2) as pool:
+            self.assertEqual(len(pool.processes), 2)
+            self.assertTrue(pool.is_serving())
+            # Connections stay open until the server closes them.
+            uri = get_server_uri(pool, resource_name="/slow_stop")
+            clients = [await connect(uri) for _ in range(4)]
+            await self.wait_for_connections(pool, 4)
+
+        # Exiting the context manager stopped workers and closed connections.
+        self.assertFalse(pool.is_serving())
+        self.assertEqual([process.exitcode for process in pool.processes], [0, 0])
+        for client in clients:
+            await client.wait_closed()
+            self.assertEqual(client.close_code, 1001)
+        self.assertTrue(all(sock.fileno() == -1 for sock in pool.sockets))
+
+    @unittest.skipUnless(
+        hasattr(socket, "SO_REUSEPORT"), "this test requires SO_REUSEPORT"
+    )
+    async def test_serve_multi_reuse_port(self):
+        async with serve_multi(
+            default_handler, "localhost", 0, workers=2, reuse_port=True
+        ) as pool:
+            # Each worker has its own socket listening on the same port.
+            sockets_1, sockets_2 = pool.worker_sockets
+            self.assertNotEqual(sockets_1, sockets_2)
+            self.assertEqual(
+                [sock.getsockname() for sock in sockets_1],
+                [sock.getsockname() for sock in sockets_2],
+            )
+            async with connect(get_server_uri(pool)) as client:
+                await client.send("Hello!")
+                self.assertEqual(await client.recv(), "Hello!")
+
+    async def test_serve_multi_restarts_worker(self):
+        async with serve_multi(default_handler, "localhost", 0, workers=2) as pool:
+            process_1, process_2 = pool.processes
+            with self.assertLogs("websockets.server", logging.ERROR) as logs:
+                os.kill(process_1.pid, signal.SIGKILL)
+                await asyncio.sleep(100 * MS)
+
+            self.assertEqual(
+                [record.getMessage() for record in logs.records],
+                [f"worker 0 exited with code {-signal.SIGKILL}; restarting"],
+            )
+            self.assertIsNot(pool.processes[0], process_1)
+            self.assertIs(pool.processes[1], process_2)
+            self.assertTrue(pool.processes[0].is_alive())
+
+            async with connect(get_server_uri(pool)) as client:
+                await client.send("Hello!")
+                self.assertEqual(await client.recv(), "Hello!")
+
+    async def test_serve_multi_delays_restarting_failing_worker(self):
+        # Workers inherit sys.stderr; silence tracebacks of failing workers.
+        with unittest.mock.patch("sys.stderr", io.StringIO()), self.assertLogs(
+            "websockets.server", logging.ERROR
+        ) as logs:
+            # Workers fail to start because the compression setting is invalid.
+            pool = await serve_multi(
+                default_handler, "localhost", 0, workers=1, compression="bogus"
+            )
+            await asyncio.sleep(500 * MS)
+            pool.close()
+            await pool.wait_closed()
+
+        messages = [record.getMessage() for record in logs.records]
+        # Restarts are delayed by 0.1, 0.2, 0.4, ... seconds after the first one.
+        self.assertLess(len(messages), 6)
+        self.assertEqual(messages[0], "worker 0 exited with code 1; restarting")
+        self.assertEqual(
+            messages[1], "worker 0 exited with code 1; restarting in 0.1 seconds"
+        )
+
+    async def test_serve_multi_fanout(self):
+        fanout = UnixSocketFanout()
+
+        async def handler(websocket, path):
+            if path == "/publish":
+                fanout.publish(await websocket.recv())
+            else:
+                fanout.subscribe(websocket)
+                try:
+                    await websocket.wait_closed()
+                finally:
+                    fanout.unsubscribe(websocket)
+
+        async with serve_multi(
+            handler, "localhost", 0, workers=2, fanout=fanout
+        ) as pool:
+            # Connect enough clients to reach both workers in all likelihood.
+            uri = get_server_uri(pool, resource_name="/subscribe")
+            clients = [await connect(uri) for _ in range(8)]
+            await self.wait_for_connections(pool, 8)
+
+            async with connect(
+                get_server_uri(pool, resource_name="/publish")
+            ) as client:
+                await client.send("Hello!")
+
+            for client in clients:
+                self.assertEqual(await client.recv(), "Hello!")
+
+        self.assertIsNone(fanout.path)
+
+    async def test_serve_multi_close_is_idempotent(self):
+        pool = await serve_multi(default_handler, "localhost", 0, workers=1)
+        pool.close()
+        pool.close()
+        await pool.wait_closed()
+        self.assertEqual(pool.processes[0].exitcode, 0)
+
+    def test_serve_multi_invalid_workers(self):
+        with self.assertRaises(ValueError):
+            serve_multi(default_handler, "localhost", 0, workers=0)
+
+    def test_serve_multi_limit_lower_than_workers(self):
+        with self.assertRaises(ValueError):
+            serve_multi(default_handler, "localhost", 0, workers=2, max_connections=1)
+
+    def test_serve_multi_unsupported_argument(self):
+        with socket.socket() as sock:
+            with self.assertRaises(TypeError):
+                serve_multi(default_handler, sock=sock)
+
+
+class ServeThreadedTests(AsyncioTestCase):
+    async def wait_for_connections(self, server, connections):
+        # Threads report closed connections asynchronously.
+        for _ in range(100):
+            if server.connections == connections:
+                break
+            await asyncio.sleep(MS)
+        self.assertEqual(server.connections, connections)
+
+    async def test_serve_threaded(self):
+        async with serve_threaded(default_handler, "localhost", 0, threads=2) as server:
+            self.assertEqual(len(server.threads), 2)
+            self.assertTrue(server.is_serving())
+            async with connect(get_server_uri(server)) as client:
+                await client.send("Hello!")
+                self.assertEqual(await client.recv(), "Hello!")
+
+        # Exiting the context manager terminated threads.
+        self.assertFalse(server.is_serving())
+        for thread in server.threads:
+            self.assertFalse(thread.thread.is_alive())
+        self.assertTrue(all(sock.fileno() == -1 for sock in server.sockets))
+
+    async def test_serve_threaded_logs_listening_once(self):
+        with self.assertLogs("websockets.server", logging.INFO) as logs:
+            async with serve_threaded(default_handler, "localhost", 0, threads=2):
+                pass
+        self.assertEqual(
+            len([log for log in logs.records if "listening" in log.getMessage()]),
+            1,
+        )
+
+    async def test_serve_threaded_round_robin(self):
+        async with serve_threaded(default_handler, "localhost", 0, threads=2) as server:
+            uri = get_server_uri(server, resource_name="/slow_stop")
+            clients = [await connect(uri) for _ in range(4)]
+
+            # Connections are spread evenly between threads.
+            self.assertEqual([thread.connections for thread in server.threads], [2, 2])
+            for thread in server.threads:
+                self.assertEqual(len(thread.serve.ws_server.websockets), 2)
+
+        # Closing the server closed connections in all threads.
+        for client in clients:
+            await client.wait_closed()
+            self.assertEqual(client.close_code, 1001)
+
+    async def test_serve_threaded_least_connections(self):
+        async with serve_threaded(
+            default_handler, "localhost", 0, threads=2, balance="least-connections"
+        ) as server:
+            uri = get_server_uri(server, resource_name="/slow_stop")
+            client_1 = await connect(uri)
+            client_2 = await connect(uri)
+            await client_1.close()
+            await self.wait_for_connections(server, 1)
+
+            # The thread that had the first connection gets the next one.
+            client_3 = await connect(uri)
+            self.assertEqual([thread.connections for thread in server.threads], [1, 1])
+
+            await client_2.close()
+            await client_3.close()
+            await self.wait_for_connections(server, 0)
+
+    async def test_serve_threaded_max_connections(self):
+        async with serve_threaded(
+            default_handler, "localhost", 0, threads=1, max_connections=1
+        ) as server:
+            uri = get_server_uri(server)
+            async with connect(uri):
+                with self.assertRaises(InvalidStatusCode) as raised:
+                    await connect(uri)
+                self.assertEqual(raised.exception.status_code, 503)
+                # The rejected connection is no longer counted once it's closed.
+                await self.wait_for_connections(server, 1)
+            await self.wait_for_connections(server, 0)
+
+    async def test_serve_threaded_max_connections_split_between_threads(self):
+        async with serve_threaded(
+            default_handler,
+            "localhost",
+            0,
+            threads=2,
+            balance="least-connections",
+            max_connections=2,
+        ) as server:
+            uri = get_server_uri(server)
+            async with connect(uri), connect(uri):
+                # max_connections applies to the server, not to each thread.
+                with self.assertRaises(InvalidStatusCode) as raised:
+                    await connect(uri)
+                self.assertEqual(raised.exception.status_code, 503)
+
+    def test_serve_threaded_limit_lower_than_threads(self):
+        with self.assertRaises(ValueError):
+            serve_threaded(default_handler, "localhost", 0, threads=2, max_handshakes=1)
+
+    async def test_serve_threaded_tls(self):
+        server_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        server_context.load_cert_chain(testcert)
+        client_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        client_context.load_verify_locations(testcert)
+
+        async with serve_threaded(
+            default_handler, "localhost", 0, threads=2, ssl=server_context
+        ) as server:
+            async with connect(
+                get_server_uri(server, secure=True), ssl=client_context
+            ) as client:
+                await client.send("Hello!")
+                self.assertEqual(await client.recv(), "Hello!")
+
+    async def test_serve_threaded_error_in_thread(self):
+        with self.assertRaises(ValueError):
+            await serve_threaded(
+                default_handler, "localhost", 0, threads=2, compression="bogus"
+            )
+
+    def test_serve_threaded_invalid_threads(self):
+        with self.assertRaises(ValueError):
+            serve_threaded(default_handler, "localhost", 0, threads=0)
+
+    def test_serve_threaded_invalid_balance(self):
+        with self.assertRaises(ValueError):
+            serve_threaded(default_handler, "localhost", 0, balance="random")
+
+    def test_serve_threaded_unsupported_argument(self):
+        with socket.socket() as sock:
+            with self.assertRaises(TypeError):
+                serve_threaded(default_handler, sock=sock)
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+from websockets.connection import State
+from websockets.frames import OP_BINARY, OP_TEXT
+from websockets.legacy.fanout import Fanout, UnixSocketFanout
+
+from .utils import MS, AsyncioTestCase
+
+
+def make_websocket(state=State.OPEN):
+    websocket = unittest.mock.Mock()
+    websocket.state = state
+    websocket._fragmented_message_waiter = None
+    websocket._offload_waiter = None
+    return websocket
+
+
+class FanoutTests(unittest.TestCase):
+    def setUp(self):
+        self.fanout = Fanout()
+
+    def test_publish(self):
+        websocket = make_websocket()
+        self.fanout.subscribe(websocket)
+        self.fanout.publish("café")
+        websocket.write_frame_sync.assert_called_once_with(
+            True, OP_TEXT, "café".encode()
+        )
+
+    def test_publish_binary(self):
+        websocket = make_websocket()
+        self.fanout.subscribe(websocket)
+        self.fanout.publish(b"tea")
+        websocket.write_frame_sync.assert_called_once_with(True, OP_BINARY, b"tea")
+
+    def test_publish_skips_closed_connections(self):
+        websocket = make_websocket(State.CLOSED)
+        self.fanout.subscribe(websocket)
+        self.fanout.publish("café")
+        websocket.write_frame_sync.assert_not_called()
+
+    def test_publish_forwards_encoded_message(self):
+        with unittest.mock.patch.object(self.fanout, "forward") as forward:
+            self.fanout.publish("café")
+        forward.assert_called_once_with(OP_TEXT, "café".encode())
+
+    def test_publish_type_error(self):
+        with self.assertRaises(TypeError):
+            self.fanout.publish(42)
+
+    def test_unsubscribe(self):
+        websocket = make_websocket()
+        self.fanout.subscribe(websocket)
+        self.fanout.unsubscribe(websocket)
+        self.fanout.unsubscribe(websocket)
+        self.fanout.publish("café")
+        websocket.write_frame_sync.assert_not_called()
+
+
+@unittest.skipUnless(hasattr(os, "fork"), "this test requires Unix sockets")
+class UnixSocketFanoutTests(AsyncioTestCase):
+    async def start_workers(self, count, path=None):
+        # Each worker gets its own copy of the fan-out layer, like with fork.
+        self.hub = UnixSocketFanout(path)
+        await self.hub.start()
+        workers = []
+        for _ in range(count):
+            worker = UnixSocketFanout(self.hub.path)
+            await worker.connect()
+            workers.append(worker)
+        # Let the hub accept connections.
+        await asyncio.sleep(MS)
+        return workers
+
+    async def stop_workers(self, workers):
+        for worker in workers:
+            await worker.disconnect()
+        await self.hub.stop()
+
+    async def test_publish(self):
+        workers = await self.start_workers(3)
+        websockets = [make_websocket() for _ in workers]
+        for worker, websocket in zip(workers, websockets):
+            worker.subscribe(websocket)
+
+        workers[0].publish("café")
+        await asyncio.sleep(10 * MS)
+
+        # Each worker delivers the message exactly once.
+        for websocket in websockets:
+            websocket.write_frame_sync.assert_called_once_with(
+                True, OP_TEXT, "café".encode()
+            )
+
+        await self.stop_workers(workers)
+
+    async def test_publish_large_message(self):
+        workers = await self.start_workers(2)
+        websocket = make_websocket()
+        workers[1].subscribe(websocket)
+
+        workers[0].publish(b"\x00" * 2 ** 20)
+        for _ in range(100):
+            if websocket.write_frame_sync.called:
+                break
+            await asyncio.sleep(MS)
+
+        websocket.write_frame_sync.assert_called_once_with(
+            True, OP_BINARY, b"\x00" * 2 ** 20
+        )
+
+        await self.stop_workers(workers)
+
+    async def test_delivery_error(self):
+        workers = await self.start_workers(2)
+        websocket = make_websocket()
+        websocket.write_frame_sync.side_effect = Exception("BOOM")
+        workers[1].subscribe(websocket)
+
+        with self.assertLogs("websockets", logging.ERROR) as logs:
+            workers[0].publish("café")
+            await asyncio.sleep(10 * MS)
+
+        self.assertEqual(
+            [record.getMessage() for record in logs.records],
+            ["fanout delivery failed"],
+        )
+
+        await self.stop_workers(workers)
+
+    async def test_local_delivery_error(self):
+        workers = await self.start_workers(2)
+        local_websocket = make_websocket()
+        local_websocket.write_frame_sync.side_effect = Exception("BOOM")
+        workers[0].subscribe(local_websocket)
+        websocket = make_websocket()
+        workers[1].subscribe(websocket)
+
+        # The message reaches other workers even if local delivery fails.
+        with self.assertRaises(Exception):
+            workers[0].publish("café")
+        await asyncio.sleep(10 * MS)
+        websocket.write_frame_sync.assert_called_once_with(
+            True, OP_TEXT, "café".encode()
+        )
+
+        await self.stop_workers(workers)
+
+    async def test_after_fork(self):
+        workers = await self.start_workers(2)
+        fds = [sock.fileno() for sock in self.hub.hub.sockets] + [
+            writer.get_extra_info("socket").fileno() for writer in self.hub.peers
+        ]
+        self.assertEqual(len(fds), 3)
+
+        pid = os.fork()
+        if pid == 0:  # pragma: no cover
+            # A worker closes file descriptors inherited from the supervisor.
+            self.hub.after_fork()
+            closed = 0
+            for fd in fds:
+                try:
+                    os.fstat(fd)
+                except OSError:
+                    closed += 1
+            os._exit(0 if closed == len(fds) else 1)
+
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.WEXITSTATUS(status), 0)
+
+        # File descriptors are still open in the supervisor.
+        for fd in fds:
+            os.fstat(fd)
+
+        await self.stop_workers(workers)
+
+    async def test_temporary_path(self):
+        workers = await self.start_workers(1)
+        path = self.hub.path
+        self.assertTrue(os.path.exists(path))
+
+        await self.stop_workers(workers)
+        self.assertFalse(os.path.exists(os.path.dirname(path)))
+
+    async def test_explicit_path(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "fanout")
+            workers = await self.start_workers(1, path)
+            self.assertEqual(self.hub.path, path)
+
+            await self.stop_workers(workers)
+            self.assertFalse(os.path.exists(path))
+
+    async def test_publish_without_connection(self):
+        fanout = UnixSocketFanout()
+        websocket = make_websocket()
+        fanout.subscribe(websocket)
+
+        # Messages are delivered locally before connect().
+        fanout.publish("café")
+        websocket.write_frame_sync.assert_called_once_with(
+            True, OP_TEXT, "café".encode()
+        )
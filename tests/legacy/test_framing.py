@@ -1,6 +1,7 @@
 import asyncio
 import codecs
 import dataclasses
+import threading
 import unittest
 import unittest.mock
 import warnings
@@ -13,7 +14,14 @@ from .utils import AsyncioTestCase
 
 
 class FramingTests(AsyncioTestCase):
-    def decode(self, message, mask=False, max_size=None, extensions=None):
+    def decode(
+        self,
+        message,
+        mask=False,
+        max_size=None,
+        extensions=None,
+        offload_threshold=None,
+    ):
         stream = asyncio.StreamReader(loop=self.loop)
         stream.feed_data(message)
         stream.feed_eof()
@@ -24,6 +32,7 @@ class FramingTests(AsyncioTestCase):
                     mask=mask,
                     max_size=max_size,
                     extensions=extensions,
+                    offload_threshold=offload_threshold,
                 )
             )
         # Make sure all the data was consumed.
@@ -172,6 +181,24 @@ class FramingTests(AsyncioTestCase):
             b"\x81\x05uryyb", Frame(True, OP_TEXT, b"hello"), extensions=[Rot13()]
         )
 
+    def test_extensions_offload(self):
+        threads = []
+
+        class ThreadRecorder:
+            @staticmethod
+            def decode(frame, *, max_size=None):
+                threads.append(threading.current_thread())
+                return frame
+
+        extensions = [ThreadRecorder()]
+
+        self.decode(b"\x81\x05hello", extensions=extensions, offload_threshold=6)
+        self.decode(b"\x81\x05hello", extensions=extensions, offload_threshold=5)
+
+        below_threshold, above_threshold = threads
+        self.assertIs(below_threshold, threading.current_thread())
+        self.assertIsNot(above_threshold, threading.current_thread())
+
 
 class ParseAndSerializeCloseTests(unittest.TestCase):
     def assertCloseData(self, code, reason, data):
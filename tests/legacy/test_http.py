@@ -108,6 +108,28 @@ class HTTPAsyncTests(AsyncioTestCase):
         with self.assertRaisesRegex(ValueError, "invalid HTTP header line: Oops"):
             await read_response(self.stream)
 
+    async def test_read_request_in_chunks(self):
+        self.stream.feed_data(b"GET /chat HTTP/1.1\r\nUpgrade: websocket\r\n")
+        read_task = self.loop.create_task(read_request(self.stream))
+        await asyncio.sleep(0)
+        self.assertFalse(read_task.done())
+        self.stream.feed_data(b"\r\nrest")
+        self.stream.feed_eof()
+        path, headers = await read_task
+        self.assertEqual(path, "/chat")
+        self.assertEqual(headers["Upgrade"], "websocket")
+        self.assertEqual(await self.stream.read(), b"rest")
+
+    async def test_read_request_over_stream_limit(self):
+        # The head exceeds the StreamReader's limit but lines don't.
+        stream = asyncio.StreamReader(limit=1024, loop=self.loop)
+        stream.feed_data(
+            b"GET /chat HTTP/1.1\r\n" + b"foo: " + b"a" * 1000 + b"\r\n" * 2 * 3
+        )
+        path, headers = await read_request(stream)
+        self.assertEqual(path, "/chat")
+        self.assertEqual(headers["foo"], "a" * 1000)
+
     async def test_header_name(self):
         self.stream.feed_data(b"foo bar: baz qux\r\n\r\n")
         with self.assertRaises(ValueError):
@@ -129,6 +151,12 @@ class HTTPAsyncTests(AsyncioTestCase):
         with self.assertRaises(SecurityError):
             await read_headers(self.stream)
 
+    async def test_stream_limit(self):
+        # The line is rejected once it exceeds the StreamReader's limit.
+        self.stream.feed_data(b"GET / HTTP/1.1\r\n" + b"a" * 2 ** 20)
+        with self.assertRaises(ValueError):
+            await read_request(self.stream)
+
     async def test_line_ending(self):
         self.stream.feed_data(b"foo: bar\n\n")
         with self.assertRaises(EOFError):
@@ -0,0 +1,150 @@
+import logging
+import unittest.mock
+
+from websockets.legacy.keepalive import KeepaliveScheduler
+
+from .utils import MS, AsyncioTestCase
+
+
+class KeepaliveSchedulerTests(AsyncioTestCase):
+    def setUp(self):
+        super().setUp()
+        # Control the clock of the event loop to make tests deterministic.
+        self.time = self.loop.time()
+        patcher = unittest.mock.patch.object(self.loop, "time", lambda: self.time)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = KeepaliveScheduler(self.loop)
+
+    def make_protocol(self, *deadlines):
+        protocol = unittest.mock.Mock()
+        protocol.logger = logging.getLogger("websockets.protocol")
+        # Return deadlines relative to the time of each call.
+        deadlines = iter(deadlines)
+
+        def keepalive():
+            deadline = next(deadlines)
+            return None if deadline is None else self.loop.time() + deadline
+
+        protocol.keepalive.side_effect = keepalive
+        return protocol
+
+    def sleep(self, delay):
+        # Advance the clock, then let the event loop run timers that are due.
+        self.time += delay
+        self.run_loop_once()
+
+    def test_schedule(self):
+        protocol = self.make_protocol(None)
+        self.scheduler.schedule(protocol, self.loop.time() + 2 * MS)
+        self.assertIn(protocol, self.scheduler)
+
+        self.sleep(MS)
+        protocol.keepalive.assert_not_called()
+
+        self.sleep(2 * MS)
+        protocol.keepalive.assert_called_once_with()
+        self.assertNotIn(protocol, self.scheduler)
+        self.assertIsNone(self.scheduler.timer)
+
+    def test_schedule_next_deadline(self):
+        protocol = self.make_protocol(2 * MS, None)
+        self.scheduler.schedule(protocol, self.loop.time() + MS)
+
+        self.sleep(2 * MS)
+        self.assertEqual(protocol.keepalive.call_count, 1)
+        self.assertIn(protocol, self.scheduler)
+
+        self.sleep(2 * MS)
+        self.assertEqual(protocol.keepalive.call_count, 2)
+        self.assertNotIn(protocol, self.scheduler)
+
+    def test_schedule_replaces_deadline(self):
+        protocol = self.make_protocol(None)
+        self.scheduler.schedule(protocol, self.loop.time() + MS)
+        self.scheduler.schedule(protocol, self.loop.time() + 3 * MS)
+        self.assertEqual(len(self.scheduler), 1)
+
+        self.sleep(2 * MS)
+        protocol.keepalive.assert_not_called()
+
+        self.sleep(2 * MS)
+        protocol.keepalive.assert_called_once_with()
+
+    def test_schedule_earlier_deadline(self):
+        protocol_1 = self.make_protocol(None)
+        protocol_2 = self.make_protocol(None)
+        self.scheduler.schedule(protocol_1, self.loop.time() + 3 * MS)
+        self.scheduler.schedule(protocol_2, self.loop.time() + MS)
+
+        self.sleep(2 * MS)
+        protocol_1.keepalive.assert_not_called()
+        protocol_2.keepalive.assert_called_once_with()
+
+        self.sleep(2 * MS)
+        protocol_1.keepalive.assert_called_once_with()
+
+    def test_batch(self):
+        protocols = [self.make_protocol(None) for _ in range(3)]
+        when = self.loop.time() + MS
+        for protocol in protocols:
+            self.scheduler.schedule(protocol, when)
+
+        # A single timer handles all connections.
+        with unittest.mock.patch.object(
+            self.scheduler, "run", wraps=self.scheduler.run
+        ) as run:
+            self.scheduler.set_timer(when)
+            self.sleep(2 * MS)
+
+        run.assert_called_once_with()
+        for protocol in protocols:
+            protocol.keepalive.assert_called_once_with()
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_unschedule(self):
+        protocol_1 = self.make_protocol(None)
+        protocol_2 = self.make_protocol(None)
+        self.scheduler.schedule(protocol_1, self.loop.time() + MS)
+        self.scheduler.schedule(protocol_2, self.loop.time() + MS)
+
+        self.scheduler.unschedule(protocol_1)
+        self.assertNotIn(protocol_1, self.scheduler)
+        self.assertIsNotNone(self.scheduler.timer)
+
+        self.sleep(2 * MS)
+        protocol_1.keepalive.assert_not_called()
+        protocol_2.keepalive.assert_called_once_with()
+
+    def test_unschedule_last_connection(self):
+        protocol = self.make_protocol(None)
+        self.scheduler.schedule(protocol, self.loop.time() + MS)
+
+        self.scheduler.unschedule(protocol)
+        self.assertEqual(self.scheduler.heap, [])
+        self.assertIsNone(self.scheduler.timer)
+
+        self.sleep(2 * MS)
+        protocol.keepalive.assert_not_called()
+
+    def test_unschedule_unknown_connection(self):
+        self.scheduler.unschedule(self.make_protocol())
+        self.assertEqual(len(self.scheduler), 0)
+
+    def test_error(self):
+        protocol_1 = self.make_protocol()
+        protocol_1.keepalive.side_effect = Exception("BOOM")
+        protocol_2 = self.make_protocol(None)
+        self.scheduler.schedule(protocol_1, self.loop.time() + MS)
+        self.scheduler.schedule(protocol_2, self.loop.time() + MS)
+
+        with self.assertLogs("websockets", logging.ERROR) as logs:
+            self.sleep(2 * MS)
+
+        self.assertEqual(
+            [record.getMessage() for record in logs.records],
+            ["keepalive ping failed"],
+        )
+        # Other connections are processed anyway.
+        protocol_2.keepalive.assert_called_once_with()
+        self.assertEqual(len(self.scheduler), 0)
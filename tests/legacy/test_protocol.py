@@ -1,12 +1,16 @@
 import asyncio
 import contextlib
+import logging
 import sys
+import threading
 import unittest
 import unittest.mock
 import warnings
 
 from websockets.connection import State
 from websockets.exceptions import ConnectionClosed, InvalidState
+from websockets.extensions import Extension
+from websockets.extensions.permessage_deflate import PerMessageDeflate
 from websockets.frames import (
     OP_BINARY,
     OP_CLOSE,
@@ -23,6 +27,30 @@ from websockets.legacy.protocol import WebSocketCommonProtocol, broadcast
 from .utils import MS, AsyncioTestCase
 
 
+class ThreadRecorderExtension:
+    """
+    No-op extension that records the thread where frames are processed.
+
+    """
+
+    name = "x-thread-recorder"
+
+    def __init__(self):
+        self.threads = []
+        self.unblocked = threading.Event()
+        self.unblocked.set()
+
+    def decode(self, frame, *, max_size=None):
+        self.threads.append(threading.current_thread())
+        return frame
+
+    def encode(self, frame):
+        self.threads.append(threading.current_thread())
+        if frame.opcode == OP_TEXT:
+            self.unblocked.wait()
+        return frame
+
+
 async def async_iterable(iterable):
     for item in iterable:
         yield item
@@ -56,6 +84,12 @@ class TransportMock(unittest.mock.Mock):
         # Simulate a successful WebSocket handshake.
         self.protocol.connection_open()
 
+    def get_write_buffer_size(self):
+        return 0
+
+    def get_write_buffer_limits(self):
+        return (2 ** 14, 2 ** 16)
+
     def can_write_eof(self):
         return True
 
@@ -609,6 +643,51 @@ class CommonTests:
         self.loop.run_until_complete(self.protocol.send(memoryview(b"tea")))
         self.assertOneFrameSent(True, OP_BINARY, b"tea")
 
+    def test_send_compressed(self):
+        self.protocol.extensions = [PerMessageDeflate(False, False, 15, 15)]
+        self.loop.run_until_complete(self.protocol.send("café"))
+        (data,), _ = self.transport.write.call_args
+        # FIN, RSV1, OP_TEXT
+        self.assertEqual(data[0], 0b11000001)
+
+    def test_send_uncompressed(self):
+        self.protocol.extensions = [PerMessageDeflate(False, False, 15, 15)]
+        self.loop.run_until_complete(self.protocol.send("café", compress=False))
+        self.assertOneFrameSent(True, OP_TEXT, "café".encode("utf-8"))
+
+    def test_send_iterable_uncompressed(self):
+        self.protocol.extensions = [PerMessageDeflate(False, False, 15, 15)]
+        self.loop.run_until_complete(self.protocol.send(["ca", "fé"], compress=False))
+        self.assertFramesSent(
+            (False, OP_TEXT, "ca".encode("utf-8")),
+            (False, OP_CONT, "fé".encode("utf-8")),
+            (True, OP_CONT, "".encode("utf-8")),
+        )
+
+    def test_send_uncompressed_custom_extension(self):
+        extension = unittest.mock.Mock(spec=Extension)
+        extension.compresses = True
+        self.protocol.extensions = [extension]
+        self.loop.run_until_complete(self.protocol.send("café", compress=False))
+        extension.encode.assert_not_called()
+        self.assertOneFrameSent(True, OP_TEXT, "café".encode("utf-8"))
+
+    def test_send_observes_write_buffer(self):
+        extension = unittest.mock.Mock(spec=Extension)
+        extension.encode.side_effect = lambda frame: frame
+        extension.observes_write_buffer = True
+        self.protocol.extensions = [extension]
+        self.loop.run_until_complete(self.protocol.send("café"))
+        extension.observe_write_buffer.assert_called_once_with(0, 2 ** 14, 2 ** 16)
+
+    def test_send_doesnt_observe_write_buffer(self):
+        extension = unittest.mock.Mock(spec=Extension)
+        extension.encode.side_effect = lambda frame: frame
+        extension.observes_write_buffer = False
+        self.protocol.extensions = [extension]
+        self.loop.run_until_complete(self.protocol.send("café"))
+        extension.observe_write_buffer.assert_not_called()
+
     def test_send_dict(self):
         with self.assertRaises(TypeError):
             self.loop.run_until_complete(self.protocol.send({"not": "encoded"}))
@@ -1148,10 +1227,107 @@ class CommonTests:
         self.assertEqual(connection_closed_exc.code, 1000)
         self.assertEqual(connection_closed_exc.reason, "close")
 
+    # Test offloading extensions to an executor.
+
+    def restart_protocol_with_offload_threshold(self, offload_threshold=4):
+        self.protocol.offload_threshold = offload_threshold
+        self.extension = ThreadRecorderExtension()
+        self.protocol.extensions = [self.extension]
+
+    def test_send_in_executor(self):
+        self.restart_protocol_with_offload_threshold()
+        self.loop.run_until_complete(self.protocol.send("café"))
+        self.assertOneFrameSent(True, OP_TEXT, "café".encode("utf-8"))
+        (thread,) = self.extension.threads
+        self.assertIsNot(thread, threading.current_thread())
+
+    def test_send_below_offload_threshold(self):
+        self.restart_protocol_with_offload_threshold()
+        self.loop.run_until_complete(self.protocol.send("tea"))
+        self.assertOneFrameSent(True, OP_TEXT, b"tea")
+        (thread,) = self.extension.threads
+        self.assertIs(thread, threading.current_thread())
+
+    def test_send_in_executor_preserves_order(self):
+        self.restart_protocol_with_offload_threshold()
+        self.loop.run_until_complete(
+            asyncio.gather(
+                self.protocol.send("café"),
+                self.protocol.send("tea"),
+                self.protocol.send(["ca", "fé"]),
+            )
+        )
+        self.assertFramesSent(
+            (True, OP_TEXT, "café".encode("utf-8")),
+            (True, OP_TEXT, b"tea"),
+            (False, OP_TEXT, b"ca"),
+            (False, OP_CONT, "fé".encode("utf-8")),
+            (True, OP_CONT, b""),
+        )
+
+    def test_send_in_executor_when_closing(self):
+        self.restart_protocol_with_offload_threshold()
+        self.extension.unblocked.clear()
+        send = self.loop.create_task(self.protocol.send("café"))
+        self.run_loop_once()
+
+        # The connection is closed while the frame is encoded.
+        self.close_connection()
+        self.extension.unblocked.set()
+
+        with self.assertRaises(ConnectionClosed):
+            self.loop.run_until_complete(send)
+        self.assertNoFrameSent()
+
+    def test_send_in_executor_doesnt_block_broadcast(self):
+        self.restart_protocol_with_offload_threshold()
+        self.extension.unblocked.clear()
+        send = self.loop.create_task(self.protocol.send("café"))
+        self.run_loop_once()
+
+        # Broadcasting while the frame is encoded doesn't wait or fail.
+        broadcast([self.protocol], b"tea")
+        self.extension.unblocked.set()
+        self.loop.run_until_complete(send)
+
+        self.assertFramesSent(
+            (True, OP_BINARY, b"tea"),
+            (True, OP_TEXT, "café".encode("utf-8")),
+        )
+
+    def test_send_in_executor_doesnt_release_idle_state(self):
+        self.restart_protocol_with_keepalive_ping(ping_interval=1, ping_timeout=1)
+        self.restart_protocol_with_offload_threshold()
+        extension = unittest.mock.Mock(spec=Extension)
+        extension.encode.side_effect = lambda frame: frame
+        self.protocol.extensions.append(extension)
+        self.extension.unblocked.clear()
+        send = self.loop.create_task(self.protocol.send("café"))
+        self.run_loop_once()
+
+        # Extensions don't release their state while a frame is encoded.
+        self.protocol.keepalive()
+        extension.release_idle_state.assert_not_called()
+        self.extension.unblocked.set()
+        self.loop.run_until_complete(send)
+
+        self.assertFramesSent(
+            (True, OP_PING, self.protocol.keepalive_ping_data),
+            (True, OP_TEXT, "café".encode("utf-8")),
+        )
+
+    def test_recv_in_executor(self):
+        self.restart_protocol_with_offload_threshold()
+        self.receive_frame(Frame(True, OP_TEXT, "café".encode("utf-8")))
+        data = self.loop.run_until_complete(self.protocol.recv())
+        self.assertEqual(data, "café")
+        (thread,) = self.extension.threads
+        self.assertIsNot(thread, threading.current_thread())
+
     # Test the protocol logic for sending keepalive pings.
 
     def restart_protocol_with_keepalive_ping(
-        self, ping_interval=3 * MS, ping_timeout=3 * MS
+        self, ping_interval=3 * MS, ping_timeout=3 * MS, **kwargs
     ):
         initial_protocol = self.protocol
         # copied from tearDown
@@ -1162,86 +1338,166 @@ class CommonTests:
             self.protocol = WebSocketCommonProtocol(
                 ping_interval=ping_interval,
                 ping_timeout=ping_timeout,
+                **kwargs,
             )
         self.transport = TransportMock()
         self.transport.setup_mock(self.loop, self.protocol)
         self.protocol.is_client = initial_protocol.is_client
         self.protocol.side = initial_protocol.side
 
+    def run_loop_until(self, condition, timeout=1):
+        """
+        Run the event loop until ``condition()`` is true.
+
+        Unlike sleeping for a fixed delay, this doesn't depend on timing.
+
+        """
+        deadline = self.loop.time() + timeout
+        while not condition():
+            if self.loop.time() > deadline:  # pragma: no cover
+                self.fail("condition not reached")
+            self.run_loop_once()
+
+    def receive_keepalive_pong(self):
+        self.receive_frame(Frame(True, OP_PONG, self.protocol.keepalive_ping_data))
+        self.run_loop_until(lambda: self.protocol.keepalive_ping_data is None)
+
+    # Most tests call keepalive() directly instead of waiting for the keepalive
+    # scheduler, with ping_interval and ping_timeout long enough that it never
+    # fires during the test. KeepaliveSchedulerTests cover the scheduler.
+
     def test_keepalive_ping(self):
-        self.restart_protocol_with_keepalive_ping()
+        self.restart_protocol_with_keepalive_ping(ping_timeout=1)
 
-        # Ping is sent at 3ms and acknowledged at 4ms.
-        self.loop.run_until_complete(asyncio.sleep(4 * MS))
-        (ping_1,) = tuple(self.protocol.pings)
+        # The scheduler sends a ping after 3ms.
+        self.run_loop_until(lambda: self.protocol.keepalive_ping_data is not None)
+        ping_1 = self.protocol.keepalive_ping_data
         self.assertOneFrameSent(True, OP_PING, ping_1)
-        self.receive_frame(Frame(True, OP_PONG, ping_1))
+        self.receive_keepalive_pong()
 
-        # Next ping is sent at 7ms.
-        self.loop.run_until_complete(asyncio.sleep(4 * MS))
-        (ping_2,) = tuple(self.protocol.pings)
+        # The scheduler sends the next ping 3ms later.
+        self.run_loop_until(lambda: self.protocol.keepalive_ping_data is not None)
+        ping_2 = self.protocol.keepalive_ping_data
         self.assertOneFrameSent(True, OP_PING, ping_2)
 
-        # The keepalive ping task goes on.
-        self.assertFalse(self.protocol.keepalive_ping_task.done())
+        # Keepalive pings go on.
+        self.assertIn(self.protocol, self.protocol.keepalive_scheduler)
+        # Keepalive pings don't create futures.
+        self.assertEqual(self.protocol.pings, {})
+
+    def test_keepalive_ping_latency(self):
+        self.restart_protocol_with_keepalive_ping(ping_interval=1, ping_timeout=1)
+        self.assertEqual(self.protocol.latency, 0)
+
+        # Ping is sent and acknowledged 1ms later.
+        self.protocol.keepalive()
+        self.last_sent_frame()
+        self.loop.run_until_complete(asyncio.sleep(MS))
+        self.receive_keepalive_pong()
+
+        # Latency is measured between the ping and the pong.
+        self.assertGreater(self.protocol.latency, 0)
+
+    def test_keepalive_pong_acknowledges_previous_pings(self):
+        self.restart_protocol_with_keepalive_ping(ping_interval=1, ping_timeout=1)
+        ping = self.loop.run_until_complete(self.protocol.ping())
+        self.last_sent_frame()
+
+        # Keepalive ping is sent after the ping.
+        self.protocol.keepalive()
+        ping_1 = self.protocol.keepalive_ping_data
+        self.assertOneFrameSent(True, OP_PING, ping_1)
+
+        # Pong for the keepalive ping acknowledges the previous ping.
+        self.receive_keepalive_pong()
+        self.run_loop_until(ping.done)
+        self.assertEqual(self.protocol.pings, {})
+
+    def test_pong_acknowledges_previous_keepalive_ping(self):
+        self.restart_protocol_with_keepalive_ping(ping_interval=1, ping_timeout=1)
+
+        # Keepalive ping is sent before the ping.
+        self.protocol.keepalive()
+        self.last_sent_frame()
+        ping = self.loop.run_until_complete(self.protocol.ping())
+        ping_frame = self.last_sent_frame()
+
+        # Pong for the ping acknowledges the previous keepalive ping.
+        self.receive_frame(Frame(True, OP_PONG, ping_frame.data))
+        self.run_loop_until(ping.done)
+        self.assertIsNone(self.protocol.keepalive_ping_data)
+
+        # Next ping is sent rather than closing the connection.
+        self.assertIsNotNone(self.protocol.keepalive())
+        ping_2 = self.protocol.keepalive_ping_data
+        self.assertOneFrameSent(True, OP_PING, ping_2)
+
+    def test_ping_avoids_keepalive_ping_data(self):
+        self.restart_protocol_with_keepalive_ping(ping_interval=1, ping_timeout=1)
+
+        self.protocol.keepalive()
+        ping_1 = self.protocol.keepalive_ping_data
+
+        with self.assertRaises(RuntimeError):
+            self.loop.run_until_complete(self.protocol.ping(ping_1))
 
     def test_keepalive_ping_not_acknowledged_closes_connection(self):
-        self.restart_protocol_with_keepalive_ping()
+        self.restart_protocol_with_keepalive_ping(ping_interval=1, ping_timeout=1)
 
-        # Ping is sent at 3ms and not acknowleged.
-        self.loop.run_until_complete(asyncio.sleep(4 * MS))
-        (ping_1,) = tuple(self.protocol.pings)
+        # Ping is sent and not acknowleged.
+        when = self.protocol.keepalive()
+        self.assertEqual(when, self.protocol.keepalive_ping_time + 1)
+        ping_1 = self.protocol.keepalive_ping_data
         self.assertOneFrameSent(True, OP_PING, ping_1)
 
-        # Connection is closed at 6ms.
-        self.loop.run_until_complete(asyncio.sleep(4 * MS))
+        # Connection is closed when ping_timeout elapses.
+        self.assertIsNone(self.protocol.keepalive())
         self.assertOneFrameSent(
             True, OP_CLOSE, Close(1011, "keepalive ping timeout").serialize()
         )
 
-        # The keepalive ping task is complete.
-        self.assertEqual(self.protocol.keepalive_ping_task.result(), None)
+        # Keepalive pings stop.
+        self.run_loop_until(
+            lambda: self.protocol not in self.protocol.keepalive_scheduler
+        )
 
     def test_keepalive_ping_stops_when_connection_closing(self):
-        self.restart_protocol_with_keepalive_ping()
+        self.restart_protocol_with_keepalive_ping(ping_interval=1, ping_timeout=1)
         close_task = self.half_close_connection_local()
 
-        # No ping sent at 3ms because the closing handshake is in progress.
-        self.loop.run_until_complete(asyncio.sleep(4 * MS))
+        # No ping is sent because the closing handshake is in progress.
+        self.assertIsNone(self.protocol.keepalive())
         self.assertNoFrameSent()
 
-        # The keepalive ping task terminated.
-        self.assertTrue(self.protocol.keepalive_ping_task.cancelled())
-
         self.loop.run_until_complete(close_task)  # cleanup
 
+        # Keepalive pings stop.
+        self.assertNotIn(self.protocol, self.protocol.keepalive_scheduler)
+
     def test_keepalive_ping_stops_when_connection_closed(self):
         self.restart_protocol_with_keepalive_ping()
         self.close_connection()
 
-        # The keepalive ping task terminated.
-        self.assertTrue(self.protocol.keepalive_ping_task.cancelled())
+        # Keepalive pings stop.
+        self.assertNotIn(self.protocol, self.protocol.keepalive_scheduler)
 
     def test_keepalive_ping_does_not_crash_when_connection_lost(self):
-        self.restart_protocol_with_keepalive_ping()
+        self.restart_protocol_with_keepalive_ping(ping_interval=1, ping_timeout=1)
         # Clog incoming queue. This lets connection_lost() abort pending pings
         # with a ConnectionClosed exception before transfer_data_task
-        # terminates and close_connection cancels keepalive_ping_task.
+        # terminates and close_connection unschedules keepalive pings.
         self.protocol.max_queue = 1
         self.receive_frame(Frame(True, OP_TEXT, b"1"))
         self.receive_frame(Frame(True, OP_TEXT, b"2"))
-        # Ping is sent at 3ms.
-        self.loop.run_until_complete(asyncio.sleep(4 * MS))
-        (ping_waiter,) = tuple(self.protocol.pings.values())
+        # Ping is sent.
+        self.protocol.keepalive()
+        self.assertIsNotNone(self.protocol.keepalive_ping_data)
         # Connection drops.
         self.receive_eof()
         self.loop.run_until_complete(self.protocol.wait_closed())
 
-        # The ping waiter receives a ConnectionClosed exception.
-        with self.assertRaises(ConnectionClosed):
-            ping_waiter.result()
-        # The keepalive ping task terminated properly.
-        self.assertIsNone(self.protocol.keepalive_ping_task.result())
+        # Keepalive pings stop.
+        self.assertNotIn(self.protocol, self.protocol.keepalive_scheduler)
 
         # Unclog incoming queue to terminate the test quickly.
         self.loop.run_until_complete(self.protocol.recv())
@@ -1253,41 +1509,123 @@ class CommonTests:
         # No ping is sent at 3ms.
         self.loop.run_until_complete(asyncio.sleep(4 * MS))
         self.assertNoFrameSent()
+        self.assertFalse(hasattr(self.protocol, "keepalive_scheduler"))
 
     def test_keepalive_ping_with_no_ping_timeout(self):
-        self.restart_protocol_with_keepalive_ping(ping_timeout=None)
+        self.restart_protocol_with_keepalive_ping(ping_interval=1, ping_timeout=None)
 
-        # Ping is sent at 3ms and not acknowleged.
-        self.loop.run_until_complete(asyncio.sleep(4 * MS))
-        (ping_1,) = tuple(self.protocol.pings)
+        # Ping is sent and not acknowleged.
+        when = self.protocol.keepalive()
+        self.assertEqual(when, self.protocol.keepalive_ping_time + 1)
+        ping_1 = self.protocol.keepalive_ping_data
         self.assertOneFrameSent(True, OP_PING, ping_1)
 
-        # Next ping is sent at 7ms anyway.
-        self.loop.run_until_complete(asyncio.sleep(4 * MS))
-        ping_1_again, ping_2 = tuple(self.protocol.pings)
-        self.assertEqual(ping_1, ping_1_again)
+        # Next ping is sent after ping_interval anyway.
+        self.assertIsNotNone(self.protocol.keepalive())
+        ping_2 = self.protocol.keepalive_ping_data
         self.assertOneFrameSent(True, OP_PING, ping_2)
 
-        # The keepalive ping task goes on.
-        self.assertFalse(self.protocol.keepalive_ping_task.done())
+    def test_keepalive_ping_releases_idle_state(self):
+        self.restart_protocol_with_keepalive_ping(ping_interval=1, ping_timeout=1)
+        extension = unittest.mock.Mock(spec=Extension)
+        extension.encode.side_effect = lambda frame: frame
+        self.protocol.extensions = [extension]
+
+        # Extensions can release their state when a ping is sent.
+        self.protocol.keepalive()
+        extension.release_idle_state.assert_called_once_with()
+
+    def test_lazy_keepalive(self):
+        self.restart_protocol_with_keepalive_ping(
+            ping_interval=1, ping_timeout=1, lazy_keepalive=True
+        )
+
+        # A frame is received.
+        self.receive_frame(Frame(True, OP_TEXT, b"tea"))
+        self.run_loop_until(lambda: self.protocol.messages)
+        received = self.protocol.last_frame_received
+
+        # No ping is sent because the connection isn't idle. The ping is
+        # postponed until ping_interval after receiving the frame.
+        when = self.protocol.keepalive()
+        self.assertEqual(when, received + 1)
+        self.assertNoFrameSent()
+
+        # Ping is sent after ping_interval without receiving frames.
+        with unittest.mock.patch.object(self.loop, "time", return_value=when):
+            self.protocol.keepalive()
+        ping_1 = self.protocol.keepalive_ping_data
+        self.assertOneFrameSent(True, OP_PING, ping_1)
+
+    def test_lazy_keepalive_idle_connection(self):
+        self.restart_protocol_with_keepalive_ping(
+            ping_interval=1, ping_timeout=1, lazy_keepalive=True
+        )
+        opened = self.protocol.last_frame_received
+
+        # Ping is sent after ping_interval because no frame was received.
+        with unittest.mock.patch.object(self.loop, "time", return_value=opened + 1):
+            self.protocol.keepalive()
+        ping_1 = self.protocol.keepalive_ping_data
+        self.assertOneFrameSent(True, OP_PING, ping_1)
+
+    def test_keepalive_ping_late_pong(self):
+        self.restart_protocol_with_keepalive_ping(ping_interval=1, ping_timeout=1)
+
+        # Send a ping without waiting for the scheduler.
+        self.protocol.keepalive()
+        ping_1 = self.protocol.keepalive_ping_data
+        self.assertOneFrameSent(True, OP_PING, ping_1)
+
+        # The pong is received just before the deadline is reached.
+        self.receive_keepalive_pong()
+
+        # The connection isn't closed; the next ping is sent instead.
+        self.assertIsNotNone(self.protocol.keepalive())
+        ping_2 = self.protocol.keepalive_ping_data
+        self.assertOneFrameSent(True, OP_PING, ping_2)
 
     def test_keepalive_ping_unexpected_error(self):
         self.restart_protocol_with_keepalive_ping()
 
-        async def ping():
+        def write_frame_sync(*args, **kwargs):
             raise Exception("BOOM")
 
-        self.protocol.ping = ping
-
-        # The keepalive ping task fails when sending a ping at 3ms.
-        self.loop.run_until_complete(asyncio.sleep(4 * MS))
+        self.protocol.write_frame_sync = write_frame_sync
 
-        # The keepalive ping task is complete.
-        # It logs and swallows the exception.
-        self.assertEqual(self.protocol.keepalive_ping_task.result(), None)
+        # Sending a ping fails after 3ms. The error is logged and swallowed.
+        with self.assertLogs("websockets", logging.ERROR) as logs:
+            self.run_loop_until(
+                lambda: self.protocol not in self.protocol.keepalive_scheduler
+            )
+        self.assertEqual(
+            [record.getMessage() for record in logs.records],
+            ["keepalive ping failed"],
+        )
 
     # Test the protocol logic for closing the connection.
 
+    def test_open_connection_runs_one_task(self):
+        # Only the data transfer task runs while the connection is open.
+        self.assertEqual(
+            asyncio.all_tasks(self.loop), {self.protocol.transfer_data_task}
+        )
+
+    def test_close_connection_task_starts_after_data_transfer(self):
+        self.assertIsNone(self.protocol._close_connection_task)
+        self.receive_frame(self.close_frame)
+        self.receive_eof_if_client()
+        self.loop.run_until_complete(self.protocol.transfer_data_task)
+        self.run_loop_once()
+        self.assertIsNotNone(self.protocol._close_connection_task)
+        self.loop.run_until_complete(self.protocol.wait_closed())
+        self.assertConnectionClosed(1000, "close")
+
+    def test_close_connection_task_starts_on_demand(self):
+        close_connection_task = self.protocol.close_connection_task
+        self.assertIs(self.protocol.close_connection_task, close_connection_task)
+        self.assertFalse(close_connection_task.done())
+
     def test_local_close(self):
         # Emulate how the remote endpoint answers the closing handshake.
         self.loop.call_later(MS, self.receive_frame, self.close_frame)
@@ -8,6 +8,7 @@ from websockets.exceptions import (
     PayloadTooBig,
     ProtocolError,
 )
+from websockets.extensions.permessage_deflate import PerMessageDeflate
 from websockets.frames import (
     OP_BINARY,
     OP_CLOSE,
@@ -1715,3 +1716,20 @@ class ExtensionsTests(ConnectionTestCase):
         server.extensions = [Rsv2Extension()]
         server.receive_data(b"\xaa\x80\x00\x44\x88\xcc")
         self.assertEqual(server.events_received(), [Frame(OP_PONG, b"")])
+
+    def test_client_receives_compressed_fragmented_message_over_size_limit(self):
+        server = Connection(Side.SERVER)
+        server.extensions = [PerMessageDeflate(False, False, 15, 15)]
+        client = Connection(Side.CLIENT, max_size=1024)
+        client.extensions = [PerMessageDeflate(False, False, 15, 15)]
+        server.send_binary(bytes(1000), fin=False)
+        server.send_continuation(bytes(1000), fin=True)
+        # Frames are much smaller than max_size before decompression.
+        for data in server.data_to_send():
+            self.assertLess(len(data), 1024)
+            client.receive_data(data)
+        self.assertEqual(
+            client.events_received(), [Frame(OP_BINARY, bytes(1000), fin=False)]
+        )
+        self.assertIsInstance(client.parser_exc, PayloadTooBig)
+        self.assertConnectionFailing(client, 1009, "over size limit (? > 24 bytes)")
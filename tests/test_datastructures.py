@@ -61,6 +61,20 @@ class HeadersTests(unittest.TestCase):
             self.headers,
         )
 
+    def test_init_from_keys_and_getitem(self):
+        class HeadersLike:
+            def keys(self):
+                return ["Connection", "Server"]
+
+            def __getitem__(self, key):
+                return {"Connection": "Upgrade", "Server": "websockets"}[key]
+
+        self.assertEqual(Headers(HeadersLike()), self.headers)
+
+    def test_init_multiple_values(self):
+        headers = Headers([("Connection", "Upgrade"), ("connection", "close")])
+        self.assertEqual(headers.get_all("Connection"), ["Upgrade", "close"])
+
     def test_init_multiple_positional_arguments(self):
         with self.assertRaises(TypeError):
             Headers(Headers(connection="Upgrade"), Headers(server="websockets"))
@@ -79,6 +93,21 @@ class HeadersTests(unittest.TestCase):
     def test_copy(self):
         self.assertEqual(repr(self.headers.copy()), repr(self.headers))
 
+    def test_update(self):
+        self.headers.update({"Upgrade": "websocket"}, Server="other")
+        self.assertEqual(self.headers["Upgrade"], "websocket")
+        self.assertEqual(self.headers.get_all("Server"), ["websockets", "other"])
+
+    def test_update_from_self(self):
+        self.headers.update(self.headers)
+        self.assertEqual(self.headers.get_all("Server"), ["websockets", "websockets"])
+        self.assertEqual(len(list(self.headers.raw_items())), 4)
+
+    def test_copy_is_independent(self):
+        copy = self.headers.copy()
+        copy["Server"] = "other"
+        self.assertEqual(self.headers.get_all("Server"), ["websockets"])
+
     def test_serialize(self):
         self.assertEqual(
             self.headers.serialize(),
@@ -5,6 +5,7 @@ import websockets.client
 import websockets.exceptions
 import websockets.legacy.auth
 import websockets.legacy.client
+import websockets.legacy.fanout
 import websockets.legacy.protocol
 import websockets.legacy.server
 import websockets.server
@@ -15,6 +16,7 @@ import websockets.uri
 combined_exports = (
     websockets.legacy.auth.__all__
     + websockets.legacy.client.__all__
+    + websockets.legacy.fanout.__all__
     + websockets.legacy.protocol.__all__
     + websockets.legacy.server.__all__
     + websockets.client.__all__
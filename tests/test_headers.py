@@ -198,3 +198,69 @@ class HeadersTests(unittest.TestCase):
             with self.subTest(header=header):
                 with self.assertRaises(InvalidHeaderValue):
                     parse_authorization_basic(header)
+
+
+class HeaderCacheTests(unittest.TestCase):
+    def setUp(self):
+        set_header_cache_size(128)
+
+    def tearDown(self):
+        set_header_cache_size(128)
+
+    def test_cache_hits(self):
+        parse_connection("Upgrade")
+        parse_connection("Upgrade")
+        parse_connection("keep-alive, Upgrade")
+        parse_upgrade("websocket")
+        parse_extension("permessage-deflate; client_max_window_bits")
+        parse_extension("permessage-deflate; client_max_window_bits")
+        info = header_cache_info()
+        self.assertEqual(info["Connection"].hits, 1)
+        self.assertEqual(info["Connection"].misses, 2)
+        self.assertEqual(info["Connection"].currsize, 2)
+        self.assertEqual(info["Upgrade"].hits, 0)
+        self.assertEqual(info["Upgrade"].misses, 1)
+        self.assertEqual(info["Sec-WebSocket-Extensions"].hits, 1)
+        self.assertEqual(info["Sec-WebSocket-Extensions"].misses, 1)
+        self.assertIsInstance(info["Upgrade"], HeaderCacheInfo)
+
+    def test_cached_results_are_immutable(self):
+        header = "permessage-deflate; client_max_window_bits"
+        parse_extension(header)[0][1].append(("server_no_context_takeover", None))
+        parse_connection("Upgrade").append("keep-alive")
+        parse_upgrade("websocket").clear()
+        self.assertEqual(
+            parse_extension(header),
+            [("permessage-deflate", [("client_max_window_bits", None)])],
+        )
+        self.assertEqual(parse_connection("Upgrade"), ["Upgrade"])
+        self.assertEqual(parse_upgrade("websocket"), ["websocket"])
+
+    def test_invalid_headers_are_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(InvalidHeaderFormat):
+                parse_extension(",")
+        info = header_cache_info()["Sec-WebSocket-Extensions"]
+        self.assertEqual(info.hits, 0)
+        self.assertEqual(info.currsize, 0)
+
+    def test_set_header_cache_size(self):
+        set_header_cache_size(2)
+        for header in ["a", "b", "c", "a"]:
+            parse_upgrade(header)
+        info = header_cache_info()["Upgrade"]
+        self.assertEqual(info.maxsize, 2)
+        self.assertEqual(info.currsize, 2)
+        self.assertEqual(info.hits, 0)
+
+    def test_set_header_cache_size_zero(self):
+        set_header_cache_size(0)
+        parse_upgrade("websocket")
+        self.assertEqual(parse_upgrade("websocket"), ["websocket"])
+        info = header_cache_info()["Upgrade"]
+        self.assertEqual(info.hits, 0)
+        self.assertEqual(info.currsize, 0)
+
+    def test_set_header_cache_size_negative(self):
+        with self.assertRaises(ValueError):
+            set_header_cache_size(-1)
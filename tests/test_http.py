@@ -1,6 +1,10 @@
+import email.utils
 import unittest
+import unittest.mock
 
+from websockets.datastructures import Headers
 from websockets.http import *
+from websockets.http import MAX_RESPONSE_TEMPLATES
 
 
 class HTTPTests(unittest.TestCase):
@@ -25,3 +29,87 @@ class HTTPTests(unittest.TestCase):
         ]:
             with self.subTest(host=host, port=port, secure=secure):
                 self.assertEqual(build_host(host, port, secure), result)
+
+    def test_build_date(self):
+        date = build_date()
+        self.assertEqual(email.utils.parsedate_to_datetime(date).tzname(), "UTC")
+
+    @unittest.mock.patch("time.time")
+    def test_build_date_cache(self, _time):
+        _time.return_value = 1600000000.1
+        self.assertEqual(build_date(), "Sun, 13 Sep 2020 12:26:40 GMT")
+        with unittest.mock.patch("email.utils.formatdate") as _formatdate:
+            _time.return_value = 1600000000.9
+            self.assertEqual(build_date(), "Sun, 13 Sep 2020 12:26:40 GMT")
+            _formatdate.assert_not_called()
+        _time.return_value = 1600000001.0
+        self.assertEqual(build_date(), "Sun, 13 Sep 2020 12:26:41 GMT")
+
+
+class ResponseTemplateTests(unittest.TestCase):
+    def test_render(self):
+        template = ResponseTemplate(
+            Headers(
+                [
+                    ("Date", ""),
+                    ("Upgrade", "websocket"),
+                    ("Sec-WebSocket-Accept", ""),
+                    ("Server", "websockets"),
+                ]
+            )
+        )
+        self.assertEqual(
+            template.render("s3pPLMBiTxaQ9kYGzzhZRbK+xOo=", "today"),
+            Headers(
+                [
+                    ("Date", "today"),
+                    ("Upgrade", "websocket"),
+                    ("Sec-WebSocket-Accept", "s3pPLMBiTxaQ9kYGzzhZRbK+xOo="),
+                    ("Server", "websockets"),
+                ]
+            ),
+        )
+
+    def test_render_returns_new_headers(self):
+        template = ResponseTemplate(Headers([("Sec-WebSocket-Accept", "")]))
+        headers = template.render("accept", "today")
+        headers["X-Spam"] = "Eggs"
+        self.assertNotIn("X-Spam", template.render("accept", "today"))
+
+    def test_render_keeps_date(self):
+        template = ResponseTemplate(
+            Headers([("Sec-WebSocket-Accept", ""), ("Date", "yesterday")])
+        )
+        self.assertEqual(template.render("accept", "today")["Date"], "yesterday")
+
+    def test_missing_accept(self):
+        with self.assertRaises(ValueError):
+            ResponseTemplate(Headers([("Date", "")]))
+
+
+class ResponseTemplateCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResponseTemplateCache()
+        self.template = ResponseTemplate(Headers([("Sec-WebSocket-Accept", "")]))
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get(None, None))
+
+    def test_add_get(self):
+        self.cache.add("permessage-deflate", None, self.template)
+        self.assertIs(self.cache.get("permessage-deflate", None), self.template)
+        self.assertIsNone(self.cache.get(None, "permessage-deflate"))
+        self.assertEqual(len(self.cache), 1)
+
+    def test_add_get_extra_headers(self):
+        extra_headers = (("X-Spam", "Eggs"),)
+        self.cache.add(None, None, self.template, extra_headers)
+        self.assertIs(self.cache.get(None, None, extra_headers), self.template)
+        self.assertIsNone(self.cache.get(None, None))
+        self.assertIsNone(self.cache.get(None, None, (("X-Spam", "Ham"),)))
+
+    def test_max_templates(self):
+        for index in range(MAX_RESPONSE_TEMPLATES + 1):
+            self.cache.add(None, str(index), self.template)
+        self.assertEqual(len(self.cache), MAX_RESPONSE_TEMPLATES)
+        self.assertIsNone(self.cache.get(None, str(MAX_RESPONSE_TEMPLATES)))
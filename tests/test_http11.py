@@ -95,6 +95,109 @@ class RequestTests(GeneratorTestCase):
             "transfer codings aren't supported",
         )
 
+    def parse_bulk(self):
+        return Request.parse(self.reader.read_line, read_until=self.reader.read_until)
+
+    def test_parse_bulk(self):
+        # Example from the protocol overview in RFC 6455
+        self.reader.feed_data(
+            b"GET /chat HTTP/1.1\r\n"
+            b"Host: server.example.com\r\n"
+            b"Upgrade: websocket\r\n"
+            b"Connection: Upgrade\r\n"
+            b"Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\n"
+            b"Origin: http://example.com\r\n"
+            b"Sec-WebSocket-Protocol: chat, superchat\r\n"
+            b"Sec-WebSocket-Version: 13\r\n"
+            b"\r\n"
+        )
+        request = self.assertGeneratorReturns(self.parse_bulk())
+        self.assertEqual(request.path, "/chat")
+        self.assertEqual(request.headers["Upgrade"], "websocket")
+        self.assertEqual(len(request.headers), 7)
+
+    def test_parse_bulk_need_more_data(self):
+        self.reader.feed_data(b"GET /chat HTTP/1.1\r\nUpgrade: websocket\r\n")
+        gen = self.parse_bulk()
+        self.assertGeneratorRunning(gen)
+        self.reader.feed_data(b"\r\n")
+        request = self.assertGeneratorReturns(gen)
+        self.assertEqual(request.headers, Headers({"Upgrade": "websocket"}))
+
+    def test_parse_bulk_invalid_request_line_early(self):
+        # The request line is rejected without waiting for headers.
+        self.reader.feed_data(b"POST / HTTP/1.1\r\n")
+        with self.assertRaises(ValueError) as raised:
+            next(self.parse_bulk())
+        self.assertEqual(
+            str(raised.exception),
+            "unsupported HTTP method: POST",
+        )
+
+    def test_parse_bulk_invalid_header_early(self):
+        self.reader.feed_data(b"GET /chat HTTP/1.1\r\n")
+        gen = self.parse_bulk()
+        self.assertGeneratorRunning(gen)
+        self.reader.feed_data(b"Oops\r\n")
+        with self.assertRaises(ValueError) as raised:
+            next(gen)
+        self.assertEqual(
+            str(raised.exception),
+            "invalid HTTP header line: Oops",
+        )
+
+    def test_parse_bulk_line_too_long_early(self):
+        # A line is rejected as soon as it exceeds the limit.
+        self.reader.feed_data(b"GET /chat HTTP/1.1\r\nfoo: " + b"a" * 4106)
+        with self.assertRaises(SecurityError) as raised:
+            next(self.parse_bulk())
+        self.assertEqual(str(raised.exception), "line too long")
+
+    def test_parse_bulk_too_many_headers_early(self):
+        self.reader.feed_data(b"GET /chat HTTP/1.1\r\n" + b"foo: bar\r\n" * 257)
+        with self.assertRaises(SecurityError) as raised:
+            next(self.parse_bulk())
+        self.assertEqual(str(raised.exception), "too many HTTP headers")
+
+    def test_parse_bulk_no_headers(self):
+        self.reader.feed_data(b"GET /chat HTTP/1.1\r\n\r\n")
+        request = self.assertGeneratorReturns(self.parse_bulk())
+        self.assertEqual(request.headers, Headers())
+
+    def test_parse_bulk_whitespace(self):
+        self.reader.feed_data(b"GET / HTTP/1.1\r\nUpgrade:\t websocket \r\n\r\n")
+        request = self.assertGeneratorReturns(self.parse_bulk())
+        self.assertEqual(request.headers["Upgrade"], "websocket")
+
+    def test_parse_bulk_errors(self):
+        # Parsing in bulk raises the same errors as parsing line by line.
+        for data in [
+            b"\r\n\r\n",
+            b"GET /\r\n\r\n",
+            b"OPTIONS * HTTP/1.1\r\n\r\n",
+            b"GET /chat HTTP/1.0\r\n\r\n",
+            b"GET /chat HTTP/1.1\r\nOops\r\n\r\n",
+            b"GET /chat HTTP/1.1\r\nfoo bar: baz qux\r\n\r\n",
+            b"GET /chat HTTP/1.1\r\nfoo: \x00\x00\x0f\r\n\r\n",
+            b"GET /chat HTTP/1.1\r\nfoo: bar\nbaz: qux\r\n\r\n",
+            b"GET /chat\n HTTP/1.1\r\n\r\n",
+            b"GET /chat HTTP/1.1\r\n" + b"foo: bar\r\n" * 257 + b"\r\n",
+            b"GET /chat HTTP/1.1\r\nfoo: " + b"a" * 4104 + b"\r\n\r\n",
+            b"GET /" + b"a" * 4104 + b" HTTP/1.1\r\n\r\n",
+            b"GET /chat HTTP/1.1\r\nfoo: bar\r\n",
+            b"GET /chat HTTP/1.1\r\n" + b"foo: bar\r\n" * 1000,
+        ]:
+            with self.subTest(data=data):
+                errors = []
+                for parse in [self.parse, self.parse_bulk]:
+                    reader = self.reader = StreamReader()
+                    reader.feed_data(data)
+                    reader.feed_eof()
+                    with self.assertRaises(Exception) as raised:
+                        next(parse())
+                    errors.append((type(raised.exception), str(raised.exception)))
+                self.assertEqual(errors[0], errors[1])
+
     def test_serialize(self):
         # Example from the protocol overview in RFC 6455
         request = Request(
@@ -137,6 +240,44 @@ class ResponseTests(GeneratorTestCase):
             self.reader.read_to_eof,
         )
 
+    def parse_bulk(self):
+        return Response.parse(
+            self.reader.read_line,
+            self.reader.read_exact,
+            self.reader.read_to_eof,
+            read_until=self.reader.read_until,
+        )
+
+    def test_parse_bulk_with_body(self):
+        self.reader.feed_data(
+            b"HTTP/1.1 404 Not Found\r\nContent-Length: 13\r\n\r\nSorry folks.\n"
+        )
+        response = self.assertGeneratorReturns(self.parse_bulk())
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.reason_phrase, "Not Found")
+        self.assertEqual(response.headers["Content-Length"], "13")
+        self.assertEqual(response.body, b"Sorry folks.\n")
+
+    def test_parse_bulk_errors(self):
+        # Parsing in bulk raises the same errors as parsing line by line.
+        for data in [
+            b"Hello!\r\n\r\n",
+            b"HTTP/1.1 OMG WTF\r\n\r\n",
+            b"HTTP/1.1 200 \x7f\r\n\r\n",
+            b"HTTP/1.1 500 Internal Server Error\r\nOops\r\n\r\n",
+            b"HTTP/1.1 500 Internal Server Error\r\n",
+        ]:
+            with self.subTest(data=data):
+                errors = []
+                for parse in [self.parse, self.parse_bulk]:
+                    reader = self.reader = StreamReader()
+                    reader.feed_data(data)
+                    reader.feed_eof()
+                    with self.assertRaises(Exception) as raised:
+                        next(parse())
+                    errors.append((type(raised.exception), str(raised.exception)))
+                self.assertEqual(errors[0], errors[1])
+
     def test_parse(self):
         # Example from the protocol overview in RFC 6455
         self.reader.feed_data(
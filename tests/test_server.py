@@ -88,7 +88,7 @@ class AcceptRejectTests(unittest.TestCase):
 
     def test_send_accept(self):
         server = ServerConnection()
-        with unittest.mock.patch("email.utils.formatdate", return_value=DATE):
+        with unittest.mock.patch("websockets.server.build_date", return_value=DATE):
             response = server.accept(self.make_request())
         self.assertIsInstance(response, Response)
         server.send_response(response)
@@ -108,7 +108,7 @@ class AcceptRejectTests(unittest.TestCase):
 
     def test_send_reject(self):
         server = ServerConnection()
-        with unittest.mock.patch("email.utils.formatdate", return_value=DATE):
+        with unittest.mock.patch("websockets.server.build_date", return_value=DATE):
             response = server.reject(http.HTTPStatus.NOT_FOUND, "Sorry folks.\n")
         self.assertIsInstance(response, Response)
         server.send_response(response)
@@ -130,7 +130,7 @@ class AcceptRejectTests(unittest.TestCase):
 
     def test_accept_response(self):
         server = ServerConnection()
-        with unittest.mock.patch("email.utils.formatdate", return_value=DATE):
+        with unittest.mock.patch("websockets.server.build_date", return_value=DATE):
             response = server.accept(self.make_request())
         self.assertIsInstance(response, Response)
         self.assertEqual(response.status_code, 101)
@@ -151,7 +151,7 @@ class AcceptRejectTests(unittest.TestCase):
 
     def test_reject_response(self):
         server = ServerConnection()
-        with unittest.mock.patch("email.utils.formatdate", return_value=DATE):
+        with unittest.mock.patch("websockets.server.build_date", return_value=DATE):
             response = server.reject(http.HTTPStatus.NOT_FOUND, "Sorry folks.\n")
         self.assertIsInstance(response, Response)
         self.assertEqual(response.status_code, 404)
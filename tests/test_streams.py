@@ -44,6 +44,90 @@ class StreamReaderTests(GeneratorTestCase):
             str(raised.exception), "stream ends after 3 bytes, before end of line"
         )
 
+    def test_read_until(self):
+        self.reader.feed_data(b"spam\r\n\r\neggs\r\n\r\n")
+
+        gen = self.reader.read_until(b"\r\n\r\n", 16)
+        data = self.assertGeneratorReturns(gen)
+        self.assertEqual(data, b"spam\r\n\r\n")
+
+        gen = self.reader.read_until(b"\r\n\r\n", 16)
+        data = self.assertGeneratorReturns(gen)
+        self.assertEqual(data, b"eggs\r\n\r\n")
+
+    def test_read_until_need_more_data(self):
+        self.reader.feed_data(b"spam\r")
+
+        gen = self.reader.read_until(b"\r\n\r\n", 16)
+        self.assertGeneratorRunning(gen)
+        self.reader.feed_data(b"\n\r")
+        self.assertGeneratorRunning(gen)
+        self.reader.feed_data(b"\neggs")
+        data = self.assertGeneratorReturns(gen)
+        self.assertEqual(data, b"spam\r\n\r\n")
+
+    def test_read_until_not_enough_data(self):
+        self.reader.feed_data(b"spam\r\n")
+        self.reader.feed_eof()
+
+        gen = self.reader.read_until(b"\r\n\r\n", 16)
+        with self.assertRaises(EOFError) as raised:
+            next(gen)
+        self.assertEqual(
+            str(raised.exception), "stream ends after 6 bytes, before separator"
+        )
+        # Data remains available.
+        gen = self.reader.read_line()
+        line = self.assertGeneratorReturns(gen)
+        self.assertEqual(line, b"spam\r\n")
+
+    def test_read_until_too_much_data(self):
+        self.reader.feed_data(b"spam" * 5)
+
+        gen = self.reader.read_until(b"\r\n\r\n", 16)
+        with self.assertRaises(ValueError) as raised:
+            next(gen)
+        self.assertEqual(str(raised.exception), "separator not found in 16 bytes")
+        # Data remains available.
+        gen = self.reader.read_exact(4)
+        data = self.assertGeneratorReturns(gen)
+        self.assertEqual(data, b"spam")
+
+    def test_read_until_separator_after_max_size(self):
+        self.reader.feed_data(b"spam" * 4 + b"\r\n\r\n")
+
+        gen = self.reader.read_until(b"\r\n\r\n", 16)
+        with self.assertRaises(ValueError):
+            next(gen)
+
+    def test_read_until_check(self):
+        checked = []
+        self.reader.feed_data(b"spam")
+
+        gen = self.reader.read_until(b"\r\n\r\n", 16, checked.append)
+        self.assertGeneratorRunning(gen)
+        self.assertEqual(checked, [b"spam"])
+        self.reader.feed_data(b"\r\n\r\n")
+        data = self.assertGeneratorReturns(gen)
+        self.assertEqual(data, b"spam\r\n\r\n")
+        # check isn't called once the separator is found.
+        self.assertEqual(len(checked), 1)
+
+    def test_read_until_check_fails(self):
+        def check(data):
+            raise ValueError("invalid data")
+
+        self.reader.feed_data(b"spam")
+
+        gen = self.reader.read_until(b"\r\n\r\n", 16, check)
+        with self.assertRaises(ValueError) as raised:
+            next(gen)
+        self.assertEqual(str(raised.exception), "invalid data")
+        # Data remains available.
+        gen = self.reader.read_exact(4)
+        data = self.assertGeneratorReturns(gen)
+        self.assertEqual(data, b"spam")
+
     def test_read_exact(self):
         self.reader.feed_data(b"spameggs")
 